@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config, Csv
 
@@ -155,6 +156,30 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Red de Simpatizantes
 # Frontend URL for password reset links
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:5173')
 
+# Per-process compact cache of the referral forest used by the network endpoints
+REFERRAL_GRAPH_CACHE = config('REFERRAL_GRAPH_CACHE', default=True, cast=bool)
+# Snapshot file mapped by every worker on this host (empty keeps a private copy per process)
+REFERRAL_GRAPH_SNAPSHOT = config(
+    'REFERRAL_GRAPH_SNAPSHOT',
+    default=str(Path(tempfile.gettempdir()) / 'referral_graph.bin')
+)
+# Admin visualization: bigger networks get their force layout computed in the background
+# (about 0.4 s of request time at 2000 members)
+REFERRAL_FORCE_LAYOUT_INLINE_MAX = config('REFERRAL_FORCE_LAYOUT_INLINE_MAX', default=2000, cast=int)
+# Admin visualization: networks above this many members are returned as level-of-detail clusters
+REFERRAL_VISUALIZATION_NODE_BUDGET = config('REFERRAL_VISUALIZATION_NODE_BUDGET', default=5000, cast=int)
+
+# Seconds a filtered listing count is served from the cache before it is recounted in the background
+REFERRAL_COUNT_CACHE_TTL = config('REFERRAL_COUNT_CACHE_TTL', default=30, cast=int)
+# Network sync: changes are handed out once they are this many seconds old, so a
+# transaction that took a lower change id and commits later is not skipped
+REFERRAL_SYNC_SETTLE_SECONDS = config('REFERRAL_SYNC_SETTLE_SECONDS', default=10, cast=int)
+
+# Finished background exports are written here and served from it
+REFERRAL_EXPORT_DIR = config('REFERRAL_EXPORT_DIR', default=str(Path(tempfile.gettempdir()) / 'referral_exports'))
+# Export jobs built at the same time by each process
+REFERRAL_EXPORT_WORKERS = config('REFERRAL_EXPORT_WORKERS', default=2, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
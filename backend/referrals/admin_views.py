@@ -3,21 +3,35 @@ Admin views for managing networks and users.
 Includes export functionality and rate limiting.
 """
 import logging
-from io import BytesIO
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.http import HttpResponse
-from django.db.models import Q, Count
-from django.utils import timezone
+from django.http import FileResponse, StreamingHttpResponse
+from django.conf import settings
+from django.db.models import Q
 from django_ratelimit.decorators import ratelimit
 from django.utils.decorators import method_decorator
 
-from .models import Sympathizer, Department, Municipality
-from .serializers import SympathizerSerializer
+from .models import Sympathizer, Department, Municipality, ExportJob
+from .serializers import SympathizerSerializer, ExportJobSerializer
+from .pagination import KeysetPagination
+from .search import search_sympathizers
+from .exports import (
+    CSV_CONTENT_TYPE, EXPORT_FORMATS, NETWORK_HEADERS, XLSX_CONTENT_TYPE, Workbook,
+    export_response, export_rows, network_export_rows
+)
+from .services.counts import CountService
+from .services.export_jobs import ExportJobService
+from .services.moderation import ModerationService
+from .graph_export import GRAPH_CONTENT_TYPES, GRAPH_FORMATS, graph_chunks
+from .graph import get_graph, network_rows
+from .layout import layout_rows, cached_force_layout, has_cached_force_layout
+from .renderers import EXPORT_RENDERERS, GRAPH_EXPORT_RENDERERS, GRAPH_RENDERERS
+from .streaming import wants_stream, member_columns, json_object, streaming_json_response
+from .conditional import conditional, make_etag, subtree_fingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -53,20 +67,47 @@ class AdminLoginView(APIView):
 
 
 class AdminNetworkListView(APIView):
-    """List and create root networks."""
+    """
+    List and create root networks.
+
+    GET accepts ``?sort=`` (``size``, ``created_at`` or ``name``, prefixed
+    with ``-`` for descending; default ``-created_at``), ``?page=`` and
+    ``?page_size=``. Sizes come from the maintained counters, so a page
+    costs at most two queries (cached count and slice) whatever the number
+    of networks.
+    """
     permission_classes = [permissions.IsAdminUser]
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+    SORT_FIELDS = {
+        'size': ('descendant_count',),
+        'created_at': ('created_at',),
+        'name': ('nombres', 'apellidos'),
+    }
 
     def get(self, request):
-        # Networks are defined by root sympathizers (no referrer)
-        # Optimized with annotation for referral count
-        roots = Sympathizer.objects.filter(
-            referrer__isnull=True
-        ).annotate(
-            direct_referrals_count=Count('referrals')
-        ).order_by('-created_at')
+        sort = request.query_params.get('sort', '-created_at')
+        descending = sort.startswith('-')
+        fields = self.SORT_FIELDS.get(sort.lstrip('-'))
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = int(request.query_params.get('page_size', self.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if fields is None:
+            return Response({'error': 'Orden invalido'}, status=status.HTTP_400_BAD_REQUEST)
+        page = max(page, 1)
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+
+        # Networks are defined by root sympathizers (no referrer); id breaks ties
+        ordering = [f"-{field}" if descending else field for field in (*fields, 'id')]
+        roots = Sympathizer.objects.filter(referrer__isnull=True).order_by(*ordering)
+
+        total = CountService.count(roots)
+        start = (page - 1) * page_size
 
         data = []
-        for root in roots:
+        for root in roots[start:start + page_size]:
             data.append({
                 'id': root.id,
                 'name': f"{root.nombres} {root.apellidos}",
@@ -79,10 +120,18 @@ class AdminNetworkListView(APIView):
                 'link_enabled': root.link_enabled,
                 'is_suspended': root.is_suspended,
                 'direct_referrals': root.direct_referrals_count,
-                'total_network_size': root.get_total_network_size()
+                'total_network_size': root.descendant_count
             })
 
-        return Response(data)
+        return Response({
+            'results': data,
+            'total': total.value,
+            'total_exact': total.exact,
+            'page': page,
+            'page_size': page_size,
+            'pages': (total.value + page_size - 1) // page_size,
+            'sort': sort,
+        })
 
     def post(self, request):
         """Create a new network (Root Sympathizer)."""
@@ -133,7 +182,7 @@ class AdminNetworkListView(APIView):
 
 
 class AdminUserListView(APIView):
-    """List users with search and pagination."""
+    """List users with search and keyset pagination (see KeysetPagination)."""
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
@@ -143,18 +192,13 @@ class AdminUserListView(APIView):
 
         # Optimized query with select_related
         users = Sympathizer.objects.select_related(
-            'department', 'municipio', 'referrer', 'user'
-        ).annotate(
-            referrals_count=Count('referrals')
-        ).order_by('-created_at')
-
-        if query:
-            users = users.filter(
-                Q(nombres__icontains=query) |
-                Q(apellidos__icontains=query) |
-                Q(cedula__icontains=query) |
-                Q(email__icontains=query)
-            )
+            'department', 'municipio', 'referrer', 'user', 'root'
+        )
+
+        users = search_sympathizers(users, query)
+
+        if network_id:
+            users = users.filter(root_id=network_id)
 
         if status_filter == 'active':
             users = users.filter(user__is_active=True, is_suspended=False)
@@ -163,22 +207,10 @@ class AdminUserListView(APIView):
         elif status_filter == 'pending':
             users = users.filter(user__isnull=True)
 
-        # Pagination
-        page = int(request.query_params.get('page', 1))
-        page_size = int(request.query_params.get('page_size', 20))
-        start = (page - 1) * page_size
-        end = start + page_size
-        total = users.count()
-
-        serializer = SympathizerSerializer(users[start:end], many=True)
-
-        return Response({
-            'results': serializer.data,
-            'total': total,
-            'page': page,
-            'page_size': page_size,
-            'pages': (total + page_size - 1) // page_size
-        })
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
+        serializer = SympathizerSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class AdminUserDetailView(APIView):
@@ -188,13 +220,13 @@ class AdminUserDetailView(APIView):
     def get(self, request, pk):
         try:
             user = Sympathizer.objects.select_related(
-                'department', 'municipio', 'referrer', 'user'
+                'department', 'municipio', 'referrer', 'user', 'root'
             ).get(pk=pk)
             serializer = SympathizerSerializer(user)
 
             # Add extra data
             data = serializer.data
-            data['total_network_size'] = user.get_total_network_size()
+            data['total_network_size'] = user.descendant_count
 
             return Response(data)
         except Sympathizer.DoesNotExist:
@@ -281,148 +313,338 @@ class AdminToggleSuspensionView(APIView):
             return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
 
+class AdminBulkModerationView(APIView):
+    """
+    Set link_enabled and/or is_suspended on many members at once.
+
+    POST ``{'root_id': id}`` (the member and its whole subtree) or
+    ``{'ids': [...]}``, plus ``link_enabled`` and/or ``is_suspended``
+    (booleans) and an optional ``reason``. Suspending also deactivates the
+    members' accounts, like AdminToggleSuspensionView. Runs a few set-based
+    UPDATEs and writes the history rows in bulk, all in one transaction.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    MAX_IDS = 1000
+
+    def post(self, request):
+        changes = {
+            field: request.data[field]
+            for field in ModerationService.FIELDS if field in request.data
+        }
+        root_id = request.data.get('root_id')
+        ids = request.data.get('ids')
+        reason = str(request.data.get('reason') or '')[:100]
+
+        if (
+            not changes
+            or not all(isinstance(value, bool) for value in changes.values())
+            or (root_id is None) == (ids is None)
+        ):
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if root_id is not None:
+            if not isinstance(root_id, int) or isinstance(root_id, bool):
+                return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+            if not Sympathizer.objects.filter(pk=root_id).exists():
+                return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+            members = Sympathizer.objects.subtree(root_id)
+        else:
+            if (
+                not isinstance(ids, list) or not ids or len(ids) > self.MAX_IDS
+                or not all(isinstance(member_id, int) and not isinstance(member_id, bool) for member_id in ids)
+            ):
+                return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+            members = Sympathizer.objects.filter(pk__in=ids)
+
+        result = ModerationService.apply(members, changes, user=request.user, reason=reason)
+
+        logger.info(
+            f"Bulk moderation by admin {request.user.username}: {changes}, "
+            f"{result['updated']} of {result['matched']} members updated"
+        )
+        return Response(result)
+
+
 class AdminExportUsersView(APIView):
-    """Export users to Excel/CSV."""
+    """
+    Export users to Excel/CSV.
+
+    GET builds the file in the request: ``?format=csv`` is streamed row by
+    row, ``?format=xlsx`` (default) is written in openpyxl's write-only mode
+    to a temporary file. POST ``{'format', 'q'}`` queues a background export
+    job instead, for exports too big to finish within the worker timeout;
+    poll it at ``/api/admin/exports/<id>/``.
+    """
     permission_classes = [permissions.IsAdminUser]
+    renderer_classes = EXPORT_RENDERERS
 
     def get(self, request):
         export_format = request.query_params.get('format', 'xlsx')
         query = request.query_params.get('q', '')
+        error = _export_format_error(export_format)
+        if error:
+            return error
+
+        users = search_sympathizers(Sympathizer.objects.order_by('-created_at'), query)
+        logger.info(f"Users {export_format} export started by admin {request.user.username}")
+        return export_response(export_rows(users), export_format, 'simpatizantes')
+
+    def post(self, request):
+        export_format = request.data.get('format', 'xlsx')
+        params = {'q': ' '.join(str(request.data.get('q') or '').split())}
+        return _queue_export(request, ExportJob.USERS, export_format, params)
+
 
+class AdminNetworkExportView(APIView):
+    """
+    Export the network below any member (a root or a subtree) to Excel/CSV.
+
+    Rows add the member's level below the exported member, the sponsor's
+    cedula and the member's subtree size, read in a single pass. GET
+    ``?format=&max_depth=`` downloads it directly; POST ``{'format',
+    'max_depth'}`` queues a background export job.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = EXPORT_RENDERERS
+
+    def get(self, request, pk):
+        export_format = request.query_params.get('format', 'xlsx')
+        error = _export_format_error(export_format)
+        if error:
+            return error
         try:
-            from openpyxl import Workbook
-            from openpyxl.utils import get_column_letter
-        except ImportError:
-            return Response({'error': 'openpyxl not installed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            max_depth = _max_depth(request.query_params.get('max_depth'))
+        except ValueError:
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get users
-        users = Sympathizer.objects.select_related(
-            'department', 'municipio', 'referrer', 'user'
-        ).order_by('-created_at')
-
-        if query:
-            users = users.filter(
-                Q(nombres__icontains=query) |
-                Q(apellidos__icontains=query) |
-                Q(cedula__icontains=query)
-            )
+        try:
+            member = Sympathizer.objects.only('id', 'referrer_id', 'depth').get(pk=pk)
+        except Sympathizer.DoesNotExist:
+            return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Simpatizantes"
-
-        # Headers
-        headers = [
-            'ID', 'Nombres', 'Apellidos', 'Cedula', 'Email', 'Telefono',
-            'Sexo', 'Departamento', 'Municipio', 'Codigo Referido',
-            'Referidor', 'Link Activo', 'Suspendido', 'Cuenta Activa',
-            'Fecha Registro', 'Fecha Activacion'
-        ]
-        ws.append(headers)
-
-        # Style headers
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.font = cell.font.copy(bold=True)
-            ws.column_dimensions[get_column_letter(col_num)].width = 15
-
-        # Data rows
-        for user in users:
-            ws.append([
-                user.id,
-                user.nombres,
-                user.apellidos,
-                user.cedula,
-                user.email or '',
-                user.phone,
-                user.get_sexo_display(),
-                user.department.name if user.department else '',
-                user.municipio.name if user.municipio else '',
-                user.referral_code,
-                f"{user.referrer.nombres} {user.referrer.apellidos}" if user.referrer else 'Raiz',
-                'Si' if user.link_enabled else 'No',
-                'Si' if user.is_suspended else 'No',
-                'Si' if (user.user and user.user.is_active) else 'No',
-                user.created_at.strftime('%Y-%m-%d %H:%M') if user.created_at else '',
-                user.activated_at.strftime('%Y-%m-%d %H:%M') if user.activated_at else ''
-            ])
-
-        # Create response
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        filename = f"simpatizantes_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        logger.info(f"Network {member.id} {export_format} export started by admin {request.user.username}")
+        return export_response(
+            network_export_rows(member, max_depth=max_depth), export_format, f"red_{member.id}", NETWORK_HEADERS
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
 
-        logger.info(f"Users exported by admin: {users.count()} records")
+    def post(self, request, pk):
+        try:
+            max_depth = _max_depth(request.data.get('max_depth'))
+        except ValueError:
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if not Sympathizer.objects.filter(pk=pk).exists():
+            return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        export_format = request.data.get('format', 'xlsx')
+        params = {'root_id': pk, 'max_depth': max_depth}
+        return _queue_export(request, ExportJob.NETWORK, export_format, params)
+
+
+class AdminNetworkGraphExportView(APIView):
+    """
+    Export the network below any member for graph tools.
+
+    GET ``?format=graphml|gexf|csv&max_depth=`` streams GraphML, GEXF or a
+    CSV edge list (default: GraphML) with the level, municipality and
+    activation status of every member, generated from one subtree query.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = GRAPH_EXPORT_RENDERERS
+
+    def get(self, request, pk):
+        graph_format = request.query_params.get('format', 'graphml')
+        if graph_format not in GRAPH_FORMATS:
+            return Response({'error': 'Formato invalido'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            max_depth = _max_depth(request.query_params.get('max_depth'))
+        except ValueError:
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            member = Sympathizer.objects.only('id', 'depth').get(pk=pk)
+        except Sympathizer.DoesNotExist:
+            return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(
+            graph_chunks(member, graph_format, max_depth=max_depth),
+            content_type=GRAPH_CONTENT_TYPES[graph_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="red_{member.id}.{graph_format}"'
+        logger.info(f"Network {member.id} {graph_format} graph export started by admin {request.user.username}")
         return response
 
 
-class AdminNetworkVisualizationView(APIView):
-    """Get network visualization data for a specific root network."""
+def _export_format_error(export_format):
+    """Get the error Response for an export format this server can't write, else None."""
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': 'Formato invalido'}, status=status.HTTP_400_BAD_REQUEST)
+    if export_format == 'xlsx' and Workbook is None:
+        return Response({'error': 'openpyxl not installed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return None
+
+
+def _max_depth(value):
+    """Parse an optional ``max_depth`` export parameter. Raises ValueError if invalid."""
+    if value in (None, ''):
+        return None
+    max_depth = int(value)
+    if max_depth < 0:
+        raise ValueError(value)
+    return max_depth
+
+
+def _queue_export(request, kind, export_format, params):
+    """Queue (or join) a background export job and describe it."""
+    error = _export_format_error(export_format)
+    if error:
+        return error
+
+    job, created = ExportJobService.submit(kind, export_format, params, user=request.user)
+    if created:
+        logger.info(f"Export job {job.pk} queued by admin {request.user.username}")
+    return Response(
+        ExportJobSerializer(job, context={'request': request}).data,
+        status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+    )
+
+
+class AdminExportJobView(APIView):
+    """Get the status and progress of an export job."""
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request, pk):
+        try:
+            job = ExportJob.objects.get(pk=pk)
+        except ExportJob.DoesNotExist:
+            return Response({'error': 'Exportacion no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ExportJobSerializer(job, context={'request': request}).data)
+
+
+class AdminExportJobDownloadView(APIView):
+    """Download the file of a finished export job."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk):
+        try:
+            job = ExportJob.objects.get(pk=pk)
+        except ExportJob.DoesNotExist:
+            return Response({'error': 'Exportacion no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        if job.status != ExportJob.DONE:
+            return Response({'error': 'La exportacion aun no esta lista'}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            export_file = open(ExportJobService.file_path(job), 'rb')
+        except FileNotFoundError:
+            return Response({'error': 'Archivo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        content_type = CSV_CONTENT_TYPE if job.format == 'csv' else XLSX_CONTENT_TYPE
+        return FileResponse(export_file, as_attachment=True, filename=job.file_name, content_type=content_type)
+
+
+def _layout_variant(focus, budget, clustered):
+    """Force layout cache variant of a visualization request."""
+    return f"{focus.id}:{budget}" if clustered else ''
+
+
+def _visualization_etag(request, pk):
+    """
+    ETag of a visualization: subtree fingerprint and view parameters.
+    Whether the force layout is ready is part of it, so a client that got
+    the tree fallback is sent the force layout once it is cached.
+    """
+    resolved = AdminNetworkVisualizationView._resolve(request, pk)
+    if isinstance(resolved, Response):
+        return None
+    root, focus, budget, clustered = resolved
+    force_ready = (
+        request.query_params.get('layout') != 'tree'
+        and has_cached_force_layout(root.id, _layout_variant(focus, budget, clustered))
+    )
+    return make_etag(request, 'visualization', root.id, focus.id, budget, force_ready, subtree_fingerprint(root.id))
+
+
+class AdminNetworkVisualizationView(APIView):
+    """
+    Get network visualization data for a specific root network.
+
+    Networks bigger than the node budget (``?budget=``, default
+    REFERRAL_VISUALIZATION_NODE_BUDGET) come back in level-of-detail mode:
+    the largest subtrees are expanded first and the rest are collapsed into
+    ``cluster`` nodes with their member count and depth range.
+    ``?cluster=<id>`` drills into one of them.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = GRAPH_RENDERERS
+    MIN_BUDGET = 50
+    MAX_BUDGET = 20000
+    NODE_COLUMNS = ('nombres', 'apellidos', 'cedula', 'phone', 'email', 'direct_referrals_count')
+
+    @classmethod
+    def _resolve(cls, request, pk):
+        """
+        Read the network, focus member and node budget of a request.
+
+        Returns:
+            tuple: (root, focus, budget, clustered), or an error Response
+        """
         try:
             root = Sympathizer.objects.get(pk=pk, referrer__isnull=True)
         except Sympathizer.DoesNotExist:
             return Response({'error': 'Red no encontrada'}, status=status.HTTP_404_NOT_FOUND)
 
+        try:
+            budget = int(request.query_params.get('budget', settings.REFERRAL_VISUALIZATION_NODE_BUDGET))
+            cluster_id = request.query_params.get('cluster')
+            cluster_id = int(cluster_id) if cluster_id else None
+        except ValueError:
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+        budget = max(cls.MIN_BUDGET, min(budget, cls.MAX_BUDGET))
+
+        focus = root
+        if cluster_id is not None and cluster_id != root.id:
+            focus = Sympathizer.objects.filter(pk=cluster_id, root_id=root.id).only('id', 'referrer_id', 'depth').first()
+            if focus is None:
+                return Response({'error': 'Grupo no encontrado en esta red'}, status=status.HTTP_404_NOT_FOUND)
+
+        clustered = focus is not root or root.descendant_count + 1 > budget
+        return root, focus, budget, clustered
+
+    @method_decorator(conditional(_visualization_etag))
+    def get(self, request, pk):
+        resolved = self._resolve(request, pk)
+        if isinstance(resolved, Response):
+            return resolved
+        root, focus, budget, clustered = resolved
+
+        total_nodes = root.descendant_count + 1
+        base_level = focus.depth - root.depth
+        header = {
+            'network_name': root.network_name or f"Red de {root.full_name}",
+            'root_name': root.full_name,
+            'total_nodes': total_nodes,
+        }
+        if wants_stream(request):
+            return self._stream(request, root, focus, budget, clustered, header)
+
+        if clustered:
+            rows, clusters = self._clustered_rows(focus, budget)
+        else:
+            # Whole network in one recursive query, breadth-first and ordered by id
+            rows = network_rows(root.id, columns=self.NODE_COLUMNS)
+            clusters = {}
+
         # Data structures for layout
         nodes_dict = {}
         children_map = {}
+        for node_id, parent_id, depth, *columns in rows:
+            nodes_dict[node_id] = self._node_data(node_id, base_level + depth, clusters, *columns)
+            children_map[node_id] = []
+            if depth > 0:
+                children_map[parent_id].append(node_id)
 
-        # Helper to create node dict
-        def create_node_data(sympathizer, type_node, level):
-            return {
-                'id': sympathizer.id,
-                'nombres': sympathizer.nombres,
-                'apellidos': sympathizer.apellidos,
-                'cedula': sympathizer.cedula,
-                'telefono': sympathizer.phone,
-                'email': sympathizer.email,
-                'referrals_count': 0,  # Will be updated later
-                'type': type_node,
-                'level': level,
-                'x': 0,
-                'y': 0
-            }
-
-        # Start with root
-        nodes_dict[root.id] = create_node_data(root, 'root', 0)
-        children_map[root.id] = []
-
-        # BFS traversal to build the full network
-        visited = {root.id}
-        queue = [(root, 0)]
-
-        while queue:
-            current, level = queue.pop(0)
-
-            # Get children
-            direct_referrals = current.referrals.only(
-                'id', 'nombres', 'apellidos', 'cedula', 'phone', 'email'
-            ).order_by('id')
-
-            current_children_ids = []
-            for ref in direct_referrals:
-                if ref.id not in visited:
-                    visited.add(ref.id)
-                    nodes_dict[ref.id] = create_node_data(ref, 'referral', level + 1)
-                    children_map[ref.id] = []
-                    current_children_ids.append(ref.id)
-                    queue.append((ref, level + 1))
-
-            children_map[current.id] = current_children_ids
-            # Update referrals count
-            nodes_dict[current.id]['referrals_count'] = len(current_children_ids)
+        positions, layout = self._positions(request, root, focus, budget, clustered, rows)
+        for node_id, (x, y) in positions.items():
+            nodes_dict[node_id]['x'] = x
+            nodes_dict[node_id]['y'] = y
 
         # Construct Response
         final_nodes = list(nodes_dict.values())
@@ -433,9 +655,97 @@ class AdminNetworkVisualizationView(APIView):
                 final_links.append({'source': parent_id, 'target': child_id})
 
         return Response({
-            'network_name': root.network_name or f"Red de {root.full_name}",
-            'root_name': root.full_name,
-            'total_nodes': len(final_nodes),
+            **header,
+            'visible_nodes': len(final_nodes),
+            'clustered': clustered,
+            'budget': budget,
+            'focus_id': focus.id,
+            'focus_parent_id': focus.referrer_id if focus is not root else None,
+            'layout': layout,
             'nodes': final_nodes,
             'links': final_links
         })
+
+    @staticmethod
+    def _node_data(node_id, level, clusters, nombres, apellidos, cedula, phone, email, direct_count):
+        node = {
+            'id': node_id,
+            'nombres': nombres,
+            'apellidos': apellidos,
+            'cedula': cedula,
+            'telefono': phone,
+            'email': email,
+            'referrals_count': direct_count,
+            'type': 'root' if level == 0 else 'referral',
+            'level': level,
+            'x': 0,
+            'y': 0
+        }
+        if node_id in clusters:
+            members, height = clusters[node_id]
+            node.update({
+                'type': 'cluster',
+                'member_count': members,
+                'depth_range': [level, level + height],
+            })
+        return node
+
+    @staticmethod
+    def _positions(request, root, focus, budget, clustered, rows):
+        """
+        Converged force layout (cached per network version and view) unless ?layout=tree.
+
+        The tidy tree layout is also used while a big network is still being computed.
+        """
+        positions = None
+        if request.query_params.get('layout') != 'tree':
+            positions = cached_force_layout(root.id, rows, variant=_layout_variant(focus, budget, clustered))
+        if positions is not None:
+            return positions, 'force'
+        xs, ys = layout_rows(rows)
+        return {row[0]: (x, y) for row, x, y in zip(rows, xs.tolist(), ys.tolist())}, 'tree'
+
+    def _clustered_rows(self, focus, budget):
+        """Level-of-detail rows below ``focus`` with their columns, plus the collapsed clusters."""
+        structure, clusters = get_graph().collapse(focus.id, budget)
+        values = {
+            row[0]: row[1:]
+            for row in Sympathizer.objects.filter(pk__in=[row[0] for row in structure])
+            .values_list('id', *self.NODE_COLUMNS)
+        }
+        rows = [(*row, *values[row[0]]) for row in structure if row[0] in values]
+        return rows, clusters
+
+    def _stream(self, request, root, focus, budget, clustered, header):
+        """Same payload as get(), emitted node by node from the graph cache and chunked column reads."""
+        graph = get_graph()
+        if clustered:
+            structure, clusters = graph.collapse(focus.id, budget)
+        else:
+            structure, clusters = graph.subtree(root.id), {}
+        positions, layout = self._positions(request, root, focus, budget, clustered, structure)
+        base_level = focus.depth - root.depth
+        depths = {node_id: depth for node_id, _, depth in structure}
+
+        def nodes():
+            member_ids = [row[0] for row in structure]
+            for node_id, *columns in member_columns(member_ids, self.NODE_COLUMNS):
+                node = self._node_data(node_id, base_level + depths[node_id], clusters, *columns)
+                node['x'], node['y'] = positions[node_id]
+                yield node
+
+        def links():
+            for node_id, parent_id, depth in structure:
+                if depth > 0:
+                    yield {'source': parent_id, 'target': node_id}
+
+        fields = {
+            **header,
+            'visible_nodes': len(structure),
+            'clustered': clustered,
+            'budget': budget,
+            'focus_id': focus.id,
+            'focus_parent_id': focus.referrer_id if focus is not root else None,
+            'layout': layout,
+        }
+        return streaming_json_response(json_object(fields, lists=[('nodes', nodes()), ('links', links())]))
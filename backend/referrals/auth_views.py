@@ -2,8 +2,10 @@
 Authentication views for the referrals application.
 Includes rate limiting, structured logging, and optimized queries.
 """
+import asyncio
 import logging
 import re
+from datetime import timedelta
 from io import BytesIO
 from collections import defaultdict
 from rest_framework.views import APIView
@@ -18,12 +20,21 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.db.models import Count, Max, Q
 from django_ratelimit.decorators import ratelimit
 from django.utils.decorators import method_decorator
 
-from .models import Sympathizer, LevelLabel, Department, Municipality
+from .models import Sympathizer, SympathizerClosure, LevelLabel, NetworkChange, Department, Municipality
 from .services.email import EmailService
+from .graph import get_graph, network_rows
+from .layout import layout_rows
+from .renderers import EXPORT_RENDERERS, GRAPH_RENDERERS
+from .streaming import wants_stream, dumps, member_columns, json_object, streaming_json_response
+from .conditional import conditional, make_etag, subtree_fingerprint
+from .events import broker, start_listener
+from .exports import EXPORT_FORMATS, NETWORK_HEADERS, Workbook, export_response, network_export_rows
 
 logger = logging.getLogger(__name__)
 
@@ -255,59 +266,92 @@ class LoginView(APIView):
             return Response({'error': 'Credenciales invalidas'}, status=status.HTTP_401_UNAUTHORIZED)
 
 
+def _dashboard_etag(request):
+    """ETag of the dashboard: the user's subtree fingerprint."""
+    sympathizer = getattr(request.user, 'sympathizer', None)
+    if sympathizer is None:
+        return None
+    return make_etag(request, 'dashboard', sympathizer.id, subtree_fingerprint(sympathizer.id))
+
+
+def _network_etag(request):
+    """ETag of the network view: the user's subtree fingerprint and sponsor."""
+    me = getattr(request.user, 'sympathizer', None)
+    if me is None:
+        return None
+    # The sponsor node is drawn too, so its profile is part of the payload
+    sponsor = Sympathizer.objects.filter(pk=me.referrer_id).values_list('id', 'updated_at').first()
+    return make_etag(request, 'network', me.id, sponsor, subtree_fingerprint(me.id))
+
+
+def _level_labels_etag(request):
+    """ETag of the level labels: latest change and count of the user's labels."""
+    sympathizer = getattr(request.user, 'sympathizer', None)
+    if sympathizer is None:
+        return None
+    labels = LevelLabel.objects.filter(owner=sympathizer).order_by().aggregate(
+        last_update=Max('updated_at'), total=Count('id')
+    )
+    return make_etag(request, 'level-labels', sympathizer.id, labels['last_update'], labels['total'])
+
+
 class DashboardView(APIView):
     """User dashboard with referral data."""
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = GRAPH_RENDERERS
+    NODE_COLUMNS = ('nombres', 'apellidos', 'cedula', 'email', 'phone', 'created_at')
 
+    @staticmethod
+    def _level_counts(sympathizer):
+        """Members per level, one grouped query over the closure table."""
+        level_counts = SympathizerClosure.objects.filter(
+            ancestor=sympathizer, depth__gt=0
+        ).values('depth').annotate(total=Count('id')).order_by('depth')
+        return {str(row['depth']): row['total'] for row in level_counts}
+
+    @method_decorator(conditional(_dashboard_etag))
     def get(self, request):
         try:
             sympathizer = request.user.sympathizer
 
-            # Build full referral tree with batched queries (all levels)
-            children_map = defaultdict(list)
-            queue = [sympathizer.id]
-            visited = {sympathizer.id}
-
-            while queue:
-                batch_ids = queue
-                queue = []
-                children = Sympathizer.objects.filter(referrer_id__in=batch_ids).only(
-                    'id', 'nombres', 'apellidos', 'cedula', 'email', 'phone', 'created_at', 'referrer_id'
-                )
+            if wants_stream(request):
+                return self._stream(sympathizer)
 
-                for child in children:
-                    if child.id in visited:
-                        continue
-                    visited.add(child.id)
-                    children_map[child.referrer_id].append(child)
-                    queue.append(child.id)
+            # Build full referral tree with a single recursive query (all levels)
+            rows = network_rows(sympathizer.id, columns=self.NODE_COLUMNS)
 
-            # Keep newest first per parent
-            for parent_id, child_list in children_map.items():
-                child_list.sort(key=lambda item: item.created_at, reverse=True)
-
-            def serialize_referral(ref):
-                sub_children = children_map.get(ref.id, [])
-                sub_referrals_data = [serialize_referral(sub) for sub in sub_children]
-                return {
-                    'id': ref.id,
-                    'nombres': ref.nombres,
-                    'apellidos': ref.apellidos,
-                    'cedula': ref.cedula,
-                    'email': ref.email,
-                    'phone': ref.phone,
-                    'created_at': ref.created_at,
-                    'referrals_count': len(sub_children),
-                    'sub_referrals': sub_referrals_data
+            nodes = {}
+            children_map = defaultdict(list)
+            for node_id, parent_id, depth, nombres, apellidos, cedula, email, phone, created_at in rows:
+                node = {
+                    'id': node_id,
+                    'nombres': nombres,
+                    'apellidos': apellidos,
+                    'cedula': cedula,
+                    'email': email,
+                    'phone': phone,
+                    'created_at': created_at,
+                    'referrals_count': 0,
+                    'sub_referrals': []
                 }
+                nodes[node_id] = node
+                if depth > 0:
+                    children_map[parent_id].append(node)
 
-            referrals_data = [serialize_referral(ref) for ref in children_map.get(sympathizer.id, [])]
+            # Attach children and keep newest first per parent
+            for parent_id, child_list in children_map.items():
+                child_list.sort(key=lambda item: item['created_at'], reverse=True)
+                nodes[parent_id]['sub_referrals'] = child_list
+                nodes[parent_id]['referrals_count'] = len(child_list)
+
+            referrals_data = children_map.get(sympathizer.id, [])
 
             return Response({
                 'nombres': sympathizer.nombres,
                 'apellidos': sympathizer.apellidos,
                 'referral_code': sympathizer.referral_code,
                 'referrals_count': len(referrals_data),
+                'level_counts': self._level_counts(sympathizer),
                 'referrals': referrals_data
             })
         except Sympathizer.DoesNotExist:
@@ -320,11 +364,71 @@ class DashboardView(APIView):
             logger.error(f"Error in DashboardView: {str(e)}")
             return Response({'error': 'Error al cargar el dashboard'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _stream(self, sympathizer):
+        """
+        Same payload as get(), written depth-first while the columns are read in chunks.
+
+        Siblings come newest first by id, which follows created_at because
+        members are only ever inserted.
+        """
+        graph = get_graph()
+        direct_referrals = graph.children(sympathizer.id)
+
+        # Pre-order walk; children are pushed oldest first so the newest is popped first
+        order = []
+        stack = [(child, 1) for child in direct_referrals]
+        while stack:
+            node_id, depth = stack.pop()
+            order.append((node_id, depth))
+            stack.extend((child, depth + 1) for child in graph.children(node_id))
+
+        def referrals():
+            yield '['
+            open_depth = 0
+            skip_below = None
+            rows = member_columns([node_id for node_id, _ in order], self.NODE_COLUMNS, keep_missing=True)
+            for (node_id, depth), row in zip(order, rows):
+                # A member deleted after the graph was read hides its whole subtree
+                if skip_below is not None and depth > skip_below:
+                    continue
+                skip_below = None
+                if row is None:
+                    skip_below = depth
+                    continue
+
+                if open_depth >= depth:
+                    yield ']}' * (open_depth - depth + 1) + ','
+                _, nombres, apellidos, cedula, email, phone, created_at = row
+                node = dumps({
+                    'id': node_id,
+                    'nombres': nombres,
+                    'apellidos': apellidos,
+                    'cedula': cedula,
+                    'email': email,
+                    'phone': phone,
+                    'created_at': created_at,
+                    'referrals_count': len(graph.children(node_id)),
+                })
+                # Leave sub_referrals open; it is closed when the walk leaves this member
+                yield node[:-1] + ',"sub_referrals":['
+                open_depth = depth
+            yield ']}' * open_depth + ']'
+
+        fields = {
+            'nombres': sympathizer.nombres,
+            'apellidos': sympathizer.apellidos,
+            'referral_code': sympathizer.referral_code,
+            'referrals_count': len(direct_referrals),
+            'level_counts': self._level_counts(sympathizer),
+        }
+        return streaming_json_response(json_object(fields, raw=[('referrals', referrals())]))
+
 
 class LevelLabelView(APIView):
     """CRUD for per-user level labels."""
     permission_classes = [permissions.IsAuthenticated]
 
+    @method_decorator(conditional(_level_labels_etag))
     def get(self, request):
         try:
             sympathizer = request.user.sympathizer
@@ -397,89 +501,63 @@ class LevelLabelView(APIView):
 class NetworkView(APIView):
     """Network visualization data with optimized tree layout."""
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = GRAPH_RENDERERS
+    NODE_COLUMNS = ('nombres', 'apellidos', 'cedula', 'phone', 'email')
 
+    @staticmethod
+    def _node_data(node_id, nombres, apellidos, cedula, phone, email, type_node, level, referrals_count=0):
+        return {
+            'id': node_id,
+            'nombres': nombres,
+            'apellidos': apellidos,
+            'cedula': cedula,
+            'telefono': phone,
+            'email': email,
+            'referrals_count': referrals_count,
+            'type': type_node,
+            'level': level,
+            'x': 0,
+            'y': 0
+        }
+
+    @method_decorator(conditional(_network_etag))
     def get(self, request):
         try:
             me = request.user.sympathizer
 
+            if wants_stream(request):
+                return self._stream(me)
+
             # Data structures for layout
             nodes_dict = {}
             children_map = {}
 
-            # Helper to create node dict
-            def create_node_data(sympathizer, type_node, level):
-                return {
-                    'id': sympathizer.id,
-                    'nombres': sympathizer.nombres,
-                    'apellidos': sympathizer.apellidos,
-                    'cedula': sympathizer.cedula,
-                    'telefono': sympathizer.phone,
-                    'email': sympathizer.email,
-                    'referrals_count': 0,  # Will be updated later
-                    'type': type_node,
-                    'level': level,
-                    'x': 0,
-                    'y': 0
-                }
-
-            nodes_dict[me.id] = create_node_data(me, 'me', 0)
-            children_map[me.id] = []
+            # Whole downline in one recursive query, breadth-first and ordered by id
+            rows = network_rows(me.id, columns=self.NODE_COLUMNS)
+            for node_id, parent_id, level, nombres, apellidos, cedula, phone, email in rows:
+                nodes_dict[node_id] = self._node_data(
+                    node_id, nombres, apellidos, cedula, phone, email, 'me' if level == 0 else 'referral', level
+                )
+                children_map[node_id] = []
+                if level > 0:
+                    children_map[parent_id].append(node_id)
+                    nodes_dict[parent_id]['referrals_count'] += 1
 
             # Add Sponsor if exists
             if me.referrer:
                 sponsor = me.referrer
-                nodes_dict[sponsor.id] = create_node_data(sponsor, 'sponsor', -1)
+                nodes_dict[sponsor.id] = self._node_data(
+                    sponsor.id, sponsor.nombres, sponsor.apellidos, sponsor.cedula,
+                    sponsor.phone, sponsor.email, 'sponsor', -1
+                )
                 children_map[sponsor.id] = [me.id]
+                rows = [(sponsor.id, None, -1), *rows]
 
-            # Optimized BFS with prefetch
-            visited = {me.id}
-            queue = [(me, 0)]
-
-            while queue:
-                current, level = queue.pop(0)
-
-                # Get children with prefetching
-                direct_referrals = current.referrals.only(
-                    'id', 'nombres', 'apellidos', 'cedula', 'phone', 'email'
-                ).order_by('id')
-
-                current_children_ids = []
-                for ref in direct_referrals:
-                    if ref.id not in visited:
-                        visited.add(ref.id)
-                        nodes_dict[ref.id] = create_node_data(ref, 'referral', level + 1)
-                        children_map[ref.id] = []
-                        current_children_ids.append(ref.id)
-                        queue.append((ref, level + 1))
-
-                children_map[current.id] = current_children_ids
-                # Update referrals count
-                nodes_dict[current.id]['referrals_count'] = len(current_children_ids)
-
-            # Calculate Layout (Reingold-Tilford simplified)
-            next_leaf_x = 0
-            X_SPACING = 100
-
-            def calculate_layout(node_id):
-                nonlocal next_leaf_x
-
-                children = children_map.get(node_id, [])
-
-                if not children:
-                    nodes_dict[node_id]['x'] = next_leaf_x
-                    next_leaf_x += X_SPACING
-                else:
-                    child_xs = []
-                    for child_id in children:
-                        calculate_layout(child_id)
-                        child_xs.append(nodes_dict[child_id]['x'])
-                    nodes_dict[node_id]['x'] = sum(child_xs) / len(child_xs)
-
-            calculate_layout(me.id)
-
-            # If sponsor exists, place it above 'me'
-            if me.referrer and me.referrer.id in nodes_dict:
-                nodes_dict[me.referrer.id]['x'] = nodes_dict[me.id]['x']
+            # Tidy tree layout (iterative Reingold-Tilford), sponsor above 'me'
+            xs, ys = layout_rows(rows)
+            for row, x, y in zip(rows, xs.tolist(), ys.tolist()):
+                nodes_dict[row[0]]['x'] = x
+                nodes_dict[row[0]]['y'] = y
 
             # Construct Response
             final_nodes = list(nodes_dict.values())
@@ -501,6 +579,401 @@ class NetworkView(APIView):
             logger.error(f"Error in NetworkView: {str(e)}")
             return Response({'error': 'Error al cargar la red'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _stream(self, me):
+        """Same payload as get(), emitted node by node from the graph cache and chunked column reads."""
+        graph = get_graph()
+        structure = graph.subtree(me.id)
+        sponsor = me.referrer
+        if sponsor:
+            structure = [(sponsor.id, None, -1), *structure]
+
+        xs, ys = layout_rows(structure)
+        xs, ys = xs.tolist(), ys.tolist()
+        index = {row[0]: position for position, row in enumerate(structure)}
+
+        def nodes():
+            if sponsor:
+                node = self._node_data(
+                    sponsor.id, sponsor.nombres, sponsor.apellidos, sponsor.cedula,
+                    sponsor.phone, sponsor.email, 'sponsor', -1
+                )
+                node['x'], node['y'] = xs[0], ys[0]
+                yield node
+            member_ids = [row[0] for row in structure if row[2] >= 0]
+            for node_id, nombres, apellidos, cedula, phone, email in member_columns(member_ids, self.NODE_COLUMNS):
+                position = index[node_id]
+                level = structure[position][2]
+                node = self._node_data(
+                    node_id, nombres, apellidos, cedula, phone, email, 'me' if level == 0 else 'referral', level,
+                    referrals_count=len(graph.children(node_id)),
+                )
+                node['x'], node['y'] = xs[position], ys[position]
+                yield node
+
+        def links():
+            for node_id, parent_id, level in structure:
+                if parent_id is not None and parent_id in index:
+                    yield {'source': parent_id, 'target': node_id}
+
+        return streaming_json_response(json_object({}, lists=[('nodes', nodes()), ('links', links())]))
+
+
+class NetworkChildrenView(APIView):
+    """
+    Lazy, paginated children of one node in the user's network.
+
+    GET /api/auth/network/<id>/children/?depth=1&cursor=&limit=50
+
+    Returns the members up to ``depth`` levels below the node, ordered by
+    level and id, with their own direct and total counts so the client can
+    decide whether to expand them.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+    MAX_DEPTH = 3
+
+    def get(self, request, pk):
+        try:
+            me = request.user.sympathizer
+        except Sympathizer.DoesNotExist:
+            logger.error(f"Network children accessed by user without sympathizer: {request.user.username}")
+            return Response(
+                {'error': 'Perfil de simpatizante no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            depth = int(request.query_params.get('depth', 1))
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+            after = self._decode_cursor(request.query_params.get('cursor'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+        depth = max(1, min(depth, self.MAX_DEPTH))
+        limit = max(1, min(limit, self.MAX_LIMIT))
+
+        try:
+            node = Sympathizer.objects.only('id', 'path', 'depth').get(pk=pk)
+        except Sympathizer.DoesNotExist:
+            return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        if not me.is_ancestor_of(node):
+            return Response(
+                {'error': 'El usuario no pertenece a tu red'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            members = (
+                Sympathizer.objects.subtree(node.id, max_depth=depth)
+                .filter(depth__gt=node.depth)
+                .order_by('depth', 'id')
+            )
+            if after:
+                after_depth, after_id = after
+                members = members.filter(
+                    Q(depth__gt=after_depth) | Q(depth=after_depth, id__gt=after_id)
+                )
+
+            rows = list(members.values_list(
+                'id', 'referrer_id', 'depth', 'nombres', 'apellidos', 'cedula', 'phone', 'email',
+                'direct_referrals_count', 'descendant_count'
+            )[:limit + 1])
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            children = [
+                {
+                    'id': member_id,
+                    'parent_id': parent_id,
+                    'level': member_depth - node.depth,
+                    'nombres': nombres,
+                    'apellidos': apellidos,
+                    'cedula': cedula,
+                    'telefono': phone,
+                    'email': email,
+                    'referrals_count': direct_count,
+                    'network_size': descendant_count,
+                    'has_children': direct_count > 0,
+                }
+                for (member_id, parent_id, member_depth, nombres, apellidos, cedula, phone, email,
+                     direct_count, descendant_count) in rows
+            ]
+
+            next_cursor = None
+            if has_more:
+                next_cursor = self._encode_cursor(rows[-1][2], rows[-1][0])
+
+            return Response({
+                'id': node.id,
+                'depth': depth,
+                'children': children,
+                'next_cursor': next_cursor,
+            })
+        except Exception as e:
+            logger.error(f"Error in NetworkChildrenView: {str(e)}")
+            return Response({'error': 'Error al cargar la red'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def _encode_cursor(depth, member_id):
+        """Opaque keyset cursor pointing after (depth, id)."""
+        return urlsafe_base64_encode(force_bytes(f"{depth}:{member_id}"))
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        """Get (depth, id) from a cursor, None for the first page. Raises ValueError if malformed."""
+        if not cursor:
+            return None
+        depth, member_id = force_str(urlsafe_base64_decode(cursor)).split(':')
+        return int(depth), int(member_id)
+
+
+class NetworkExportView(APIView):
+    """
+    Download the user's own downline as Excel/CSV.
+
+    GET /api/auth/network/export/?format=csv&member=<id>&max_depth=
+
+    ``member`` (default: the user) must be in the user's network. Each row
+    carries the member's level, sponsor cedula and subtree size; CSV is
+    streamed while the subtree is read.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = EXPORT_RENDERERS
+
+    @method_decorator(ratelimit(key='user', rate='10/m', method='GET', block=True))
+    def get(self, request):
+        try:
+            me = request.user.sympathizer
+        except Sympathizer.DoesNotExist:
+            logger.error(f"Network export requested by user without sympathizer: {request.user.username}")
+            return Response(
+                {'error': 'Perfil de simpatizante no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        export_format = request.query_params.get('format', 'xlsx')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': 'Formato invalido'}, status=status.HTTP_400_BAD_REQUEST)
+        if export_format == 'xlsx' and Workbook is None:
+            return Response({'error': 'openpyxl not installed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        try:
+            member_id = int(request.query_params.get('member', me.id))
+            max_depth = request.query_params.get('max_depth')
+            max_depth = max(0, int(max_depth)) if max_depth else None
+        except (TypeError, ValueError):
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        member = me
+        if member_id != me.id:
+            try:
+                member = Sympathizer.objects.only('id', 'referrer_id', 'path', 'depth').get(pk=member_id)
+            except Sympathizer.DoesNotExist:
+                return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+            if not me.is_ancestor_of(member):
+                return Response(
+                    {'error': 'El usuario no pertenece a tu red'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+        logger.info(f"Network {member.id} {export_format} export started by {request.user.username}")
+        return export_response(
+            network_export_rows(member, max_depth=max_depth), export_format, f"red_{member.id}", NETWORK_HEADERS
+        )
+
+
+class NetworkChangesView(APIView):
+    """
+    Incremental sync of the user's network.
+
+    GET /api/auth/network/changes/?since=<cursor>
+
+    Returns the members added, edited or moved into the network since the
+    cursor (``upserts``, with their current data) and the ids that left it
+    (``removed``, together with the descendants the client knows for them).
+    Apply removals before upserts and keep ``cursor`` for the next call.
+
+    Without ``since``, after the user's own position changed, or when the
+    cursor is older than the kept log, the response has ``reset: true`` and
+    the client reloads the whole network. Fetch a cursor before that
+    download so no change is missed.
+
+    Change ids are taken at insert time but become visible at commit, so a
+    later id can be read before an earlier one commits. The cursor only
+    advances over changes older than REFERRAL_SYNC_SETTLE_SECONDS; newer
+    ones wait for the next call, when lower ids still in flight have
+    committed.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    MAX_CHANGES = 5000
+
+    def get(self, request):
+        try:
+            me = request.user.sympathizer
+        except Sympathizer.DoesNotExist:
+            logger.error(f"Network changes accessed by user without sympathizer: {request.user.username}")
+            return Response(
+                {'error': 'Perfil de simpatizante no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            since = self._decode_cursor(request.query_params.get('since'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Parametros invalidos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            log = NetworkChange.objects.order_by('id').values_list('id', flat=True)
+            settled = timezone.now() - timedelta(seconds=getattr(settings, 'REFERRAL_SYNC_SETTLE_SECONDS', 10))
+            latest = log.filter(created_at__lte=settled).last() or 0
+            if since is None or since[1] != me.path:
+                return self._reset(latest, me)
+
+            since_id = since[0]
+            latest = max(latest, since_id)
+            oldest = log.first()
+            if oldest is not None and since_id < oldest - 1:
+                return self._reset(latest, me)
+
+            changes = list(
+                NetworkChange.objects.filter(id__gt=since_id, id__lte=latest)
+                .filter(Q(path__descendant_of=me.path) | Q(old_path__descendant_of=me.path))
+                .order_by('id').values_list('member_id', 'kind', 'path', 'old_path')[:self.MAX_CHANGES + 1]
+            )
+            if len(changes) > self.MAX_CHANGES:
+                return self._reset(latest, me)
+
+            touched = set()
+            moved_in = set()
+            for member_id, kind, path, old_path in changes:
+                touched.add(member_id)
+                if kind == NetworkChange.UPDATED:
+                    continue
+                # The parent's referral count changed too
+                for changed_path in (path, old_path):
+                    if changed_path and changed_path != me.path and self._within(changed_path, me.path):
+                        touched.add(int(changed_path.split('.')[-2]))
+                if kind == NetworkChange.MOVED and path and self._within(path, me.path):
+                    moved_in.add(member_id)
+
+            # A subtree moved in is sent whole; everything is limited to the current network
+            members = Q(pk__in=touched)
+            for path in Sympathizer.objects.filter(pk__in=moved_in).values_list('path', flat=True):
+                members |= Q(path__descendant_of=path)
+            rows = list(
+                Sympathizer.objects.subtree(me.id).filter(members).order_by('depth', 'id')
+                .values_list('id', 'referrer_id', 'depth', 'nombres', 'apellidos', 'cedula', 'phone',
+                             'email', 'direct_referrals_count')
+            ) if touched else []
+
+            upserts = [
+                {
+                    'id': member_id,
+                    'parent_id': parent_id if member_id != me.id else None,
+                    'level': member_depth - me.depth,
+                    'nombres': nombres,
+                    'apellidos': apellidos,
+                    'cedula': cedula,
+                    'telefono': phone,
+                    'email': email,
+                    'referrals_count': direct_count,
+                }
+                for (member_id, parent_id, member_depth, nombres, apellidos, cedula, phone, email,
+                     direct_count) in rows
+            ]
+            present = {row[0] for row in rows}
+
+            return Response({
+                'cursor': self._encode_cursor(latest, me.path),
+                'reset': False,
+                'upserts': upserts,
+                'removed': sorted(touched - present),
+            })
+        except Exception as e:
+            logger.error(f"Error in NetworkChangesView: {str(e)}")
+            return Response({'error': 'Error al cargar cambios de la red'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _reset(self, latest, me):
+        return Response({
+            'cursor': self._encode_cursor(latest, me.path),
+            'reset': True,
+            'upserts': [],
+            'removed': [],
+        })
+
+    @staticmethod
+    def _within(path, root_path):
+        """Check if ``path`` is ``root_path`` or below it."""
+        return path == root_path or path.startswith(f"{root_path}.")
+
+    @staticmethod
+    def _encode_cursor(change_id, path):
+        """Opaque sync cursor: last settled change id seen and the user's path at that time."""
+        return urlsafe_base64_encode(force_bytes(f"{change_id}:{path}"))
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        """Get (change id, path) from a cursor, None if missing. Raises ValueError if malformed."""
+        if not cursor:
+            return None
+        change_id, path = force_str(urlsafe_base64_decode(cursor)).split(':')
+        return int(change_id), path
+
+
+class NetworkEventsView(View):
+    """
+    Server-Sent Events stream of new members in the user's network.
+
+    GET /api/auth/network/events/?token=<token>
+
+    Sends a ``member_joined`` event with the new node and the user's updated
+    ``referrals_count``/``network_size`` whenever someone joins the subtree,
+    and a comment line every ``KEEPALIVE`` seconds. EventSource cannot set
+    headers, so the auth token may come in the query string. Served by the
+    separate ASGI process (core.asgi); see ``events`` for how events reach it.
+    """
+    KEEPALIVE = 25
+
+    async def get(self, request):
+        key = request.GET.get('token', '')
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Token '):
+            key = header[len('Token '):]
+
+        token = await Token.objects.select_related('user').filter(key=key).afirst() if key else None
+        if token is None or not token.user.is_active:
+            return JsonResponse({'error': 'Credenciales invalidas'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        sympathizer = await Sympathizer.objects.filter(user_id=token.user_id).values('id', 'is_suspended').afirst()
+        if sympathizer is None:
+            return JsonResponse({'error': 'Perfil de simpatizante no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        if sympathizer['is_suspended']:
+            return JsonResponse(
+                {'error': 'Tu cuenta esta suspendida. Contacta al administrador.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        response = StreamingHttpResponse(self._events(sympathizer['id']), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def _events(self, member_id):
+        start_listener()
+        queue = broker.subscribe(member_id)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=self.KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(member_id, queue)
+
 
 class ImportTemplateView(APIView):
     """Download import template Excel file."""
@@ -780,20 +1253,4 @@ class ImportReferralsView(APIView):
 
     def _is_in_network(self, current_user, target_user):
         """Check if target_user is in current_user's network (is a descendant)."""
-        if current_user.id == target_user.id:
-            return True
-
-        # BFS to find if target is a descendant
-        visited = {current_user.id}
-        queue = [current_user]
-
-        while queue:
-            user = queue.pop(0)
-            for referral in user.referrals.only('id'):
-                if referral.id == target_user.id:
-                    return True
-                if referral.id not in visited:
-                    visited.add(referral.id)
-                    queue.append(referral)
-
-        return False
+        return current_user.is_ancestor_of(target_user)
@@ -0,0 +1,71 @@
+"""
+Conditional GET for the network endpoints.
+
+Each view supplies a cheap fingerprint of everything its payload depends on
+(usually the newest ``updated_at`` and member count of the subtree). It is
+sent as ``ETag`` and a matching ``If-None-Match`` is answered with 304
+before the tree is read. Changes in other networks leave the tag alone.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import Sympathizer
+
+
+def subtree_fingerprint(root_id):
+    """
+    Get (latest updated_at, member count) of a subtree in one aggregate query.
+
+    Joins, removals and moves in or out change the count or bring in a
+    newer ``updated_at`` (a moved member is saved with its new referrer),
+    so this is all a subtree payload depends on.
+    """
+    stats = Sympathizer.objects.subtree(root_id).order_by().aggregate(
+        last_update=Max('updated_at'), total=Count('id')
+    )
+    return stats['last_update'], stats['total']
+
+
+def make_etag(request, *parts):
+    """
+    Hash the values a response depends on into an ETag.
+
+    The query string and the negotiated format are always included, so
+    every representation of a resource gets its own tag.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = (
+        *parts,
+        request.GET.urlencode(),
+        renderer.format if renderer is not None else None,
+    )
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def conditional(etag_func):
+    """
+    Django's ``condition`` for APIView methods, for use with method_decorator.
+
+    ``etag_func(request, *args, **kwargs)`` runs after DRF authentication and
+    content negotiation; returning None skips the check. Responses are marked
+    private and must be revalidated, so browsers send ``If-None-Match`` on
+    every refresh.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Accept', 'Authorization'))
+            elif response.has_header('ETag'):
+                del response['ETag']
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,198 @@
+"""
+In-process publish/subscribe of network events for the push stream.
+
+Each open ``/api/auth/network/events/`` connection subscribes an asyncio
+queue under the member id of its user. When a sympathizer is created, every
+listening ancestor gets a ``member_joined`` event with the new node and its
+own updated counts once the insert commits.
+
+The streams are served by a separate ASGI process (``SERVER_ROLE=events``
+in start.sh), while members are created by the WSGI API workers. On
+PostgreSQL the new member's id is therefore sent with ``NOTIFY`` on
+CHANNEL, and every process that has open streams runs one listener thread
+that ``LISTEN``s on it and fans the event out to its own subscribers.
+Other databases (SQLite in development and tests) only fan out within the
+process.
+"""
+import asyncio
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from .models import Sympathizer
+
+logger = logging.getLogger(__name__)
+
+# Events a slow client may have pending before new ones are dropped
+QUEUE_SIZE = 100
+
+# PostgreSQL notification channel shared by all server processes
+CHANNEL = 'referral_network_events'
+# Seconds between checks that the listener connection is still alive
+LISTEN_TIMEOUT = 30
+# Seconds to wait before reconnecting a listener that lost its connection
+RECONNECT_DELAY = 5
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        logger.warning("Network event dropped: subscriber queue full")
+
+
+class NetworkEventBroker:
+    """Thread-safe registry of subscriber queues, keyed by member id."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, member_id):
+        """Register a queue for ``member_id`` on the running event loop and return it."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[member_id].add((loop, queue))
+        return queue
+
+    def unsubscribe(self, member_id, queue):
+        with self._lock:
+            listeners = self._subscribers.get(member_id, set())
+            listeners.difference_update({entry for entry in listeners if entry[1] is queue})
+            if not listeners:
+                self._subscribers.pop(member_id, None)
+
+    def listening(self, member_ids):
+        """Get which of ``member_ids`` have at least one open stream."""
+        with self._lock:
+            return {member_id for member_id in member_ids if member_id in self._subscribers}
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+    def publish(self, member_id, event):
+        """Hand ``event`` to every stream of ``member_id``; safe to call from any thread."""
+        with self._lock:
+            listeners = list(self._subscribers.get(member_id, ()))
+        for loop, queue in listeners:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The connection's loop is already closed
+                self.unsubscribe(member_id, queue)
+
+
+broker = NetworkEventBroker()
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _shared_channel():
+    return connection.vendor == 'postgresql'
+
+
+def start_listener():
+    """Start this process's LISTEN thread once, if events go through PostgreSQL."""
+    global _listener
+    if not _shared_channel():
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, name='referral-events', daemon=True)
+            _listener.start()
+
+
+def _listen():
+    """Deliver CHANNEL notifications to local subscribers, reconnecting on errors."""
+    while True:
+        db = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            db.ensure_connection()
+            db.set_autocommit(True)
+            raw = db.connection
+            with raw.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            while True:
+                if select.select([raw], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                    with raw.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    notification = raw.notifies.pop(0)
+                    try:
+                        publish_member_joined(int(notification.payload))
+                    except Exception as e:
+                        logger.error(f"Error publishing member_joined for {notification.payload}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error in network event listener: {str(e)}")
+        finally:
+            db.close()
+            connection.close()
+        time.sleep(RECONNECT_DELAY)
+
+
+def announce_member_joined(member_id):
+    """
+    Announce a committed new member to the streams of every server process.
+
+    Sends a NOTIFY on PostgreSQL, which each process's listener turns into
+    ``publish_member_joined``; elsewhere publishes in this process directly.
+    """
+    if not _shared_channel():
+        publish_member_joined(member_id)
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, str(member_id)])
+
+
+def publish_member_joined(member_id):
+    """
+    Send a ``member_joined`` event to every ancestor listening in this process.
+
+    Costs nothing while nobody is listening and two small queries otherwise.
+    """
+    if not broker.has_subscribers():
+        return
+
+    member = Sympathizer.objects.filter(pk=member_id).values(
+        'id', 'referrer_id', 'path', 'depth', 'nombres', 'apellidos', 'cedula', 'phone', 'email', 'created_at'
+    ).first()
+    if member is None or not member['path']:
+        return
+
+    ancestor_ids = [int(label) for label in member['path'].split('.')[:-1]]
+    listening = broker.listening(ancestor_ids)
+    if not listening:
+        return
+
+    ancestors = Sympathizer.objects.filter(pk__in=listening).values_list(
+        'id', 'depth', 'direct_referrals_count', 'descendant_count'
+    )
+    for ancestor_id, depth, direct_count, descendant_count in ancestors:
+        broker.publish(ancestor_id, {
+            'type': 'member_joined',
+            'member': {
+                'id': member['id'],
+                'parent_id': member['referrer_id'],
+                'level': member['depth'] - depth,
+                'nombres': member['nombres'],
+                'apellidos': member['apellidos'],
+                'cedula': member['cedula'],
+                'telefono': member['phone'],
+                'email': member['email'],
+                'created_at': member['created_at'],
+                'referrals_count': 0,
+                'network_size': 0,
+                'has_children': False,
+            },
+            'referrals_count': direct_count,
+            'network_size': descendant_count,
+        })
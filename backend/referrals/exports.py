@@ -0,0 +1,230 @@
+"""
+Sympathizer exports in constant memory.
+
+Rows are read with ``values_list(...).iterator()`` a chunk at a time, so no
+model instances are built and the queryset is never cached. CSV is encoded
+as it is read and streamed to the client; XLSX is written by openpyxl in
+write-only mode into a temporary file that spills to disk past
+SPOOL_MAX_SIZE, then sent from there.
+
+Network exports add each member's level, sponsor cedula and subtree size,
+taken from the same single scan of the subtree.
+"""
+import csv
+import logging
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Sympathizer
+from .streaming import BUFFER_SIZE, CHUNK_SIZE
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+except ImportError:  # optional dependency
+    Workbook = None
+
+logger = logging.getLogger(__name__)
+
+# Exports bigger than this are written to disk instead of memory
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+EXPORT_FORMATS = ('xlsx', 'csv')
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+HEADERS = [
+    'ID', 'Nombres', 'Apellidos', 'Cedula', 'Email', 'Telefono',
+    'Sexo', 'Departamento', 'Municipio', 'Codigo Referido',
+    'Referidor', 'Link Activo', 'Suspendido', 'Cuenta Activa',
+    'Fecha Registro', 'Fecha Activacion'
+]
+
+# Network exports: level below the exported member, sponsor cedula and members below
+NETWORK_HEADERS = HEADERS + ['Nivel', 'Cedula Referidor', 'Tamano Red']
+
+EXPORT_COLUMNS = (
+    'id', 'nombres', 'apellidos', 'cedula', 'email', 'phone', 'sexo',
+    'department__name', 'municipio__name', 'referral_code',
+    'referrer_id', 'referrer__nombres', 'referrer__apellidos',
+    'link_enabled', 'is_suspended', 'user__is_active', 'created_at', 'activated_at',
+)
+
+SEX_LABELS = dict(Sympathizer.SEX_CHOICES)
+
+
+def _yes_no(value):
+    return 'Si' if value else 'No'
+
+
+def _date(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def _format_row(values):
+    """Turn EXPORT_COLUMNS values into an export row."""
+    (member_id, nombres, apellidos, cedula, email, phone, sexo,
+     department, municipio, referral_code,
+     referrer_id, referrer_nombres, referrer_apellidos,
+     link_enabled, is_suspended, user_active, created_at, activated_at) = values
+    return [
+        member_id,
+        nombres,
+        apellidos,
+        cedula,
+        email or '',
+        phone,
+        SEX_LABELS.get(sexo, sexo),
+        department or '',
+        municipio or '',
+        referral_code,
+        f"{referrer_nombres} {referrer_apellidos}" if referrer_id else 'Raiz',
+        _yes_no(link_enabled),
+        _yes_no(is_suspended),
+        _yes_no(user_active),
+        _date(created_at),
+        _date(activated_at),
+    ]
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Yield the export row (one value per HEADERS entry) of every sympathizer in ``queryset``."""
+    for values in queryset.values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size):
+        yield _format_row(values)
+
+
+def network_export_rows(root, max_depth=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield the NETWORK_HEADERS row of ``root`` and every member below it.
+
+    The subtree is read in one scan ordered by path, which is a pre-order
+    walk: a member's sponsor is always on the chain of ancestors of the
+    previous row, so the chain is all that is kept to fill in the sponsor
+    cedula. Subtree sizes are the ``descendant_count`` counters.
+    """
+    root_sponsor = ''
+    if root.referrer_id:
+        root_sponsor = Sympathizer.objects.filter(pk=root.referrer_id).values_list('cedula', flat=True).first() or ''
+
+    members = (
+        Sympathizer.objects.subtree(root.id, max_depth=max_depth)
+        .order_by('path')
+        .values_list(*EXPORT_COLUMNS, 'depth', 'descendant_count')
+        .iterator(chunk_size=chunk_size)
+    )
+    ancestors = []
+    for values in members:
+        member_id, cedula, referrer_id = values[0], values[3], values[10]
+        while ancestors and ancestors[-1][0] != referrer_id:
+            ancestors.pop()
+        sponsor = ancestors[-1][1] if ancestors else root_sponsor
+        ancestors.append((member_id, cedula))
+        yield [*_format_row(values[:-2]), values[-2] - root.depth, sponsor, values[-1]]
+
+
+class EchoBuffer:
+    """File-like object handing csv.writer's output back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, headers=HEADERS):
+    """
+    Yield the CSV text of ``headers`` and ``rows`` in pieces of about BUFFER_SIZE.
+
+    Starts with a UTF-8 BOM so Excel opens accented names correctly.
+    """
+    writer = csv.writer(EchoBuffer())
+    buffer = ['\ufeff', writer.writerow(headers)]
+    size = 0
+    count = 0
+    for row in rows:
+        line = writer.writerow(row)
+        buffer.append(line)
+        size += len(line)
+        count += 1
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    yield ''.join(buffer)
+    logger.info(f"CSV export finished: {count} records")
+
+
+def write_xlsx(rows, fileobj, headers=HEADERS):
+    """
+    Write ``headers`` and ``rows`` as an XLSX workbook into ``fileobj``.
+
+    openpyxl's write-only mode keeps one row in memory at a time.
+
+    Returns:
+        int: number of data rows written
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Simpatizantes")
+    # Column widths must be set before the first row in write-only mode
+    for col_num in range(1, len(headers) + 1):
+        sheet.column_dimensions[get_column_letter(col_num)].width = 15
+
+    bold = Font(bold=True)
+    header = []
+    for title in headers:
+        cell = WriteOnlyCell(sheet, value=title)
+        cell.font = bold
+        header.append(cell)
+    sheet.append(header)
+
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(fileobj)
+    return count
+
+
+def spooled_xlsx(rows, headers=HEADERS):
+    """
+    Write an XLSX export into a temporary file, rewound for reading.
+
+    Returns:
+        tuple: (file, number of data rows)
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        count = write_xlsx(rows, spool, headers)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, count
+
+
+def write_export(rows, export_format, fileobj, headers=HEADERS):
+    """Write an export file of the given format into a binary ``fileobj``."""
+    if export_format == 'csv':
+        for chunk in csv_chunks(rows, headers):
+            fileobj.write(chunk.encode('utf-8'))
+    else:
+        write_xlsx(rows, fileobj, headers)
+
+
+def export_response(rows, export_format, name, headers=HEADERS):
+    """
+    Send an export as a download named ``<name>_<timestamp>.<format>``.
+
+    CSV is streamed as the rows are read; XLSX is spooled first.
+    """
+    filename = f"{name}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    if export_format == 'csv':
+        response = StreamingHttpResponse(csv_chunks(rows, headers), content_type=CSV_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    spool, count = spooled_xlsx(rows, headers)
+    logger.info(f"XLSX export finished: {count} records")
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
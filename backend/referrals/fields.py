@@ -0,0 +1,83 @@
+"""
+Custom model fields and expressions for the referral tree.
+"""
+from django.db import models
+
+
+class LtreeField(models.TextField):
+    """
+    Materialized path of sympathizer ids (e.g. "1.5.9").
+
+    Stored as a native ``ltree`` on PostgreSQL and as plain text elsewhere,
+    so the same dotted representation works on both backends.
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'ltree'
+        return super().db_type(connection)
+
+
+@LtreeField.register_lookup
+class DescendantOf(models.Lookup):
+    """
+    ``path__descendant_of=<path>`` matches the node itself and everything below it.
+
+    PostgreSQL uses the GiST-indexed ``<@`` operator. Other backends use a
+    btree range scan: every descendant path sorts between "<path>." and
+    "<path>/" because "/" is the character right after ".".
+    """
+    lookup_name = 'descendant_of'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        params = (*lhs_params, *rhs_params) * 3
+        sql = f"({lhs} = {rhs} OR ({lhs} >= ({rhs} || '.') AND {lhs} < ({rhs} || '/')))"
+        return sql, params
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} <@ ({rhs})::ltree", (*lhs_params, *rhs_params)
+
+
+class PathDepth(models.Func):
+    """Number of ancestors encoded in a path (0 for a root)."""
+    output_field = models.IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"(LENGTH({sql}) - LENGTH(REPLACE({sql}, '.', '')))", (*params, *params)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        template = "(nlevel((%(expressions)s)::ltree) - 1)"
+        return super().as_sql(compiler, connection, template=template, **extra_context)
+
+
+class RebasePath(models.Func):
+    """
+    Replace the first ``strip_levels`` labels of a path with ``new_prefix``.
+
+    ``strip_chars`` is the length of the stripped labels plus their trailing
+    dot, which the text fallback needs to cut the string.
+    """
+    output_field = LtreeField()
+
+    def __init__(self, expression, new_prefix, strip_levels, strip_chars, **extra):
+        self.new_prefix = new_prefix
+        self.strip_levels = strip_levels
+        self.strip_chars = strip_chars
+        super().__init__(expression, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        prefix = f"{self.new_prefix}." if self.new_prefix else ''
+        return f"(%s || SUBSTR({sql}, %s))", (prefix, *params, self.strip_chars + 1)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return (
+            f"((%s)::ltree || subpath({sql}, %s))",
+            (self.new_prefix or '', *params, self.strip_levels),
+        )
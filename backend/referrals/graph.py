@@ -0,0 +1,391 @@
+"""
+Per-process compact cache of the referral forest.
+
+The forest is held as flat ``array`` buffers indexed by a dense slot number
+(the position of the sympathizer id in the sorted id array) instead of model
+instances, so a member costs a few dozen bytes. Children are stored in CSR
+form: the children of slot ``s`` are
+``child_slots[child_offsets[s]:child_offsets[s + 1]]``, ordered by id.
+
+The cache is rebuilt whenever ``NetworkVersion`` moves, which TreeService
+bumps on every insert, reparent and delete. When REFERRAL_GRAPH_SNAPSHOT
+points to a file, the arrays are written there once and every worker maps
+the same file read-only instead of holding its own copy.
+"""
+import heapq
+import logging
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+from .models import NetworkVersion, Sympathizer
+from .queries import subtree_rows
+
+logger = logging.getLogger(__name__)
+
+
+class GraphQueries:
+    """
+    Tree queries shared by the in-memory and the memory-mapped snapshots.
+
+    Subclasses provide ``ids``, ``parent``, ``child_offsets``, ``child_slots``,
+    ``depth``, ``subtree_size`` (indexable int sequences) and ``version``.
+    """
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _find(self, sympathizer_id):
+        slot = bisect_left(self.ids, sympathizer_id)
+        if slot < len(self.ids) and self.ids[slot] == sympathizer_id:
+            return slot
+        return -1
+
+    def children_slots(self, slot):
+        return self.child_slots[self.child_offsets[slot]:self.child_offsets[slot + 1]]
+
+    def __contains__(self, sympathizer_id):
+        return self._find(sympathizer_id) >= 0
+
+    def children(self, sympathizer_id):
+        """Get the direct referral ids of a sympathizer, ordered by id."""
+        slot = self._find(sympathizer_id)
+        if slot < 0:
+            return []
+        return [self.ids[child] for child in self.children_slots(slot)]
+
+    def network_size(self, sympathizer_id):
+        """Get the number of members below a sympathizer (0 if unknown)."""
+        slot = self._find(sympathizer_id)
+        return self.subtree_size[slot] - 1 if slot >= 0 else 0
+
+    def depth_of(self, sympathizer_id):
+        """Get the absolute depth of a sympathizer (0 for roots, None if unknown)."""
+        slot = self._find(sympathizer_id)
+        return self.depth[slot] if slot >= 0 else None
+
+    def subtree(self, root_id, max_depth=None):
+        """
+        Get (id, parent_id, depth) for ``root_id`` and its descendants.
+
+        Rows come in breadth-first order with depth relative to the root,
+        the same shape as ``queries.subtree_rows``.
+        """
+        root_slot = self._find(root_id)
+        if root_slot < 0:
+            return []
+
+        rows = [(root_id, self._parent_id(root_slot), 0)]
+        queue = deque([(root_slot, 0)])
+        while queue:
+            slot, level = queue.popleft()
+            if max_depth is not None and level >= max_depth:
+                continue
+            parent_id = self.ids[slot]
+            for child in self.children_slots(slot):
+                rows.append((self.ids[child], parent_id, level + 1))
+                queue.append((child, level + 1))
+        return rows
+
+    def collapse(self, root_id, budget):
+        """
+        Choose a level-of-detail view of the subtree of ``root_id`` with at most ``budget`` nodes.
+
+        Subtrees are expanded largest first while their children still fit in
+        the budget; every shown member whose descendants stay hidden becomes
+        a cluster.
+
+        Returns:
+            tuple: (rows, clusters) where rows are (id, parent_id, depth)
+                   tuples in breadth-first order like ``subtree`` and clusters
+                   maps a shown member id to (members, height): the size of
+                   its subtree including itself and how many levels it spans
+                   below it.
+        """
+        root_slot = self._find(root_id)
+        if root_slot < 0:
+            return [], {}
+
+        expanded = set()
+        shown = 1
+        candidates = [(-self.subtree_size[root_slot], root_slot)] if self.subtree_size[root_slot] > 1 else []
+        while candidates:
+            _, slot = heapq.heappop(candidates)
+            children = self.children_slots(slot)
+            if shown + len(children) > budget:
+                continue
+            expanded.add(slot)
+            shown += len(children)
+            for child in children:
+                if self.subtree_size[child] > 1:
+                    heapq.heappush(candidates, (-self.subtree_size[child], child))
+
+        rows = [(root_id, self._parent_id(root_slot), 0)]
+        clusters = {}
+        queue = deque([(root_slot, 0)])
+        while queue:
+            slot, level = queue.popleft()
+            if slot not in expanded:
+                if self.subtree_size[slot] > 1:
+                    clusters[self.ids[slot]] = (self.subtree_size[slot], self._height(slot))
+                continue
+            parent_id = self.ids[slot]
+            for child in self.children_slots(slot):
+                rows.append((self.ids[child], parent_id, level + 1))
+                queue.append((child, level + 1))
+        return rows, clusters
+
+    def _height(self, slot):
+        """Number of levels below ``slot`` (0 for a leaf)."""
+        height = 0
+        level_slots = [slot]
+        while True:
+            level_slots = [child for current in level_slots for child in self.children_slots(current)]
+            if not level_slots:
+                return height
+            height += 1
+
+    def _parent_id(self, slot):
+        parent_slot = self.parent[slot]
+        return self.ids[parent_slot] if parent_slot >= 0 else None
+
+
+class CompactGraph(GraphQueries):
+    """Immutable array-backed snapshot of the referral forest."""
+
+    def __init__(self, ids, parent_ids, version=(0, None)):
+        """
+        Args:
+            ids: Sympathizer ids sorted ascending
+            parent_ids: Referrer id for each entry of ``ids`` (None for roots)
+            version: NetworkVersion stamp the snapshot was built from
+        """
+        self.version = version
+        self.ids = array('q', ids)
+        size = len(self.ids)
+
+        # Parent vector by slot (-1 for roots or referrers outside the snapshot)
+        self.parent = array('q', [-1]) * size
+        child_counts = array('q', [0]) * (size + 1)
+        for slot, parent_id in enumerate(parent_ids):
+            if parent_id is None:
+                continue
+            parent_slot = self._find(parent_id)
+            if parent_slot >= 0:
+                self.parent[slot] = parent_slot
+                child_counts[parent_slot + 1] += 1
+
+        # CSR offsets are the running sum of child counts
+        for slot in range(size):
+            child_counts[slot + 1] += child_counts[slot]
+        self.child_offsets = child_counts
+        self.child_slots = array('q', [0]) * self.child_offsets[size]
+        cursor = array('q', self.child_offsets[:size])
+        for slot in range(size):
+            parent_slot = self.parent[slot]
+            if parent_slot >= 0:
+                self.child_slots[cursor[parent_slot]] = slot
+                cursor[parent_slot] += 1
+
+        # Absolute depth and subtree size from one breadth-first pass over every root
+        self.depth = array('i', [0]) * size
+        self.subtree_size = array('q', [1]) * size
+        order = array('q')
+        for slot in range(size):
+            if self.parent[slot] == -1:
+                order.append(slot)
+        head = 0
+        while head < len(order):
+            slot = order[head]
+            head += 1
+            for child in self.children_slots(slot):
+                self.depth[child] = self.depth[slot] + 1
+                order.append(child)
+        for slot in reversed(order):
+            parent_slot = self.parent[slot]
+            if parent_slot >= 0:
+                self.subtree_size[parent_slot] += self.subtree_size[slot]
+
+    @classmethod
+    def from_database(cls):
+        """Build a snapshot from one ordered (id, referrer_id) scan."""
+        version = NetworkVersion.stamp()
+        rows = Sympathizer.objects.order_by('id').values_list('id', 'referrer_id')
+        ids = array('q')
+        parent_ids = []
+        for sympathizer_id, referrer_id in rows.iterator(chunk_size=10000):
+            ids.append(sympathizer_id)
+            parent_ids.append(referrer_id)
+        return cls(ids, parent_ids, version=version)
+
+
+# Snapshot file layout (native byte order): a fixed header followed by the
+# int64 arrays ids[n], parent[n], child_offsets[n + 1], child_slots[m],
+# subtree_size[n] and finally the int32 array depth[n].
+SNAPSHOT_MAGIC = b'RSGRAPH1'
+SNAPSHOT_HEADER = struct.Struct('=8sqqqq')  # magic, version, updated_at (us), n, m
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _stamp_to_micros(updated_at):
+    if updated_at is None:
+        return 0
+    return (updated_at - _EPOCH) // timedelta(microseconds=1)
+
+
+def _micros_to_stamp(micros):
+    if not micros:
+        return None
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def write_snapshot(graph, path):
+    """
+    Dump a graph into the fixed-layout snapshot file.
+
+    The file is written next to ``path`` and moved into place with
+    os.replace(), so readers only ever map a complete snapshot.
+    """
+    version, updated_at = graph.version
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as snapshot:
+        snapshot.write(SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, version, _stamp_to_micros(updated_at), len(graph.ids), len(graph.child_slots)
+        ))
+        for values in (graph.ids, graph.parent, graph.child_offsets, graph.child_slots,
+                       graph.subtree_size, graph.depth):
+            snapshot.write(bytes(values))
+    os.replace(tmp_path, path)
+
+
+class MappedGraph(GraphQueries):
+    """Read-only view over a snapshot file shared by every worker through mmap."""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, updated_micros, size, edges = SNAPSHOT_HEADER.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Archivo de red invalido")
+        self.version = (version, _micros_to_stamp(updated_micros))
+
+        view = memoryview(buffer)
+        offset = SNAPSHOT_HEADER.size
+
+        def take(count, fmt, itemsize):
+            nonlocal offset
+            values = view[offset:offset + count * itemsize].cast(fmt)
+            offset += count * itemsize
+            return values
+
+        self.ids = take(size, 'q', 8)
+        self.parent = take(size, 'q', 8)
+        self.child_offsets = take(size + 1, 'q', 8)
+        self.child_slots = take(edges, 'q', 8)
+        self.subtree_size = take(size, 'q', 8)
+        self.depth = take(size, 'i', 4)
+
+    @classmethod
+    def open(cls, path):
+        """Map a snapshot file, or return None if it is missing or unreadable."""
+        try:
+            with open(path, 'rb') as snapshot:
+                buffer = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(buffer)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Referral graph snapshot not usable ({path}): {str(e)}")
+            return None
+
+
+@contextmanager
+def _snapshot_lock(path):
+    """Serialize snapshot rebuilds across worker processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_graph(stamp):
+    """Get a graph for ``stamp``, sharing the snapshot file between workers when configured."""
+    path = getattr(settings, 'REFERRAL_GRAPH_SNAPSHOT', '')
+    if not path:
+        return CompactGraph.from_database()
+
+    graph = MappedGraph.open(path)
+    if graph is not None and graph.version == stamp:
+        return graph
+
+    with _snapshot_lock(path):
+        # Another worker may have written it while we waited for the lock
+        graph = MappedGraph.open(path)
+        if graph is None or graph.version != stamp:
+            write_snapshot(CompactGraph.from_database(), path)
+            graph = MappedGraph.open(path)
+    return graph or CompactGraph.from_database()
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    """
+    Get this process's graph snapshot, reloading it if NetworkVersion moved.
+
+    Costs one single-row query per call when the cache is fresh. With a
+    snapshot file only the first worker to notice a change rebuilds it; the
+    rest map the new file.
+    """
+    global _graph
+
+    version = NetworkVersion.stamp()
+    graph = _graph
+    if graph is not None and graph.version == version:
+        return graph
+
+    with _graph_lock:
+        if _graph is None or _graph.version != version:
+            _graph = _load_graph(version)
+            logger.info(f"Referral graph cache loaded: {len(_graph)} members, version {_graph.version[0]}")
+        return _graph
+
+
+def network_rows(root_id, max_depth=None, columns=()):
+    """
+    Get (id, parent_id, depth, *columns) rows for a subtree.
+
+    Structure comes from the in-memory graph and the requested columns from
+    one indexed path scan. Falls back to the recursive CTE when the cache is
+    disabled with REFERRAL_GRAPH_CACHE=False.
+    """
+    if not getattr(settings, 'REFERRAL_GRAPH_CACHE', True):
+        return subtree_rows(root_id, max_depth=max_depth, columns=columns)
+
+    structure = get_graph().subtree(root_id, max_depth=max_depth)
+    if not columns:
+        return structure
+
+    values = {
+        row[0]: row[1:]
+        for row in Sympathizer.objects.subtree(root_id, max_depth=max_depth)
+        .order_by().values_list('id', *columns)
+    }
+    return [(*row, *values[row[0]]) for row in structure if row[0] in values]
@@ -0,0 +1,144 @@
+"""
+Subtree exports for graph tools (Gephi, NetworkX).
+
+Formats:
+
+- ``csv``: edge list, ``Source,Target`` plus the target's attributes (every
+  member but the exported one is the target of exactly one edge)
+- ``graphml``: GraphML, nodes and edges interleaved in tree order
+- ``gexf``: GEXF 1.3, which needs all nodes before the edges; the edges are
+  spooled to a temporary file during the node pass and appended after it
+
+Node attributes are ``level`` (below the exported member), ``municipality``
+and ``activated``. Everything comes from one subtree query read with a
+server-side iterator and is encoded as it is read, so memory use does not
+depend on the size of the network.
+"""
+import csv
+import tempfile
+from xml.sax.saxutils import escape, quoteattr
+
+from .exports import EchoBuffer
+from .models import Sympathizer
+from .streaming import BUFFER_SIZE, CHUNK_SIZE
+
+GRAPH_FORMATS = ('csv', 'graphml', 'gexf')
+GRAPH_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'graphml': 'application/graphml+xml; charset=utf-8',
+    'gexf': 'application/gexf+xml; charset=utf-8',
+}
+EDGE_LIST_HEADERS = ['Source', 'Target', 'Label', 'Level', 'Municipality', 'Activated']
+
+
+def graph_members(root, max_depth=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield (id, parent id, label, level, municipality, activated) for ``root`` and its subtree.
+
+    Parents come before their children. The parent id is None for ``root``.
+    """
+    members = (
+        Sympathizer.objects.subtree(root.id, max_depth=max_depth)
+        .order_by('path')
+        .values_list('id', 'referrer_id', 'nombres', 'apellidos', 'depth', 'municipio__name', 'activated_at')
+        .iterator(chunk_size=chunk_size)
+    )
+    for member_id, referrer_id, nombres, apellidos, depth, municipio, activated_at in members:
+        yield (
+            member_id,
+            referrer_id if member_id != root.id else None,
+            f"{nombres} {apellidos}",
+            depth - root.depth,
+            municipio or '',
+            activated_at is not None,
+        )
+
+
+def _buffered(pieces):
+    """Join small text pieces into chunks of about BUFFER_SIZE."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _edge_list(members):
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(EDGE_LIST_HEADERS)
+    for member_id, parent_id, label, level, municipality, activated in members:
+        if parent_id is not None:
+            yield writer.writerow([parent_id, member_id, label, level, municipality, 'true' if activated else 'false'])
+
+
+def _graphml(members):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+        '<key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+        '<key id="level" for="node" attr.name="level" attr.type="int"/>\n'
+        '<key id="municipality" for="node" attr.name="municipality" attr.type="string"/>\n'
+        '<key id="activated" for="node" attr.name="activated" attr.type="boolean"/>\n'
+        '<graph id="red" edgedefault="directed">\n'
+    )
+    for member_id, parent_id, label, level, municipality, activated in members:
+        yield (
+            f'<node id="{member_id}">'
+            f'<data key="label">{escape(label)}</data>'
+            f'<data key="level">{level}</data>'
+            f'<data key="municipality">{escape(municipality)}</data>'
+            f'<data key="activated">{"true" if activated else "false"}</data>'
+            f'</node>\n'
+        )
+        if parent_id is not None:
+            yield f'<edge source="{parent_id}" target="{member_id}"/>\n'
+    yield '</graph>\n</graphml>\n'
+
+
+def _gexf(members):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gexf xmlns="http://gexf.net/1.3" version="1.3">\n'
+        '<graph defaultedgetype="directed" mode="static">\n'
+        '<attributes class="node">\n'
+        '<attribute id="level" title="level" type="integer"/>\n'
+        '<attribute id="municipality" title="municipality" type="string"/>\n'
+        '<attribute id="activated" title="activated" type="boolean"/>\n'
+        '</attributes>\n'
+        '<nodes>\n'
+    )
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as edges:
+        edge_count = 0
+        for member_id, parent_id, label, level, municipality, activated in members:
+            yield (
+                f'<node id="{member_id}" label={quoteattr(label)}><attvalues>'
+                f'<attvalue for="level" value="{level}"/>'
+                f'<attvalue for="municipality" value={quoteattr(municipality)}/>'
+                f'<attvalue for="activated" value="{"true" if activated else "false"}"/>'
+                f'</attvalues></node>\n'
+            )
+            if parent_id is not None:
+                edges.write(f'<edge id="{edge_count}" source="{parent_id}" target="{member_id}"/>\n')
+                edge_count += 1
+        yield '</nodes>\n<edges>\n'
+        edges.seek(0)
+        while True:
+            chunk = edges.read(BUFFER_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    yield '</edges>\n</graph>\n</gexf>\n'
+
+
+_WRITERS = {'csv': _edge_list, 'graphml': _graphml, 'gexf': _gexf}
+
+
+def graph_chunks(root, graph_format, max_depth=None):
+    """Yield the subtree of ``root`` encoded as ``graph_format``, in chunks of about BUFFER_SIZE."""
+    return _buffered(_WRITERS[graph_format](graph_members(root, max_depth=max_depth)))
@@ -0,0 +1,454 @@
+"""
+Tidy tree layout for the network visualizations.
+
+Implements the Reingold-Tilford algorithm in the linear-time form described
+by Buchheim, Junger and Leipert ("Improving Walker's Algorithm to Run in
+Linear Time"), without recursion: subtrees are placed deepest level first
+and the right contour of the left siblings is followed through threads.
+The final coordinates are resolved level by level with NumPy.
+
+The admin visualization additionally relaxes the tree into a force-directed
+layout (Fruchterman-Reingold with grid-based Barnes-Hut repulsion), cached
+per network and keyed on that network's own fingerprint, so changes in
+other networks keep it.
+"""
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .conditional import subtree_fingerprint
+
+logger = logging.getLogger(__name__)
+
+X_SPACING = 100
+Y_SPACING = 100
+FORCE_ITERATIONS = 30
+FORCE_LAYOUT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def tidy_tree(parent, depth, distance=1.0):
+    """
+    Compute horizontal positions for a forest given as parent indexes.
+
+    Args:
+        parent: Parent index of every node (-1 for roots). Siblings keep the
+                order in which they appear.
+        depth: Depth of every node (roots at 0)
+        distance: Minimum horizontal gap between neighbouring nodes
+
+    Returns:
+        numpy.ndarray: x of every node, leftmost node at 0
+    """
+    parent = np.asarray(parent, dtype=np.int64)
+    depth = np.asarray(depth, dtype=np.int64)
+    size = len(parent)
+    if size == 0:
+        return np.zeros(0)
+
+    # Several roots hang from one virtual root so they are laid out side by side
+    roots = np.flatnonzero(parent < 0)
+    if len(roots) > 1:
+        parent = np.append(np.where(parent < 0, size, parent), -1)
+        depth = np.append(depth + 1, 0)
+    total = len(parent)
+
+    # Children grouped by parent (CSR), keeping input order among siblings
+    child_nodes = np.flatnonzero(parent >= 0)
+    child_slots = child_nodes[np.argsort(parent[child_nodes], kind='stable')]
+    offsets = np.zeros(total + 1, dtype=np.int64)
+    np.cumsum(np.bincount(parent[child_nodes], minlength=total), out=offsets[1:])
+    number = np.zeros(total, dtype=np.int64)
+    number[child_slots] = np.arange(len(child_slots)) - offsets[parent[child_slots]]
+
+    internal = np.flatnonzero(offsets[1:] > offsets[:-1])
+    internal = internal[np.argsort(-depth[internal], kind='stable')]
+
+    prelim, mod = _first_walk(
+        parent.tolist(), offsets.tolist(), child_slots.tolist(), number.tolist(), internal.tolist(), distance
+    )
+
+    # Second walk: x = prelim + sum of mod over the proper ancestors, one level at a time
+    prelim = np.array(prelim)
+    mod = np.array(mod)
+    mod_sum = np.zeros(total)
+    by_depth = np.argsort(depth, kind='stable')
+    level_starts = np.searchsorted(depth[by_depth], np.arange(1, depth.max() + 1))
+    for level in np.split(by_depth, level_starts)[1:]:
+        level = level[parent[level] >= 0]
+        parents = parent[level]
+        mod_sum[level] = mod_sum[parents] + mod[parents]
+
+    x = (prelim + mod_sum)[:size]
+    return x - x.min()
+
+
+def _first_walk(parent, offsets, child_slots, number, internal, distance):
+    """
+    Bottom-up pass: preliminary x and modifier of every node.
+
+    ``internal`` lists the nodes that have children, deepest first, so every
+    subtree is finished before its parent places it next to its siblings.
+    """
+    total = len(parent)
+    prelim = [0.0] * total
+    mod = [0.0] * total
+    shift = [0.0] * total
+    change = [0.0] * total
+    thread = [-1] * total
+    ancestor = list(range(total))
+    midpoint = [0.0] * total
+
+    def next_left(node):
+        return child_slots[offsets[node]] if offsets[node + 1] > offsets[node] else thread[node]
+
+    def next_right(node):
+        return child_slots[offsets[node + 1] - 1] if offsets[node + 1] > offsets[node] else thread[node]
+
+    def apportion(node, left_sibling, leftmost, default_ancestor):
+        # Inner/outer contours of the left forest (l) and of the new subtree (r)
+        vir = vor = node
+        vil, vol = left_sibling, leftmost
+        sir = sor = mod[node]
+        sil, sol = mod[vil], mod[vol]
+        right_of_vil, left_of_vir = next_right(vil), next_left(vir)
+        while right_of_vil >= 0 and left_of_vir >= 0:
+            vil, vir = right_of_vil, left_of_vir
+            vol, vor = next_left(vol), next_right(vor)
+            ancestor[vor] = node
+            gap = (prelim[vil] + sil) - (prelim[vir] + sir) + distance
+            if gap > 0:
+                moved = ancestor[vil]
+                if parent[moved] != parent[node]:
+                    moved = default_ancestor
+                subtrees = number[node] - number[moved]
+                change[node] -= gap / subtrees
+                shift[node] += gap
+                change[moved] += gap / subtrees
+                prelim[node] += gap
+                mod[node] += gap
+                sir += gap
+                sor += gap
+            sil += mod[vil]
+            sir += mod[vir]
+            sol += mod[vol]
+            sor += mod[vor]
+            right_of_vil, left_of_vir = next_right(vil), next_left(vir)
+
+        if right_of_vil >= 0 and next_right(vor) < 0:
+            thread[vor] = right_of_vil
+            mod[vor] += sil - sor
+        if left_of_vir >= 0 and next_left(vol) < 0:
+            thread[vol] = left_of_vir
+            mod[vol] += sir - sol
+            default_ancestor = node
+        return default_ancestor
+
+    for node in internal:
+        children = child_slots[offsets[node]:offsets[node + 1]]
+        leftmost = children[0]
+        default_ancestor = leftmost
+        left_sibling = -1
+        for child in children:
+            if left_sibling < 0:
+                prelim[child] = midpoint[child]
+            else:
+                prelim[child] = prelim[left_sibling] + distance
+                mod[child] = prelim[child] - midpoint[child] if offsets[child + 1] > offsets[child] else 0.0
+                default_ancestor = apportion(child, left_sibling, leftmost, default_ancestor)
+            left_sibling = child
+
+        # Spread the accumulated shifts over the children, right to left
+        total_shift = total_change = 0.0
+        for child in reversed(children):
+            prelim[child] += total_shift
+            mod[child] += total_shift
+            total_change += change[child]
+            total_shift += shift[child] + total_change
+        midpoint[node] = (prelim[leftmost] + prelim[children[-1]]) / 2
+
+    for node in range(total):
+        if parent[node] < 0:
+            prelim[node] = midpoint[node]
+    return prelim, mod
+
+
+def _row_arrays(rows):
+    """Parent indexes and levels of (id, parent_id, level, ...) rows; unknown parents become roots."""
+    index = {row[0]: position for position, row in enumerate(rows)}
+    parent = np.fromiter(
+        (index.get(row[1], -1) for row in rows), dtype=np.int64, count=len(rows)
+    )
+    levels = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+    return parent, levels
+
+
+def layout_rows(rows, x_spacing=X_SPACING, y_spacing=Y_SPACING):
+    """
+    Lay out (id, parent_id, level, ...) rows such as ``network_rows`` returns.
+
+    Rows whose parent is not part of ``rows`` are treated as roots.
+
+    Returns:
+        tuple: (xs, ys) numpy arrays aligned with ``rows``
+    """
+    if len(rows) == 0:
+        return np.zeros(0), np.zeros(0)
+    parent, levels = _row_arrays(rows)
+
+    # Depth inside this forest; rows may start below level 0 (e.g. a sponsor at -1)
+    depth = levels - levels.min()
+    xs = tidy_tree(parent, depth) * x_spacing
+    ys = levels * y_spacing
+    return xs, ys
+
+
+def _grid_cells(x, y, origin_x, origin_y, side, level):
+    """Cell coordinates of every point in a 2^level x 2^level grid over the bounding square."""
+    cells = 1 << level
+    scale = cells / side
+    cx = np.clip(((x - origin_x) * scale).astype(np.int64), 0, cells - 1)
+    cy = np.clip(((y - origin_y) * scale).astype(np.int64), 0, cells - 1)
+    return cx, cy
+
+
+def _cell_centers(x, y, cx, cy, cells):
+    """Occupied cells of a grid level: (cell id of every point, ids, mass, centre x, centre y)."""
+    cell_id = cx * cells + cy
+    occupied, point_cell, mass = np.unique(cell_id, return_inverse=True, return_counts=True)
+    center_x = np.bincount(point_cell, weights=x) / mass
+    center_y = np.bincount(point_cell, weights=y) / mass
+    return point_cell, occupied, mass.astype(float), center_x, center_y
+
+
+def _repulsion(x, y, strength):
+    """
+    Barnes-Hut style repulsive forces in O(n log n).
+
+    A quadtree is laid over the points as a stack of uniform grids. At each
+    level a cell is repelled by the far cells of that level (the
+    children of its parent's neighbours that are not its own neighbours)
+    through their centre of mass, evaluated at the centre of the next finer
+    cell. At the finest level points interact with far cells directly and
+    with the points of their 3x3 neighbourhood exactly, so every pair is
+    accounted for exactly once.
+    """
+    size = len(x)
+    fx = np.zeros(size)
+    fy = np.zeros(size)
+    origin_x, origin_y = x.min(), y.min()
+    side = max(x.max() - origin_x, y.max() - origin_y) + 1e-9
+    finest = int(min(10, max(2, np.ceil(np.log(size) / np.log(4)))))
+
+    def push(target_x, target_y, source_x, source_y, mass, targets, count):
+        # Force strength * mass / distance away from each source, summed per target
+        dx = target_x[targets] - source_x
+        dy = target_y[targets] - source_y
+        factor = strength * mass / (dx * dx + dy * dy + 1e-2)
+        return (
+            np.bincount(targets, weights=dx * factor, minlength=count),
+            np.bincount(targets, weights=dy * factor, minlength=count),
+        )
+
+    grids = [_grid_cells(x, y, origin_x, origin_y, side, level) for level in range(finest + 1)]
+    offsets = np.arange(-2, 4)
+    for level in range(2, finest + 1):
+        cells = 1 << level
+        cx, cy = grids[level]
+        _, source_ids, source_mass, source_x, source_y = _cell_centers(x, y, cx, cy, cells)
+
+        # Targets: occupied cells one level finer, or the points themselves at the finest level
+        if level < finest:
+            point_cell, _, _, target_x, target_y = _cell_centers(x, y, *grids[level + 1], cells * 2)
+            first = np.zeros(len(target_x), dtype=np.int64)
+            first[point_cell] = np.arange(size)
+            tcx, tcy = cx[first], cy[first]
+        else:
+            point_cell, target_x, target_y, tcx, tcy = None, x, y, cx, cy
+
+        # Far cells: children of the parent's 3x3 neighbourhood that are not adjacent
+        nx = (tcx >> 1)[:, None, None] * 2 + offsets[None, :, None]
+        ny = (tcy >> 1)[:, None, None] * 2 + offsets[None, None, :]
+        far = (
+            (nx >= 0) & (nx < cells) & (ny >= 0) & (ny < cells)
+            & ((np.abs(nx - tcx[:, None, None]) > 1) | (np.abs(ny - tcy[:, None, None]) > 1))
+        )
+        targets, ix, iy = np.nonzero(far)
+        lookup = np.full(cells * cells, -1, dtype=np.int64)
+        lookup[source_ids] = np.arange(len(source_ids))
+        slot = lookup[nx[targets, ix, 0] * cells + ny[targets, 0, iy]]
+        occupied = slot >= 0
+        targets, slot = targets[occupied], slot[occupied]
+        level_fx, level_fy = push(
+            target_x, target_y, source_x[slot], source_y[slot], source_mass[slot], targets, len(target_x)
+        )
+        if point_cell is None:
+            fx += level_fx
+            fy += level_fy
+        else:
+            fx += level_fx[point_cell]
+            fy += level_fy[point_cell]
+
+    # Near field: exact pairs within the 3x3 neighbourhood at the finest level
+    cells = 1 << finest
+    cx, cy = grids[finest]
+    cell_id = cx * cells + cy
+    order = np.argsort(cell_id, kind='stable')
+    starts = np.zeros(cells * cells + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cell_id, minlength=cells * cells), out=starts[1:])
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            ncx, ncy = cx + dx, cy + dy
+            points = np.flatnonzero((ncx >= 0) & (ncx < cells) & (ncy >= 0) & (ncy < cells))
+            neighbour = ncx[points] * cells + ncy[points]
+            begin = starts[neighbour]
+            counts = starts[neighbour + 1] - begin
+            targets = np.repeat(points, counts)
+            run_starts = np.repeat(begin - (np.cumsum(counts) - counts), counts)
+            sources = order[run_starts + np.arange(counts.sum())]
+            keep = sources != targets
+            targets, sources = targets[keep], sources[keep]
+            near_fx, near_fy = push(x, y, x[sources], y[sources], 1.0, targets, size)
+            fx += near_fx
+            fy += near_fy
+    return fx, fy
+
+
+def force_layout(parent, x, y, iterations=FORCE_ITERATIONS, edge_length=X_SPACING):
+    """
+    Relax a seeded layout with Fruchterman-Reingold forces and Barnes-Hut repulsion.
+
+    Args:
+        parent: Parent index of every node (-1 for roots)
+        x, y: Starting positions, usually from the tree layout
+        iterations: Number of cooling steps
+        edge_length: Ideal distance between linked nodes
+
+    Returns:
+        tuple: (x, y) numpy arrays
+    """
+    parent = np.asarray(parent, dtype=np.int64)
+    x = np.array(x, dtype=float)
+    y = np.array(y, dtype=float)
+    size = len(parent)
+    if size < 2:
+        return x, y
+
+    # Tiny deterministic jitter so nodes sharing a position can separate
+    jitter = np.random.default_rng(0)
+    x += jitter.uniform(-0.5, 0.5, size)
+    y += jitter.uniform(-0.5, 0.5, size)
+
+    children = np.flatnonzero(parent >= 0)
+    parents = parent[children]
+    temperature = edge_length * 2.0
+    cooling = temperature / iterations
+
+    for _ in range(iterations):
+        fx, fy = _repulsion(x, y, edge_length * edge_length)
+
+        # Springs: attraction distance^2 / edge_length along every link
+        dx = x[children] - x[parents]
+        dy = y[children] - y[parents]
+        dist = np.sqrt(dx * dx + dy * dy) + 1e-9
+        pull = dist / edge_length
+        fx -= np.bincount(children, weights=dx * pull, minlength=size)
+        fy -= np.bincount(children, weights=dy * pull, minlength=size)
+        fx += np.bincount(parents, weights=dx * pull, minlength=size)
+        fy += np.bincount(parents, weights=dy * pull, minlength=size)
+
+        # Move at most ``temperature`` per step
+        length = np.sqrt(fx * fx + fy * fy) + 1e-9
+        step = np.minimum(length, temperature) / length
+        x += fx * step
+        y += fy * step
+        temperature = max(temperature - cooling, 1.0)
+
+    return x, y
+
+
+def force_layout_rows(rows, iterations=FORCE_ITERATIONS, edge_length=X_SPACING):
+    """
+    Force-directed positions for (id, parent_id, level, ...) rows.
+
+    The simulation starts from a radial version of the tidy tree layout
+    (tree order as the angle, depth as the radius), which is already free
+    of crossings, so a few dozen cooling steps are enough.
+
+    Returns:
+        tuple: (xs, ys) numpy arrays aligned with ``rows``
+    """
+    if len(rows) == 0:
+        return np.zeros(0), np.zeros(0)
+    parent, levels = _row_arrays(rows)
+    depth = levels - levels.min()
+    tree_x = tidy_tree(parent, depth)
+    angle = 2 * np.pi * tree_x / (tree_x.max() + 1)
+    radius = depth * edge_length
+    return force_layout(parent, radius * np.cos(angle), radius * np.sin(angle), iterations, edge_length)
+
+
+_pending_layouts = set()
+_pending_lock = threading.Lock()
+
+
+def _force_layout_key(root_id, variant):
+    last_update, total = subtree_fingerprint(root_id)
+    stamp = last_update.timestamp() if last_update else 0
+    return f"referrals:force-layout:{root_id}:{variant}:{total}:{stamp}"
+
+
+def has_cached_force_layout(root_id, variant=''):
+    """Check if the force layout of a network is cached for its current contents."""
+    return cache.has_key(_force_layout_key(root_id, variant))
+
+
+def cached_force_layout(root_id, rows, variant=''):
+    """
+    Get force-directed positions for a network, computed once per subtree fingerprint.
+
+    The key is the newest ``updated_at`` and member count below ``root_id``:
+    joins, moves and removals in the network change it, changes elsewhere
+    do not.
+
+    ``variant`` tells apart different views of the same network, such as
+    level-of-detail views with another focus or node budget.
+
+    Networks up to REFERRAL_FORCE_LAYOUT_INLINE_MAX members are laid out in
+    the request; bigger ones are computed in a background thread while the
+    caller falls back to the tree layout.
+
+    Returns:
+        dict: {id: (x, y)}, or None while a background computation is running
+    """
+    key = _force_layout_key(root_id, variant)
+    positions = cache.get(key)
+    if positions is not None:
+        return positions
+
+    def compute():
+        xs, ys = force_layout_rows(rows)
+        result = {row[0]: (x, y) for row, x, y in zip(rows, xs.tolist(), ys.tolist())}
+        cache.set(key, result, FORCE_LAYOUT_CACHE_TIMEOUT)
+        return result
+
+    if len(rows) <= getattr(settings, 'REFERRAL_FORCE_LAYOUT_INLINE_MAX', 2000):
+        return compute()
+
+    def compute_in_background():
+        try:
+            compute()
+            logger.info(f"Force layout cached for network {root_id}: {len(rows)} members")
+        except Exception as e:
+            logger.error(f"Error computing force layout for network {root_id}: {str(e)}")
+        finally:
+            with _pending_lock:
+                _pending_layouts.discard(key)
+
+    with _pending_lock:
+        if key not in _pending_layouts:
+            _pending_layouts.add(key)
+            threading.Thread(target=compute_in_background, daemon=True).start()
+    return None
@@ -0,0 +1,68 @@
+"""
+Django management command to time the tree layout on synthetic networks.
+Usage:
+    python manage.py benchmark_tree_layout
+    python manage.py benchmark_tree_layout --nodes 100000 --repeat 3
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from referrals.layout import tidy_tree
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the Reingold-Tilford tree layout on random, bushy and chain-shaped trees.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=100000, help='Nodes per synthetic tree')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per tree shape (best time is shown)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed')
+
+    def handle(self, *args, **options):
+        size = options['nodes']
+        rng = random.Random(options['seed'])
+        shapes = {
+            # Uniform random attachment: shallow and wide
+            'random': lambda index: rng.randrange(index),
+            # Attach to one of the latest members: long, narrow referral chains
+            'recent': lambda index: rng.randrange(max(0, index - 5), index),
+            # Single chain: the worst case for a recursive layout
+            'chain': lambda index: index - 1,
+        }
+
+        for name, pick_parent in shapes.items():
+            parent, depth = self._build_tree(size, pick_parent)
+            best = min(self._time(parent, depth) for _ in range(options['repeat']))
+            self.stdout.write(
+                f'{name:>7}: {size} nodes, depth {max(depth)}, '
+                f'{best * 1000:.0f} ms ({size / best:,.0f} nodes/s)'
+            )
+
+    @staticmethod
+    def _build_tree(size, pick_parent):
+        """Generate a tree and return it in breadth-first order as (parent, depth) lists."""
+        children = [[] for _ in range(size)]
+        for index in range(1, size):
+            children[pick_parent(index)].append(index)
+
+        order = [0]
+        for node in order:
+            order.extend(children[node])
+        position = [0] * size
+        for slot, node in enumerate(order):
+            position[node] = slot
+
+        parent = [-1] * size
+        depth = [0] * size
+        for node in order:
+            for child in children[node]:
+                parent[position[child]] = position[node]
+                depth[position[child]] = depth[position[node]] + 1
+        return parent, depth
+
+    @staticmethod
+    def _time(parent, depth):
+        started = time.perf_counter()
+        tidy_tree(parent, depth)
+        return time.perf_counter() - started
@@ -0,0 +1,90 @@
+"""
+Django management command to time the admin user search on a synthetic table.
+Usage:
+    python manage.py benchmark_user_search
+    python manage.py benchmark_user_search --rows 1000000 --repeat 5 --query "jesus" --query "1000012"
+
+Builds a temporary table with the sympathizer search columns and the same
+indexes as migration 0016, then compares the indexed search with the old
+``icontains`` ORs. Nothing is written to the real tables.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from referrals.search import search_condition
+
+TABLE = 'benchmark_sympathizer'
+DEFAULT_QUERIES = ['jesus', 'gonzalez', 'maria rodrig', 'gonzales', 'example.com', '1000012']
+FIRST_NAMES = ['Jesús', 'María', 'José', 'Ángela', 'Luis', 'Sofía', 'Andrés', 'Lucía', 'Julián', 'Camila']
+LAST_NAMES = ['González', 'Rodríguez', 'Pérez', 'Martínez', 'Gómez', 'López', 'Díaz', 'Muñoz', 'Castaño', 'Ríos']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the trigram admin search against icontains on a synthetic PostgreSQL table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Rows in the synthetic table')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (best time is shown)')
+        parser.add_argument('--query', action='append', dest='queries', help='Search text (repeatable)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The search benchmark needs PostgreSQL (pg_trgm and unaccent)')
+
+        rows = options['rows']
+        with transaction.atomic(), connection.cursor() as cursor:
+            started = time.perf_counter()
+            self._build_table(cursor, rows)
+            self.stdout.write(f'Built {rows:,} rows with indexes in {time.perf_counter() - started:.1f} s')
+
+            for query in options['queries'] or DEFAULT_QUERIES:
+                sql, params = search_condition(TABLE, query)
+                indexed, matches = self._time(cursor, sql, params, options['repeat'])
+                legacy, legacy_matches = self._time(cursor, *self._legacy_condition(query), options['repeat'])
+                self.stdout.write(
+                    f'{query!r:>16}: indexed {indexed * 1000:8.1f} ms ({matches} rows), '
+                    f'icontains {legacy * 1000:8.1f} ms ({legacy_matches} rows)'
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _build_table(cursor, rows):
+        first_names = "ARRAY[" + ', '.join(f"'{name}'" for name in FIRST_NAMES) + "]"
+        last_names = "ARRAY[" + ', '.join(f"'{name}'" for name in LAST_NAMES) + "]"
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {TABLE} ON COMMIT DROP AS "
+            f"SELECT g AS id, "
+            f"({first_names})[1 + (g * 7) %% {len(FIRST_NAMES)}]::varchar(100) AS nombres, "
+            f"(({last_names})[1 + (g * 13) %% {len(LAST_NAMES)}] || ' ' || "
+            f"({last_names})[1 + (g / 10) %% {len(LAST_NAMES)}])::varchar(100) AS apellidos, "
+            f"(1000000000 + g)::text::varchar(20) AS cedula, "
+            f"CASE WHEN g %% 3 = 0 THEN NULL ELSE 'user' || g || '@example.com' END::varchar(254) AS email "
+            f"FROM generate_series(1, %s) AS g",
+            [rows],
+        )
+        cursor.execute(
+            f"CREATE INDEX ON {TABLE} USING GIN "
+            f"((f_unaccent(lower(nombres || ' ' || apellidos || ' ' || coalesce(email, '')))) gin_trgm_ops)"
+        )
+        cursor.execute(f"CREATE INDEX ON {TABLE} (cedula varchar_pattern_ops)")
+        cursor.execute(f"ANALYZE {TABLE}")
+
+    @staticmethod
+    def _legacy_condition(query):
+        """The icontains ORs the admin views used before the trigram index."""
+        columns = ('nombres', 'apellidos', 'cedula', 'email')
+        sql = ' OR '.join(f'UPPER({TABLE}.{column}::text) LIKE UPPER(%s)' for column in columns)
+        return f'({sql})', [f'%{query}%'] * len(columns)
+
+    @staticmethod
+    def _time(cursor, sql, params, repeat):
+        """Best time of a paginated search (first 20 rows) plus the total match count."""
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(f"SELECT id FROM {TABLE} WHERE {sql} ORDER BY id DESC LIMIT 20", params)
+            cursor.fetchall()
+            best = min(best, time.perf_counter() - started)
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE {sql}", params)
+        return best, cursor.fetchone()[0]
@@ -0,0 +1,43 @@
+"""
+Django management command to export a network for graph tools.
+Usage:
+    python manage.py export_network_graph 42 --output red_42.graphml
+    python manage.py export_network_graph 42 --format gexf --max-depth 3 --output red_42.gexf
+    python manage.py export_network_graph 42 --format csv > red_42.csv
+
+Writes the member and everything below it as GraphML, GEXF or a CSV edge
+list, as the subtree is read (see referrals.graph_export).
+"""
+from django.core.management.base import BaseCommand, CommandError
+from referrals.graph_export import GRAPH_FORMATS, graph_chunks
+from referrals.models import Sympathizer
+
+
+class Command(BaseCommand):
+    help = 'Export the network below a member as GraphML, GEXF or a CSV edge list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('member_id', type=int, help='Member whose network is exported (a root or any member)')
+        parser.add_argument('--format', choices=GRAPH_FORMATS, default='graphml', help='Output format (default: graphml)')
+        parser.add_argument('--max-depth', type=int, default=None, help='Levels to include below the member')
+        parser.add_argument('--output', default=None, help='File to write (default: standard output)')
+
+    def handle(self, *args, **options):
+        try:
+            member = Sympathizer.objects.only('id', 'depth').get(pk=options['member_id'])
+        except Sympathizer.DoesNotExist:
+            raise CommandError(f"Sympathizer {options['member_id']} does not exist")
+        if options['max_depth'] is not None and options['max_depth'] < 0:
+            raise CommandError('--max-depth must be at least 0')
+
+        chunks = graph_chunks(member, options['format'], max_depth=options['max_depth'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS('Network graph exported successfully!'))
+        self.stdout.write(f"File: {options['output']}")
@@ -0,0 +1,41 @@
+"""
+Django management command to drop old export jobs and their files.
+Usage:
+    python manage.py prune_export_jobs
+    python manage.py prune_export_jobs --days 1
+
+Jobs whose worker stopped sending heartbeats are marked as failed first.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from referrals.models import ExportJob
+from referrals.services.export_jobs import ExportJobService
+
+
+class Command(BaseCommand):
+    help = 'Delete finished export jobs older than the given number of days, with their files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Keep this many days of exports (default: 7)',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+
+        expired = ExportJobService.expire_stale()
+        cutoff = timezone.now() - timedelta(days=days)
+        old_jobs = ExportJob.objects.filter(created_at__lt=cutoff).exclude(status__in=ExportJob.ACTIVE_STATUSES)
+        ExportJobService.delete_files(old_jobs)
+        deleted, _ = old_jobs.delete()
+
+        self.stdout.write(self.style.SUCCESS('Export jobs pruned successfully!'))
+        self.stdout.write(f'Interrupted jobs: {expired}')
+        self.stdout.write(f'Deleted jobs: {deleted}')
@@ -0,0 +1,37 @@
+"""
+Django management command to drop old entries of the network change log.
+Usage:
+    python manage.py prune_network_changes
+    python manage.py prune_network_changes --days 7
+
+Clients whose sync cursor is older than the kept entries get a reset and
+reload their whole network.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from referrals.models import NetworkChange
+
+
+class Command(BaseCommand):
+    help = 'Delete network change log entries older than the given number of days.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Keep this many days of changes (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+
+        cutoff = timezone.now() - timedelta(days=days)
+        deleted, _ = NetworkChange.objects.filter(created_at__lt=cutoff).delete()
+
+        self.stdout.write(self.style.SUCCESS('Network change log pruned successfully!'))
+        self.stdout.write(f'Deleted entries: {deleted}')
@@ -0,0 +1,21 @@
+"""
+Django management command to (re)build the SympathizerClosure table.
+Usage:
+    python manage.py rebuild_closure
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from referrals.models import Sympathizer
+from referrals.services.tree import TreeService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ancestor/descendant closure table from referrer links using set-based SQL.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total_rows = TreeService.rebuild_closure()
+
+        self.stdout.write(self.style.SUCCESS('Closure table rebuilt successfully!'))
+        self.stdout.write(f'Sympathizers: {Sympathizer.objects.count()}')
+        self.stdout.write(f'Closure rows: {total_rows}')
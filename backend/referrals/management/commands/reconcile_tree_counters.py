@@ -0,0 +1,48 @@
+"""
+Django management command to recompute the subtree size counters.
+Usage:
+    python manage.py reconcile_tree_counters
+    python manage.py reconcile_tree_counters --dry-run
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from referrals.services.tree import TreeService
+
+
+class Command(BaseCommand):
+    help = 'Recompute descendant_count and direct_referrals_count for all sympathizers and report drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drifted rows, do not fix them'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help='Number of drifted rows to print (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        with transaction.atomic():
+            drift = TreeService.reconcile_counters(dry_run=dry_run)
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No drift found, all counters are correct.'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'Drifted rows: {len(drift)}'))
+        for pk, descendants, expected_descendants, direct, expected_direct in drift[:options['show']]:
+            self.stdout.write(
+                f'  id={pk} descendant_count {descendants} -> {expected_descendants}, '
+                f'direct_referrals_count {direct} -> {expected_direct}'
+            )
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: no changes written'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Counters fixed successfully!'))
@@ -0,0 +1,33 @@
+"""
+Django management command to write the shared referral graph snapshot.
+Usage:
+    python manage.py write_graph_snapshot
+    python manage.py write_graph_snapshot --path /var/run/referral_graph.bin
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from referrals.graph import CompactGraph, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write the memory-mapped referral graph snapshot so workers start with a warm cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=None,
+            help='Snapshot file to write (defaults to REFERRAL_GRAPH_SNAPSHOT)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.REFERRAL_GRAPH_SNAPSHOT
+        if not path:
+            raise CommandError('REFERRAL_GRAPH_SNAPSHOT is disabled; pass --path')
+
+        graph = CompactGraph.from_database()
+        write_snapshot(graph, path)
+
+        self.stdout.write(self.style.SUCCESS('Graph snapshot written successfully!'))
+        self.stdout.write(f'File: {path}')
+        self.stdout.write(f'Members: {len(graph)}')
+        self.stdout.write(f'Version: {graph.version[0]}')
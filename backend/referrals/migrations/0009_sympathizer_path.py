@@ -0,0 +1,65 @@
+# Generated by Django 6.0.1 on 2026-10-17 03:52
+
+import referrals.fields
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    """Fill paths level by level: roots first, then every child of an already filled row."""
+    Sympathizer = apps.get_model('referrals', 'Sympathizer')
+    table = Sympathizer._meta.db_table
+    if schema_editor.connection.vendor == 'postgresql':
+        root_sql = f"UPDATE {table} SET path = text2ltree(id::text) WHERE referrer_id IS NULL"
+        child_sql = (
+            f"UPDATE {table} AS c SET path = p.path || text2ltree(c.id::text) "
+            f"FROM {table} AS p WHERE c.referrer_id = p.id AND c.path IS NULL AND p.path IS NOT NULL"
+        )
+    else:
+        root_sql = f"UPDATE {table} SET path = CAST(id AS TEXT) WHERE referrer_id IS NULL"
+        child_sql = (
+            f"UPDATE {table} SET path = (SELECT p.path FROM {table} AS p WHERE p.id = {table}.referrer_id) "
+            f"|| '.' || CAST(id AS TEXT) WHERE path IS NULL AND referrer_id IN "
+            f"(SELECT id FROM {table} WHERE path IS NOT NULL)"
+        )
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(root_sql)
+        while True:
+            cursor.execute(child_sql)
+            if cursor.rowcount == 0:
+                break
+
+
+def create_gist_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS referrals_sympathizer_path_gist ON referrals_sympathizer USING GIST (path)"
+        )
+
+
+def drop_gist_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS referrals_sympathizer_path_gist")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0008_level_label'),
+    ]
+
+    operations = [
+        CreateExtension('ltree'),
+        migrations.AddField(
+            model_name='sympathizer',
+            name='path',
+            field=referrals.fields.LtreeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sympathizer',
+            index=models.Index(fields=['path'], name='referrals_s_path_3205d1_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.RunPython(create_gist_index, drop_gist_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-17 03:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_closure(apps, schema_editor):
+    """Build every ancestor/descendant pair from referrer links in one recursive statement."""
+    Sympathizer = apps.get_model('referrals', 'Sympathizer')
+    SympathizerClosure = apps.get_model('referrals', 'SympathizerClosure')
+    table = SympathizerClosure._meta.db_table
+    source = Sympathizer._meta.db_table
+    schema_editor.execute(
+        f"INSERT INTO {table} (ancestor_id, descendant_id, depth) "
+        f"WITH RECURSIVE pairs(ancestor_id, descendant_id, depth) AS ("
+        f"SELECT id, id, 0 FROM {source} "
+        f"UNION ALL "
+        f"SELECT pairs.ancestor_id, s.id, pairs.depth + 1 "
+        f"FROM pairs JOIN {source} AS s ON s.referrer_id = pairs.descendant_id"
+        f") SELECT ancestor_id, descendant_id, depth FROM pairs"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0009_sympathizer_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SympathizerClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='referrals.sympathizer')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='referrals.sympathizer')),
+            ],
+            options={
+                'verbose_name': 'Relacion de Red',
+                'verbose_name_plural': 'Relaciones de Red',
+                'indexes': [models.Index(fields=['ancestor', 'depth'], name='referrals_s_ancesto_7341c0_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(backfill_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-17 03:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_root_depth(apps, schema_editor):
+    """Fill root_id and depth level by level, starting from the roots."""
+    Sympathizer = apps.get_model('referrals', 'Sympathizer')
+    table = Sympathizer._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"UPDATE {table} SET root_id = id, depth = 0 WHERE referrer_id IS NULL")
+        while True:
+            cursor.execute(
+                f"UPDATE {table} SET "
+                f"root_id = (SELECT p.root_id FROM {table} AS p WHERE p.id = {table}.referrer_id), "
+                f"depth = (SELECT p.depth + 1 FROM {table} AS p WHERE p.id = {table}.referrer_id) "
+                f"WHERE root_id IS NULL AND referrer_id IN (SELECT id FROM {table} WHERE root_id IS NOT NULL)"
+            )
+            if cursor.rowcount == 0:
+                break
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0010_sympathizer_closure'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sympathizer',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sympathizer',
+            name='root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='network_members', to='referrals.sympathizer'),
+        ),
+        migrations.AddIndex(
+            model_name='sympathizer',
+            index=models.Index(fields=['root', 'depth'], name='referrals_s_root_id_862f75_idx'),
+        ),
+        migrations.RunPython(backfill_root_depth, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    """Compute both counters from the closure table and referrer links in one statement."""
+    Sympathizer = apps.get_model('referrals', 'Sympathizer')
+    SympathizerClosure = apps.get_model('referrals', 'SympathizerClosure')
+    table = Sympathizer._meta.db_table
+    closure = SympathizerClosure._meta.db_table
+    schema_editor.execute(
+        f"UPDATE {table} SET "
+        f"descendant_count = (SELECT COUNT(*) FROM {closure} AS c "
+        f"WHERE c.ancestor_id = {table}.id AND c.depth > 0), "
+        f"direct_referrals_count = (SELECT COUNT(*) FROM {table} AS r "
+        f"WHERE r.referrer_id = {table}.id)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0011_sympathizer_root_depth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sympathizer',
+            name='descendant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sympathizer',
+            name='direct_referrals_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    NetworkVersion = apps.get_model('referrals', 'NetworkVersion')
+    NetworkVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0012_sympathizer_subtree_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetworkVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Version de Red',
+                'verbose_name_plural': 'Versiones de Red',
+            },
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:22
+
+import referrals.fields
+from django.db import migrations, models
+
+
+def create_gist_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for column in ('path', 'old_path'):
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS referrals_networkchange_{column}_gist "
+                f"ON referrals_networkchange USING GIST ({column})"
+            )
+
+
+def drop_gist_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for column in ('path', 'old_path'):
+            schema_editor.execute(f"DROP INDEX IF EXISTS referrals_networkchange_{column}_gist")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0013_network_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetworkChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('member_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('added', 'Agregado'), ('updated', 'Actualizado'), ('moved', 'Movido'), ('removed', 'Eliminado')], max_length=10)),
+                ('path', referrals.fields.LtreeField(blank=True, null=True)),
+                ('old_path', referrals.fields.LtreeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Cambio de Red',
+                'verbose_name_plural': 'Cambios de Red',
+                'indexes': [models.Index(fields=['path'], name='referrals_n_path_152f6f_idx'), models.Index(fields=['old_path'], name='referrals_n_old_pat_b98e13_idx')],
+            },
+        ),
+        migrations.RunPython(create_gist_indexes, drop_gist_indexes),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0014_network_change'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sympathizer',
+            index=models.Index(fields=['created_at', 'id'], name='referrals_s_created_e4a33e_idx'),
+        ),
+    ]
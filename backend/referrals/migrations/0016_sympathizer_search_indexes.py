@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:40
+
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # unaccent() is only STABLE; index expressions need an IMMUTABLE wrapper
+    schema_editor.execute(
+        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS referrals_sympathizer_search_trgm ON referrals_sympathizer "
+        "USING GIN ((f_unaccent(lower(nombres || ' ' || apellidos || ' ' || coalesce(email, '')))) gin_trgm_ops)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS referrals_sympathizer_cedula_prefix ON referrals_sympathizer "
+        "(cedula varchar_pattern_ops)"
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS referrals_sympathizer_cedula_prefix")
+    schema_editor.execute("DROP INDEX IF EXISTS referrals_sympathizer_search_trgm")
+    schema_editor.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0015_sympathizer_keyset_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
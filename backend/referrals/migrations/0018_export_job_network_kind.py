@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0017_export_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('users', 'Simpatizantes'), ('network', 'Red')], default='users', max_length=20),
+        ),
+    ]
@@ -1,10 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Subquery
 from django.contrib.auth.models import User
+from django.utils import timezone
 from simple_history.models import HistoricalRecords
 import random
 import string
 import secrets
 
+from .fields import LtreeField
+
 
 def generate_referral_code():
     """Generate a unique 8-character referral code using cryptographically secure random."""
@@ -41,6 +45,29 @@ class Municipality(models.Model):
         return f"{self.name}, {self.department.name}"
 
 
+# Denormalized tree columns owned by TreeService; regular saves never write them
+TREE_FIELDS = ('path', 'root', 'depth', 'descendant_count', 'direct_referrals_count')
+
+
+class SympathizerQuerySet(models.QuerySet):
+    def subtree(self, root_id, max_depth=None):
+        """
+        Return the sympathizer ``root_id`` and everything below it in one query.
+
+        ``max_depth`` limits the result to that many levels under the root
+        (0 returns only the root).
+        """
+        root = self.model.objects.filter(pk=root_id)
+        qs = self.filter(path__descendant_of=Subquery(root.values('path')[:1]))
+        if max_depth is not None:
+            qs = qs.filter(depth__lte=Subquery(root.values('depth')[:1]) + max_depth)
+        return qs
+
+    def at_depth(self, root_id, depth):
+        """Return the members exactly ``depth`` levels below ``root_id`` (closure table lookup)."""
+        return self.filter(ancestor_links__ancestor_id=root_id, ancestor_links__depth=depth)
+
+
 class Sympathizer(models.Model):
     SEX_CHOICES = [
         ('M', 'MASCULINO'),
@@ -65,6 +92,15 @@ class Sympathizer(models.Model):
     # Campo para identificar la red/político al que pertenece (solo para roots)
     network_name = models.CharField(max_length=100, null=True, blank=True, help_text="Nombre de la red/político (solo para fundadores)")
 
+    # Materialized path of ids from the root down to this node ("1.5.9"), maintained by TreeService
+    path = LtreeField(null=True, blank=True, editable=False)
+    # Founder of the network (itself for roots) and distance to it, maintained by TreeService
+    root = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='network_members')
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    # Subtree size counters, updated up the ancestor chain by TreeService
+    descendant_count = models.PositiveIntegerField(default=0, editable=False)
+    direct_referrals_count = models.PositiveIntegerField(default=0, editable=False)
+
     link_enabled = models.BooleanField(default=True)
     is_suspended = models.BooleanField(default=False, help_text="Si está suspendido, no puede acceder al sistema")
 
@@ -72,8 +108,10 @@ class Sympathizer(models.Model):
     activated_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    # Audit history
-    history = HistoricalRecords()
+    objects = SympathizerQuerySet.as_manager()
+
+    # Audit history (derived tree columns are excluded)
+    history = HistoricalRecords(excluded_fields=list(TREE_FIELDS))
 
     class Meta:
         ordering = ['-created_at']
@@ -82,11 +120,53 @@ class Sympathizer(models.Model):
         indexes = [
             models.Index(fields=['nombres', 'apellidos']),
             models.Index(fields=['referrer']),
+            models.Index(fields=['path']),
+            models.Index(fields=['root', 'depth']),
+            # Keyset pagination order
+            models.Index(fields=['created_at', 'id']),
         ]
 
     def __str__(self):
         return f"{self.nombres} {self.apellidos}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored referrer so save() can detect a reparent
+        instance._loaded_referrer_id = instance.__dict__.get('referrer_id', models.DEFERRED)
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .services.tree import TreeService
+
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        old_referrer_id = getattr(self, '_loaded_referrer_id', models.DEFERRED)
+        if not adding and old_referrer_id is models.DEFERRED and 'referrer_id' in self.__dict__:
+            old_referrer_id = Sympathizer.objects.filter(pk=self.pk).values_list('referrer_id', flat=True).first()
+
+        if not adding and update_fields is None:
+            # Leave the tree columns alone so a stale instance cannot clobber them
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in TREE_FIELDS
+            ]
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                TreeService.node_created(self)
+            elif (
+                old_referrer_id is not models.DEFERRED
+                and old_referrer_id != self.referrer_id
+                and (update_fields is None or 'referrer' in update_fields)
+            ):
+                TreeService.node_moved(self, old_referrer_id)
+            else:
+                NetworkChange.record(NetworkChange.UPDATED, self.pk)
+
+        self._loaded_referrer_id = self.referrer_id
+
     @property
     def full_name(self):
         return f"{self.nombres} {self.apellidos}"
@@ -96,17 +176,22 @@ class Sympathizer(models.Model):
         return self.referrals.count()
 
     def get_total_network_size(self):
-        """Get total size of the network under this sympathizer (recursive)."""
-        count = 0
-        to_visit = list(self.referrals.all())
-        while to_visit:
-            current = to_visit.pop()
-            count += 1
-            to_visit.extend(list(current.referrals.all()))
-        return count
+        """Get total size of the network under this sympathizer (single path range scan)."""
+        return Sympathizer.objects.subtree(self.id).count() - 1
+
+    def is_ancestor_of(self, other):
+        """Check if other is this sympathizer or one of its descendants."""
+        if self.path is None or other.path is None:
+            from .queries import is_descendant
+            return is_descendant(self.id, other.id)
+        return other.path == self.path or other.path.startswith(f"{self.path}.")
 
     def get_root(self):
         """Get the root (founder) of this sympathizer's network."""
+        if self.root_id == self.id:
+            return self
+        if self.root_id is not None:
+            return self.root
         current = self
         while current.referrer:
             current = current.referrer
@@ -120,7 +205,119 @@ class Sympathizer(models.Model):
     @property
     def is_root(self):
         """Check if this sympathizer is a root (no referrer)."""
-        return self.referrer is None
+        return self.referrer_id is None
+
+
+class SympathizerClosure(models.Model):
+    """
+    Every ancestor/descendant pair of the referral tree, including each node
+    paired with itself at depth 0. Maintained by TreeService.
+    """
+    ancestor = models.ForeignKey(Sympathizer, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Sympathizer, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        verbose_name = 'Relacion de Red'
+        verbose_name_plural = 'Relaciones de Red'
+        indexes = [
+            models.Index(fields=['ancestor', 'depth']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def depth_between(cls, ancestor_id, descendant_id):
+        """Get how many levels descendant is below ancestor, or None if it is not under it."""
+        return cls.objects.filter(
+            ancestor_id=ancestor_id, descendant_id=descendant_id
+        ).values_list('depth', flat=True).first()
+
+
+class NetworkVersion(models.Model):
+    """
+    Single-row counter bumped on every structural change of the referral
+    forest (insert, reparent, delete). Per-process graph caches compare it
+    to decide when to rebuild.
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Version de Red'
+        verbose_name_plural = 'Versiones de Red'
+
+    def __str__(self):
+        return f"v{self.version}"
+
+    @classmethod
+    def current(cls):
+        """Get the current version (0 if the forest was never changed)."""
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def stamp(cls):
+        """
+        Get (version, updated_at) for cache keys. The timestamp guards against
+        the counter going back, e.g. after a rolled back transaction or restore.
+        """
+        return cls.objects.filter(pk=1).values_list('version', 'updated_at').first() or (0, None)
+
+    @classmethod
+    def bump(cls):
+        """Increment the version atomically."""
+        changes = {'version': models.F('version') + 1, 'updated_at': timezone.now()}
+        if not cls.objects.filter(pk=1).update(**changes):
+            cls.objects.get_or_create(pk=1)
+            cls.objects.filter(pk=1).update(**changes)
+
+
+class NetworkChange(models.Model):
+    """
+    Append-only log of member changes, read by the network sync endpoint.
+
+    ``path`` is where the member sits after the change and ``old_path``
+    where it sat before a move or delete, so a subtree's changes are two
+    path lookups. The id is the sync cursor. A move or delete stands for
+    the member's whole subtree.
+    """
+    ADDED = 'added'
+    UPDATED = 'updated'
+    MOVED = 'moved'
+    REMOVED = 'removed'
+    KIND_CHOICES = [
+        (ADDED, 'Agregado'),
+        (UPDATED, 'Actualizado'),
+        (MOVED, 'Movido'),
+        (REMOVED, 'Eliminado'),
+    ]
+
+    # Plain id: the log outlives deleted members
+    member_id = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    path = LtreeField(null=True, blank=True)
+    old_path = LtreeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Cambio de Red'
+        verbose_name_plural = 'Cambios de Red'
+        indexes = [
+            models.Index(fields=['path']),
+            models.Index(fields=['old_path']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.member_id}"
+
+    @classmethod
+    def record(cls, kind, member_id, path=None, old_path=None):
+        """Append one change; ``path`` defaults to the member's stored path."""
+        if path is None and kind != cls.REMOVED:
+            path = Sympathizer.objects.filter(pk=member_id).values_list('path', flat=True).first()
+        return cls.objects.create(member_id=member_id, kind=kind, path=path, old_path=old_path)
 
 
 class LevelLabel(models.Model):
@@ -137,3 +334,74 @@ class LevelLabel(models.Model):
 
     def __str__(self):
         return f"{self.owner.full_name} - Nivel {self.level}: {self.name}"
+
+
+class ExportJob(models.Model):
+    """
+    Export built off the request thread by ExportJobService.
+
+    ``fingerprint`` identifies the export (kind, format and filter
+    parameters); at most one pending or running job exists per fingerprint,
+    so identical concurrent requests share a job. ``updated_at`` doubles as
+    the worker's heartbeat.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendiente'),
+        (RUNNING, 'En proceso'),
+        (DONE, 'Terminado'),
+        (FAILED, 'Fallido'),
+    ]
+    ACTIVE_STATUSES = (PENDING, RUNNING)
+
+    USERS = 'users'
+    NETWORK = 'network'
+    KIND_CHOICES = [
+        (USERS, 'Simpatizantes'),
+        (NETWORK, 'Red'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=USERS)
+    format = models.CharField(max_length=10)
+    params = models.JSONField(default=dict, blank=True)
+    fingerprint = models.CharField(max_length=40)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    file_name = models.CharField(max_length=255, blank=True)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Exportacion'
+        verbose_name_plural = 'Exportaciones'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='referrals_exportjob_active_fingerprint',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}.{self.format} #{self.pk} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percentage of rows written, None until the total is known."""
+        if self.status == self.DONE:
+            return 100
+        if not self.total_rows:
+            return None
+        return min(99, self.processed_rows * 100 // self.total_rows)
@@ -0,0 +1,94 @@
+"""
+Keyset pagination for sympathizer lists.
+
+Pages are ordered newest first on (created_at, id) and fetched with
+``WHERE (created_at, id) < cursor`` instead of OFFSET, so a deep page
+costs the same as the first one. The cursor is opaque. The exact total
+comes from CountService (a table estimate or a cached count) unless an
+exact count is asked for with ``?count=1``.
+"""
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+from .services.counts import CountService, RowCount
+
+
+class KeysetPagination(BasePagination):
+    """
+    ``?cursor=&page_size=&count=1`` pagination on (created_at, id), newest first.
+
+    Response: ``{'results', 'next_cursor', 'page_size', 'total', 'total_exact'}``
+    where ``next_cursor`` is None on the last page and ``total_exact`` says
+    whether ``total`` was counted for this request.
+    """
+    page_size = 20
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        try:
+            page_size = int(request.query_params.get('page_size', self.page_size))
+            position = self.decode_cursor(request.query_params.get('cursor'))
+        except (TypeError, ValueError):
+            raise ValidationError({'error': 'Cursor invalido'})
+        self.page_size = max(1, min(page_size, self.max_page_size))
+
+        queryset = queryset.order_by('-created_at', '-id')
+        if request.query_params.get('count', '').lower() in ('1', 'true', 'yes'):
+            self.total = RowCount(queryset.count(), True)
+        else:
+            self.total = CountService.count(queryset)
+
+        if position:
+            created_at, member_id = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=member_id)
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_cursor = self.encode_cursor(rows[-1].created_at, rows[-1].id)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'next_cursor': self.next_cursor,
+            'page_size': self.page_size,
+            'total': self.total.value,
+            'total_exact': self.total.exact,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'results': schema,
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'page_size': {'type': 'integer'},
+                'total': {'type': 'integer'},
+                'total_exact': {'type': 'boolean'},
+            },
+        }
+
+    @staticmethod
+    def encode_cursor(created_at, member_id):
+        """Opaque cursor pointing after (created_at, id)."""
+        return urlsafe_base64_encode(force_bytes(f"{created_at.isoformat()}|{member_id}"))
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Get (created_at, id) from a cursor, None for the first page. Raises ValueError if malformed."""
+        if not cursor:
+            return None
+        created_at, member_id = force_str(urlsafe_base64_decode(cursor)).split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError(cursor)
+        return created_at, int(member_id)
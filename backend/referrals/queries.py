@@ -0,0 +1,129 @@
+"""
+Recursive CTE queries over the referral tree.
+
+These run a single ``WITH RECURSIVE`` statement over ``referrer_id`` so a
+whole subtree comes back in one round trip, independent of the denormalized
+tree columns.
+"""
+from django.db import connection
+
+from .models import Sympathizer
+
+
+def _column_converters(fields):
+    """Build the per-column value converters Django would apply to ORM results."""
+    table = Sympathizer._meta.db_table
+    converters = []
+    for field in fields:
+        col = field.get_col(table)
+        field_converters = connection.ops.get_db_converters(col) + field.get_db_converters(connection)
+        converters.append((col, field_converters))
+    return converters
+
+
+def subtree_rows(root_id, max_depth=None, columns=()):
+    """
+    Get every sympathizer in the subtree of ``root_id`` with one recursive query.
+
+    Args:
+        root_id: Id of the subtree root
+        max_depth: Optional number of levels to include below the root
+        columns: Extra Sympathizer field names to return for each row
+
+    Returns:
+        list: (id, parent_id, depth, *columns) tuples in breadth-first order,
+              siblings ordered by id. The root has depth 0.
+    """
+    table = Sympathizer._meta.db_table
+    fields = [Sympathizer._meta.get_field(name) for name in columns]
+    select_columns = ''.join(f", s.{connection.ops.quote_name(field.column)}" for field in fields)
+
+    depth_filter = ''
+    params = [root_id]
+    if max_depth is not None:
+        depth_filter = 'WHERE subtree.depth < %s'
+        params.append(max_depth)
+
+    sql = (
+        f"WITH RECURSIVE subtree(id, parent_id, depth) AS ("
+        f"SELECT id, referrer_id, 0 FROM {table} WHERE id = %s "
+        f"UNION ALL "
+        f"SELECT child.id, child.referrer_id, subtree.depth + 1 "
+        f"FROM {table} AS child JOIN subtree ON child.referrer_id = subtree.id "
+        f"{depth_filter}"
+        f") "
+        f"SELECT subtree.id, subtree.parent_id, subtree.depth{select_columns} "
+        f"FROM subtree JOIN {table} AS s ON s.id = subtree.id "
+        f"ORDER BY subtree.depth, subtree.id"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    if not fields:
+        return rows
+
+    converters = _column_converters(fields)
+    converted = []
+    for row in rows:
+        values = list(row[3:])
+        for index, (col, field_converters) in enumerate(converters):
+            for converter in field_converters:
+                values[index] = converter(values[index], col, connection)
+        converted.append((*row[:3], *values))
+    return converted
+
+
+def is_descendant(ancestor_id, descendant_id):
+    """Check if ``descendant_id`` is ``ancestor_id`` or below it, walking up with one recursive query."""
+    table = Sympathizer._meta.db_table
+    sql = (
+        f"WITH RECURSIVE upline(id, parent_id) AS ("
+        f"SELECT id, referrer_id FROM {table} WHERE id = %s "
+        f"UNION ALL "
+        f"SELECT parent.id, parent.referrer_id "
+        f"FROM {table} AS parent JOIN upline ON parent.id = upline.parent_id"
+        f") "
+        f"SELECT 1 FROM upline WHERE id = %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [descendant_id, ancestor_id])
+        return cursor.fetchone() is not None
+
+
+def upline_ids(sympathizer_id):
+    """
+    Get the ids from ``sympathizer_id`` up to its network root with one recursive query.
+
+    Walks ``referrer_id`` only, so it works for rows whose tree columns were
+    never filled in.
+
+    Raises:
+        ValueError: If the referrer chain loops back on itself
+    """
+    table = Sympathizer._meta.db_table
+    # UNION (not UNION ALL) stops the recursion if the chain has a cycle
+    sql = (
+        f"WITH RECURSIVE upline(id, parent_id) AS ("
+        f"SELECT id, referrer_id FROM {table} WHERE id = %s "
+        f"UNION "
+        f"SELECT parent.id, parent.referrer_id "
+        f"FROM {table} AS parent JOIN upline ON parent.id = upline.parent_id"
+        f") "
+        f"SELECT id, parent_id FROM upline"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [sympathizer_id])
+        parents = dict(cursor.fetchall())
+
+    chain = []
+    seen = set()
+    current = sympathizer_id
+    while current is not None and current in parents:
+        if current in seen:
+            raise ValueError(f"Referrer cycle through sympathizer {current}")
+        chain.append(current)
+        seen.add(current)
+        current = parents[current]
+    return chain
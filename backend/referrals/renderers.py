@@ -0,0 +1,166 @@
+"""
+Compact renderers for the network graph endpoints.
+
+Clients pick them through content negotiation (``Accept``) or DRF's
+``?format=`` override:
+
+- ``?format=columnar`` / ``application/vnd.redsimpatizantes.columnar+json``
+- ``?format=msgpack`` / ``application/x-msgpack`` (needs the optional
+  ``msgpack`` package)
+
+Both turn the ``nodes``/``links`` lists into parallel arrays: ``ids``,
+``parent_index`` (position of each node's parent, -1 for the top node)
+and one array per node field. Links are implied by ``parent_index``.
+
+The dashboard's nested ``referrals`` tree (children under
+``sub_referrals``) is flattened the same way, in pre-order; its direct
+referrals have parent -1, since the user is not in the list.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+# Coordinates are only used for drawing; one decimal is plenty
+ROUNDED_COLUMNS = ('x', 'y')
+
+
+def _graph_nodes(data):
+    """Get (nodes, parent_index) of a ``nodes``/``links`` payload."""
+    nodes = data['nodes']
+    index = {node['id']: position for position, node in enumerate(nodes)}
+    parent_index = [-1] * len(nodes)
+    for link in data.get('links', []):
+        target = index.get(link['target'])
+        source = index.get(link['source'])
+        if target is not None and source is not None:
+            parent_index[target] = source
+    return nodes, parent_index
+
+
+def _referral_nodes(data):
+    """Get (nodes, parent_index) of a nested ``referrals`` payload, in pre-order."""
+    nodes = []
+    parent_index = []
+    stack = [(referral, -1) for referral in reversed(data['referrals'])]
+    while stack:
+        referral, parent = stack.pop()
+        position = len(nodes)
+        nodes.append({key: value for key, value in referral.items() if key != 'sub_referrals'})
+        parent_index.append(parent)
+        stack.extend((child, position) for child in reversed(referral.get('sub_referrals', [])))
+    return nodes, parent_index
+
+
+def to_columnar(data):
+    """
+    Convert a ``{'nodes': [...], 'links': [...]}`` or nested ``referrals`` payload to parallel arrays.
+
+    Any other payload (e.g. an error) is returned unchanged.
+    """
+    if not isinstance(data, dict):
+        return data
+    if 'nodes' in data:
+        nodes, parent_index = _graph_nodes(data)
+        replaced = ('nodes', 'links')
+    elif isinstance(data.get('referrals'), list):
+        nodes, parent_index = _referral_nodes(data)
+        replaced = ('referrals',)
+    else:
+        return data
+
+    keys = []
+    for node in nodes:
+        for key in node:
+            if key != 'id' and key not in keys:
+                keys.append(key)
+
+    columns = {}
+    for key in keys:
+        values = [node.get(key) for node in nodes]
+        if key in ROUNDED_COLUMNS:
+            values = [round(value, 1) if value is not None else None for value in values]
+        columns[key] = values
+
+    result = {key: value for key, value in data.items() if key not in replaced}
+    result.update({
+        'format': 'columnar',
+        'ids': [node['id'] for node in nodes],
+        'parent_index': parent_index,
+        'columns': columns,
+    })
+    return result
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """JSON with the node list turned into parallel arrays."""
+    media_type = 'application/vnd.redsimpatizantes.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(to_columnar(data), accepted_media_type, renderer_context)
+
+
+class ColumnarMessagePackRenderer(BaseRenderer):
+    """MessagePack encoding of the columnar payload."""
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(to_columnar(data), use_bin_type=True, default=str)
+
+
+class ExportFormatRenderer(JSONRenderer):
+    """
+    Lets an export view take ``?format=`` values of its own.
+
+    The exported file is returned as a plain Django response and never goes
+    through a renderer; only error payloads do, and they stay JSON.
+    """
+
+
+class CSVExportRenderer(ExportFormatRenderer):
+    format = 'csv'
+
+
+class XLSXExportRenderer(ExportFormatRenderer):
+    format = 'xlsx'
+
+
+class GraphMLExportRenderer(ExportFormatRenderer):
+    format = 'graphml'
+
+
+class GEXFExportRenderer(ExportFormatRenderer):
+    format = 'gexf'
+
+
+# Renderers for the export views: JSON errors for any supported file format
+EXPORT_RENDERERS = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    XLSXExportRenderer,
+    CSVExportRenderer,
+]
+
+# Renderers for the graph export view
+GRAPH_EXPORT_RENDERERS = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    CSVExportRenderer,
+    GraphMLExportRenderer,
+    GEXFExportRenderer,
+]
+
+
+# Renderers for the graph views: the project defaults plus the compact formats
+GRAPH_RENDERERS = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    ColumnarJSONRenderer,
+    *([ColumnarMessagePackRenderer] if msgpack is not None else []),
+]
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Sympathizer, Department, Municipality
+from django.urls import reverse
+from .models import Sympathizer, Department, Municipality, ExportJob
 
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -43,10 +44,12 @@ class SympathizerSerializer(serializers.ModelSerializer):
             'department_id', 'municipio_id', 'department_name', 'municipio_name',
             'referral_code', 'referrer', 'referrer_name', 'created_at', 'activated_at', 'referrer_code',
             'link_enabled', 'is_suspended', 'is_active', 'has_account', 'is_root',
-            'network_name', 'network_display_name'
+            'network_name', 'network_display_name', 'root', 'depth',
+            'descendant_count', 'direct_referrals_count'
         ]
         read_only_fields = [
-            'referral_code', 'created_at', 'activated_at', 'referrer',
+            'referral_code', 'created_at', 'activated_at', 'referrer', 'root', 'depth',
+            'descendant_count', 'direct_referrals_count',
             'department_name', 'municipio_name', 'referrer_name'
         ]
         extra_kwargs = {
@@ -90,3 +93,24 @@ class SympathizerSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
         return instance
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'kind', 'format', 'params', 'status', 'progress',
+            'processed_rows', 'total_rows', 'file_name', 'file_size', 'error',
+            'created_at', 'started_at', 'finished_at', 'download_url'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.DONE:
+            return None
+        url = reverse('admin-export-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,114 @@
+"""
+Row counts for listings and health checks without scanning the table.
+
+Unfiltered totals come from the planner statistics (``pg_class.reltuples``)
+on PostgreSQL. Filtered totals are counted once and cached for
+REFERRAL_COUNT_CACHE_TTL seconds; a stale entry is still served while a
+background thread recounts it.
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Below this many rows the estimate is unreliable and an exact count is cheap
+ESTIMATE_MIN_ROWS = 1000
+# Stale entries are served (and refreshed) for this many TTLs before they expire
+STALE_FACTOR = 10
+
+
+class RowCount(NamedTuple):
+    value: int
+    # True when counted by this call, False for planner estimates and cached counts
+    exact: bool
+
+
+class CountService:
+    """Table estimates and cached filtered counts."""
+
+    _pending = set()
+    _pending_lock = threading.Lock()
+
+    @classmethod
+    def count(cls, queryset):
+        """
+        Count a queryset as cheaply as possible.
+
+        Returns:
+            RowCount: the table estimate for an unfiltered queryset on
+            PostgreSQL, otherwise the cached count
+        """
+        if not queryset.query.where:
+            estimate = cls.table_estimate(queryset.model, using=queryset.db)
+            if estimate is not None:
+                return RowCount(estimate, False)
+        return cls.cached_count(queryset)
+
+    @staticmethod
+    def table_estimate(model, using='default'):
+        """Get the planner's row estimate for a model's table, None if unavailable or too small."""
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table is first vacuumed or analyzed
+        if row is None or row[0] < ESTIMATE_MIN_ROWS:
+            return None
+        return row[0]
+
+    @classmethod
+    def cached_count(cls, queryset):
+        """
+        Get a queryset's count from the cache, counting it on a miss.
+
+        Entries older than the TTL are returned as they are while a
+        background thread refreshes them.
+        """
+        ttl = max(getattr(settings, 'REFERRAL_COUNT_CACHE_TTL', 30), 0)
+        key = cls._key(queryset)
+        entry = cache.get(key)
+        if entry is not None:
+            value, counted_at = entry
+            if time.time() - counted_at > ttl:
+                cls._refresh_in_background(key, queryset, ttl)
+            return RowCount(value, False)
+
+        value = queryset.count()
+        cache.set(key, (value, time.time()), max(ttl, 1) * STALE_FACTOR)
+        return RowCount(value, True)
+
+    @staticmethod
+    def _key(queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        digest = hashlib.sha1(repr((queryset.db, sql, params)).encode('utf-8')).hexdigest()
+        return f"referrals:count:{digest}"
+
+    @classmethod
+    def _refresh_in_background(cls, key, queryset, ttl):
+        def refresh():
+            try:
+                cache.set(key, (queryset.count(), time.time()), max(ttl, 1) * STALE_FACTOR)
+            except Exception as e:
+                logger.error(f"Error refreshing cached count: {str(e)}")
+            finally:
+                connections[queryset.db].close()
+                with cls._pending_lock:
+                    cls._pending.discard(key)
+
+        with cls._pending_lock:
+            if key in cls._pending:
+                return
+            cls._pending.add(key)
+        threading.Thread(target=refresh, daemon=True).start()
@@ -0,0 +1,199 @@
+"""
+Background export jobs.
+
+An export request becomes an ExportJob row. After the request commits,
+the job is handed to a small per-process thread pool
+(REFERRAL_EXPORT_WORKERS threads), which writes the file into
+REFERRAL_EXPORT_DIR and records its progress on the row. No broker is
+involved: the row is the queue entry, the progress report and the
+download record.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from ..exports import HEADERS, NETWORK_HEADERS, export_rows, network_export_rows, write_export
+from ..models import ExportJob, Sympathizer
+from ..search import search_sympathizers
+from ..streaming import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobService:
+    """Create, deduplicate and run export jobs."""
+
+    # Active jobs without a heartbeat for this long were lost with their process
+    STALE_AFTER = timedelta(minutes=15)
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(kind, export_format, params):
+        """Identify an export by what it contains."""
+        payload = json.dumps([kind, export_format, params], sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def export_dir():
+        path = Path(settings.REFERRAL_EXPORT_DIR)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    @classmethod
+    def file_path(cls, job):
+        return cls.export_dir() / job.file_name
+
+    @classmethod
+    def submit(cls, kind, export_format, params, user=None):
+        """
+        Get the active job for this export, creating and queueing one if needed.
+
+        Returns:
+            tuple: (ExportJob, created)
+        """
+        fingerprint = cls.fingerprint(kind, export_format, params)
+        cls.expire_stale(fingerprint)
+
+        active = ExportJob.objects.filter(fingerprint=fingerprint, status__in=ExportJob.ACTIVE_STATUSES)
+        job = active.first()
+        if job is not None:
+            return job, False
+        try:
+            with transaction.atomic():
+                job = ExportJob.objects.create(
+                    kind=kind, format=export_format, params=params,
+                    fingerprint=fingerprint, requested_by=user,
+                )
+        except IntegrityError:
+            # Another request created the same job in the meantime
+            job = active.first()
+            if job is None:
+                raise
+            return job, False
+
+        transaction.on_commit(lambda: cls.enqueue(job.pk))
+        return job, True
+
+    @classmethod
+    def expire_stale(cls, fingerprint=None):
+        """Mark active jobs without a recent heartbeat as failed; returns how many."""
+        stale = ExportJob.objects.filter(
+            status__in=ExportJob.ACTIVE_STATUSES,
+            updated_at__lt=timezone.now() - cls.STALE_AFTER,
+        )
+        if fingerprint is not None:
+            stale = stale.filter(fingerprint=fingerprint)
+        return stale.update(status=ExportJob.FAILED, error='Exportacion interrumpida', finished_at=timezone.now())
+
+    @classmethod
+    def enqueue(cls, job_id):
+        """Run a job on this process's export thread pool."""
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'REFERRAL_EXPORT_WORKERS', 2),
+                    thread_name_prefix='referral-export',
+                )
+        cls._executor.submit(cls._run_in_worker, job_id)
+
+    @classmethod
+    def _run_in_worker(cls, job_id):
+        try:
+            cls.run(job_id)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def source(job):
+        """
+        Get what a job exports.
+
+        Returns:
+            tuple: (file name prefix, headers, number of rows, row iterator)
+        """
+        if job.kind == ExportJob.NETWORK:
+            member = Sympathizer.objects.only('id', 'referrer_id', 'depth', 'descendant_count').get(
+                pk=job.params['root_id']
+            )
+            max_depth = job.params.get('max_depth')
+            if max_depth is None:
+                total = member.descendant_count + 1
+            else:
+                total = Sympathizer.objects.subtree(member.id, max_depth=max_depth).count()
+            return f"red_{member.id}", NETWORK_HEADERS, total, network_export_rows(member, max_depth=max_depth)
+
+        users = search_sympathizers(Sympathizer.objects.order_by('-created_at'), job.params.get('q', ''))
+        return 'simpatizantes', HEADERS, users.count(), export_rows(users)
+
+    @classmethod
+    def run(cls, job_id):
+        """
+        Build the file of a pending job.
+
+        The job is claimed with a conditional update, so it runs once even
+        if it was queued twice. The file is written under a temporary name
+        and renamed when complete.
+        """
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.PENDING).update(
+            status=ExportJob.RUNNING, started_at=now, updated_at=now,
+        )
+        if not claimed:
+            return
+        job = ExportJob.objects.get(pk=job_id)
+        partial = None
+
+        try:
+            name, headers, job.total_rows, rows = cls.source(job)
+            job.file_name = f"{name}_{now.strftime('%Y%m%d_%H%M%S')}_{job.pk}.{job.format}"
+            ExportJob.objects.filter(pk=job.pk).update(
+                total_rows=job.total_rows, file_name=job.file_name, updated_at=timezone.now(),
+            )
+
+            path = cls.file_path(job)
+            partial = path.with_name(path.name + '.part')
+            with open(partial, 'wb') as output:
+                write_export(cls._track_progress(job, rows), job.format, output, headers)
+            os.replace(partial, path)
+
+            ExportJob.objects.filter(pk=job.pk).update(
+                status=ExportJob.DONE, processed_rows=job.processed_rows,
+                file_size=path.stat().st_size, finished_at=timezone.now(), updated_at=timezone.now(),
+            )
+            logger.info(f"Export job {job.pk} finished: {job.processed_rows} records")
+        except Exception as e:
+            logger.error(f"Error in export job {job.pk}: {str(e)}")
+            ExportJob.objects.filter(pk=job.pk).update(
+                status=ExportJob.FAILED, error=str(e), finished_at=timezone.now(), updated_at=timezone.now(),
+            )
+            if partial is not None:
+                partial.unlink(missing_ok=True)
+
+    @staticmethod
+    def _track_progress(job, rows):
+        """Pass rows through, saving the row count (and heartbeat) every CHUNK_SIZE rows."""
+        job.processed_rows = 0
+        for row in rows:
+            yield row
+            job.processed_rows += 1
+            if job.processed_rows % CHUNK_SIZE == 0:
+                ExportJob.objects.filter(pk=job.pk).update(
+                    processed_rows=job.processed_rows, updated_at=timezone.now(),
+                )
+
+    @classmethod
+    def delete_files(cls, jobs):
+        """Remove the files of the given jobs from the export directory."""
+        for file_name in jobs.exclude(file_name='').values_list('file_name', flat=True):
+            (cls.export_dir() / file_name).unlink(missing_ok=True)
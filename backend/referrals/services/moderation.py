@@ -0,0 +1,99 @@
+"""
+Set-based moderation of many members at once.
+"""
+import logging
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import TREE_FIELDS, NetworkChange, Sympathizer
+
+logger = logging.getLogger(__name__)
+
+
+class ModerationService:
+    """Bulk updates of link_enabled / is_suspended with bulk audit history and sync log."""
+
+    FIELDS = ('link_enabled', 'is_suspended')
+    HISTORY_BATCH_SIZE = 500
+
+    @classmethod
+    def apply(cls, members, changes, user=None, reason=''):
+        """
+        Set ``changes`` on every sympathizer in ``members``, in one transaction.
+
+        Members already in the requested state are left alone. The changed
+        ones are updated with one UPDATE that also stamps them with a
+        shared ``updated_at``, which is how their history rows and UPDATED
+        NetworkChange rows (written in batches) are found afterwards; the
+        new ``updated_at`` also refreshes ETags and cached layouts. The tree
+        does not change, so NetworkVersion is left alone. Suspending or
+        lifting a suspension also sets ``User.is_active`` of the members'
+        accounts.
+
+        Args:
+            members: Sympathizer queryset (e.g. a subtree or an id list)
+            changes: {'link_enabled': bool, 'is_suspended': bool}, either or both
+            user: Admin recorded as the author of the history rows
+            reason: Change reason stored on the history rows
+
+        Returns:
+            dict: {'matched', 'updated', 'accounts_updated'}
+        """
+        now = timezone.now()
+        differs = Q()
+        for field, value in changes.items():
+            differs |= ~Q(**{field: value})
+
+        with transaction.atomic():
+            matched = members.count()
+            updated = members.filter(differs).update(**changes, updated_at=now)
+
+            changed = members.filter(updated_at=now, **changes)
+            batch = []
+            for member in changed.defer(*TREE_FIELDS).iterator(chunk_size=cls.HISTORY_BATCH_SIZE):
+                batch.append(member)
+                if len(batch) >= cls.HISTORY_BATCH_SIZE:
+                    cls._write_history(batch, user, reason, now)
+                    batch = []
+            if batch:
+                cls._write_history(batch, user, reason, now)
+
+            accounts_updated = 0
+            if 'is_suspended' in changes:
+                active = not changes['is_suspended']
+                accounts_updated = (
+                    User.objects.filter(sympathizer__in=members.values('id'))
+                    .exclude(is_active=active)
+                    .update(is_active=active)
+                )
+
+            # Last, so the sync log rows are created just before the commit
+            cls._log_changes(changed)
+
+        return {'matched': matched, 'updated': updated, 'accounts_updated': accounts_updated}
+
+    @staticmethod
+    def _write_history(members, user, reason, date):
+        Sympathizer.history.bulk_history_create(
+            members,
+            update=True,
+            default_user=user,
+            default_change_reason=reason,
+            default_date=date,
+        )
+
+    @classmethod
+    def _log_changes(cls, members):
+        """Append an UPDATED NetworkChange for every member, in batches."""
+        rows = members.values_list('id', 'path').iterator(chunk_size=cls.HISTORY_BATCH_SIZE)
+        batch = []
+        for member_id, path in rows:
+            batch.append(NetworkChange(kind=NetworkChange.UPDATED, member_id=member_id, path=path))
+            if len(batch) >= cls.HISTORY_BATCH_SIZE:
+                NetworkChange.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            NetworkChange.objects.bulk_create(batch)
@@ -0,0 +1,281 @@
+"""
+Maintenance of the denormalized referral tree structures.
+
+Sympathizer.save() and the post_delete signal call into this service so the
+materialized paths, the closure table and the subtree counters stay correct
+on create, reparent and delete.
+"""
+import logging
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from ..fields import RebasePath
+from ..models import NetworkChange, NetworkVersion, Sympathizer, SympathizerClosure
+from ..queries import upline_ids
+
+logger = logging.getLogger(__name__)
+
+
+class TreeService:
+    """Keeps the materialized tree columns and the closure table consistent with ``referrer``."""
+
+    @staticmethod
+    def _tree_position(sympathizer_id):
+        """Get the stored tree columns of a sympathizer (None if missing)."""
+        if sympathizer_id is None:
+            return None
+        return Sympathizer.objects.filter(pk=sympathizer_id).values(
+            'path', 'root_id', 'depth', 'descendant_count'
+        ).first()
+
+    @classmethod
+    def node_created(cls, node):
+        """
+        Set the tree columns of a freshly inserted sympathizer from its referrer.
+
+        Args:
+            node: Sympathizer instance that was just inserted
+        """
+        parent = cls._tree_position(node.referrer_id)
+        if parent and parent['path'] is None:
+            # Referrer not backfilled yet: derive its columns so the new node sits below it
+            parent = cls._repair_position(node.referrer_id, node.pk)
+        if parent:
+            node.path = f"{parent['path']}.{node.pk}"
+            node.root_id = parent['root_id']
+            node.depth = parent['depth'] + 1
+        else:
+            node.path = str(node.pk)
+            node.root_id = node.pk
+            node.depth = 0
+        Sympathizer.objects.filter(pk=node.pk).update(path=node.path, root_id=node.root_id, depth=node.depth)
+
+        SympathizerClosure.objects.create(ancestor_id=node.pk, descendant_id=node.pk, depth=0)
+        if node.referrer_id is not None:
+            cls._attach_closure(node.pk, node.referrer_id)
+            cls._adjust_counters(node.path, node.referrer_id, 1, 1)
+        NetworkChange.record(NetworkChange.ADDED, node.pk, path=node.path)
+        NetworkVersion.bump()
+
+    @classmethod
+    def node_moved(cls, node, old_referrer_id):
+        """
+        Repair the tree columns of a whole subtree after its root changed referrer.
+
+        Args:
+            node: Sympathizer instance whose referrer changed
+            old_referrer_id: Previous referrer id (None if it was a root)
+        """
+        current = cls._tree_position(node.pk)
+        if current is None or current['path'] is None:
+            cls.node_created(node)
+            return
+
+        old_path = current['path']
+        parent = cls._tree_position(node.referrer_id)
+        if parent and parent['path'] is None:
+            parent = cls._repair_position(node.referrer_id, node.pk)
+        if parent and (parent['path'] == old_path or parent['path'].startswith(f"{old_path}.")):
+            raise ValueError("Un simpatizante no puede quedar bajo su propia red")
+
+        size = current['descendant_count'] + 1
+        cls._adjust_counters(old_path, old_referrer_id, -size, -1)
+
+        cls._rebase_subtree(node.pk, old_path, current['depth'], parent)
+        cls._detach_closure(node.pk)
+        if node.referrer_id is not None:
+            cls._attach_closure(node.pk, node.referrer_id)
+            cls._adjust_counters(f"{parent['path']}.{node.pk}", node.referrer_id, size, 1)
+
+        node.refresh_from_db(fields=['path', 'root', 'depth', 'descendant_count', 'direct_referrals_count'])
+        NetworkChange.record(NetworkChange.MOVED, node.pk, path=node.path, old_path=old_path)
+        NetworkVersion.bump()
+        logger.info(f"Subtree of sympathizer {node.pk} moved from referrer {old_referrer_id} to {node.referrer_id}")
+
+    @staticmethod
+    def _repair_position(sympathizer_id, moved_id):
+        """
+        Fill in the path, root and depth of a sympathizer from its referrer chain.
+
+        Args:
+            sympathizer_id: Sympathizer whose stored path is NULL
+            moved_id: Sympathizer being moved under it, which must not be in its upline
+
+        Returns:
+            dict: The repaired tree columns, like ``_tree_position``
+        """
+        try:
+            chain = upline_ids(sympathizer_id)
+        except ValueError:
+            chain = None
+        if chain is None or moved_id in chain:
+            raise ValueError("Un simpatizante no puede quedar bajo su propia red")
+
+        position = Sympathizer.objects.filter(pk=sympathizer_id).values('descendant_count').first()
+        position.update(
+            path='.'.join(str(member_id) for member_id in reversed(chain)),
+            root_id=chain[-1],
+            depth=len(chain) - 1,
+        )
+        Sympathizer.objects.filter(pk=sympathizer_id).update(
+            path=position['path'], root_id=position['root_id'], depth=position['depth']
+        )
+        logger.info(f"Tree columns of sympathizer {sympathizer_id} repaired from its referrer chain")
+        return position
+
+    @classmethod
+    def node_deleted(cls, node):
+        """
+        Repair the tree after a sympathizer was deleted.
+
+        The referrer foreign key is SET_NULL, so former children are now roots
+        whose stored columns still describe the deleted ancestors.
+
+        Args:
+            node: Sympathizer instance that was deleted
+        """
+        if node.path and node.referrer_id is not None:
+            cls._adjust_counters(node.path, node.referrer_id, -1, -1)
+        cls.detach_orphans()
+        NetworkChange.record(NetworkChange.REMOVED, node.pk, old_path=node.path)
+        NetworkVersion.bump()
+
+    @classmethod
+    def detach_orphans(cls):
+        """Turn every root that still carries a depth from a deleted ancestor into a real root."""
+        orphans = (
+            Sympathizer.objects.filter(referrer__isnull=True, depth__gt=0)
+            .values_list('pk', 'path', 'depth', 'descendant_count')
+        )
+        for pk, path, depth, descendant_count in orphans:
+            # Surviving former ancestors lose the whole orphaned subtree
+            cls._adjust_counters(path, None, -(descendant_count + 1), 0)
+            cls._rebase_subtree(pk, path, depth, None)
+            cls._detach_closure(pk)
+
+    @staticmethod
+    def _rebase_subtree(node_id, old_path, old_depth, parent):
+        """
+        Re-hang the subtree rooted at ``node_id`` under ``parent``.
+
+        Paths get their ancestor prefix replaced, depths shift by the same
+        amount and root_id becomes the new network founder.
+        """
+        stripped = old_path.split('.')[:-1]
+        new_depth = parent['depth'] + 1 if parent else 0
+        Sympathizer.objects.filter(path__descendant_of=old_path).update(
+            path=RebasePath(
+                F('path'),
+                new_prefix=parent['path'] if parent else None,
+                strip_levels=len(stripped),
+                strip_chars=len('.'.join(stripped)) + 1 if stripped else 0,
+            ),
+            root_id=parent['root_id'] if parent else node_id,
+            depth=F('depth') + (new_depth - old_depth),
+        )
+
+    @staticmethod
+    def _adjust_counters(node_path, referrer_id, size_delta, direct_delta):
+        """
+        Add ``size_delta`` to descendant_count of every ancestor listed in
+        ``node_path`` and ``direct_delta`` to direct_referrals_count of
+        ``referrer_id``, using atomic F() updates.
+        """
+        ancestor_ids = [int(label) for label in node_path.split('.')[:-1]]
+        if ancestor_ids and size_delta:
+            Sympathizer.objects.filter(pk__in=ancestor_ids).update(
+                descendant_count=F('descendant_count') + size_delta
+            )
+        if referrer_id is not None and direct_delta:
+            Sympathizer.objects.filter(pk=referrer_id).update(
+                direct_referrals_count=F('direct_referrals_count') + direct_delta
+            )
+
+    @staticmethod
+    def _detach_closure(node_id):
+        """Drop the links between the subtree of ``node_id`` and its former ancestors."""
+        SympathizerClosure.objects.filter(
+            descendant_id__in=SympathizerClosure.objects.filter(ancestor_id=node_id).values('descendant_id'),
+            ancestor_id__in=(
+                SympathizerClosure.objects.filter(descendant_id=node_id)
+                .exclude(ancestor_id=node_id)
+                .values('ancestor_id')
+            ),
+        ).delete()
+
+    @staticmethod
+    def _attach_closure(node_id, parent_id):
+        """Link every ancestor of ``parent_id`` to every node in the subtree of ``node_id``."""
+        table = SympathizerClosure._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (ancestor_id, descendant_id, depth) "
+                f"SELECT up.ancestor_id, down.descendant_id, up.depth + down.depth + 1 "
+                f"FROM {table} AS up, {table} AS down "
+                f"WHERE up.descendant_id = %s AND down.ancestor_id = %s",
+                [parent_id, node_id],
+            )
+
+    @staticmethod
+    def rebuild_closure():
+        """
+        Rebuild the whole closure table with one recursive INSERT ... SELECT.
+
+        Returns:
+            int: Number of closure rows written
+        """
+        table = SympathizerClosure._meta.db_table
+        source = Sympathizer._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {table} (ancestor_id, descendant_id, depth) "
+                f"WITH RECURSIVE pairs(ancestor_id, descendant_id, depth) AS ("
+                f"SELECT id, id, 0 FROM {source} "
+                f"UNION ALL "
+                f"SELECT pairs.ancestor_id, s.id, pairs.depth + 1 "
+                f"FROM pairs JOIN {source} AS s ON s.referrer_id = pairs.descendant_id"
+                f") SELECT ancestor_id, descendant_id, depth FROM pairs"
+            )
+        return SympathizerClosure.objects.count()
+
+    @staticmethod
+    def reconcile_counters(dry_run=False):
+        """
+        Recompute descendant_count and direct_referrals_count for every row in
+        one statement and report the rows that had drifted.
+
+        Args:
+            dry_run: Only report the drift, do not write the fixed values
+
+        Returns:
+            list: (id, stored_descendants, expected_descendants,
+                   stored_direct, expected_direct) for each drifted row
+        """
+        expected_descendants = Coalesce(Subquery(
+            SympathizerClosure.objects.filter(ancestor_id=OuterRef('pk'), depth__gt=0)
+            .values('ancestor_id').annotate(total=Count('pk')).values('total')
+        ), 0)
+        expected_direct = Coalesce(Subquery(
+            Sympathizer.objects.filter(referrer_id=OuterRef('pk')).order_by()
+            .values('referrer_id').annotate(total=Count('pk')).values('total')
+        ), 0)
+
+        drifted = Sympathizer.objects.annotate(
+            expected_descendants=expected_descendants,
+            expected_direct=expected_direct,
+        ).exclude(
+            descendant_count=F('expected_descendants'),
+            direct_referrals_count=F('expected_direct'),
+        )
+        drift = list(drifted.order_by('pk').values_list(
+            'pk', 'descendant_count', 'expected_descendants', 'direct_referrals_count', 'expected_direct'
+        ))
+
+        if drift and not dry_run:
+            Sympathizer.objects.filter(pk__in=drifted.values('pk')).update(
+                descendant_count=expected_descendants,
+                direct_referrals_count=expected_direct,
+            )
+        return drift
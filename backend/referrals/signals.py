@@ -0,0 +1,35 @@
+"""
+Signal handlers for the referrals application.
+"""
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .events import announce_member_joined
+from .models import Sympathizer
+from .services.tree import TreeService
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_delete, sender=Sympathizer)
+def repair_tree_after_delete(sender, instance, **kwargs):
+    """Children of a deleted sympathizer become roots (SET_NULL); fix their tree columns."""
+    TreeService.node_deleted(instance)
+
+
+@receiver(post_save, sender=Sympathizer)
+def announce_new_member(sender, instance, created, **kwargs):
+    """Push a new member to the event streams of its ancestors once the insert commits."""
+    if created:
+        transaction.on_commit(partial(_announce_member_joined, instance.pk))
+
+
+def _announce_member_joined(member_id):
+    try:
+        announce_member_joined(member_id)
+    except Exception as e:
+        logger.error(f"Error publishing member_joined for {member_id}: {str(e)}")
@@ -0,0 +1,105 @@
+"""
+Generator-backed JSON responses for the network endpoints.
+
+With ``?stream=1`` the network, dashboard and admin visualization views
+return a StreamingHttpResponse: the tree structure comes from the compact
+graph cache, member columns are fetched a chunk at a time in output order
+and every node is encoded as soon as it is read, so a worker never holds
+the whole payload in memory. The JSON is the same as the buffered response.
+"""
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Sympathizer
+
+CHUNK_SIZE = 1000
+BUFFER_SIZE = 64 * 1024
+
+
+def wants_stream(request):
+    """Check if the client asked for a streaming response (``?stream=1``) in plain JSON."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format != 'json':
+        return False
+    return request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def dumps(value):
+    """Encode a value the way DRF's JSONRenderer does (compact, unicode, ISO dates)."""
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def member_columns(ids, columns, chunk_size=CHUNK_SIZE, keep_missing=False):
+    """
+    Yield (id, *columns) for every sympathizer in ``ids``, keeping that order.
+
+    Runs one query per ``chunk_size`` ids. Ids deleted since the graph was
+    read are skipped, or yielded as None with ``keep_missing``.
+    """
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        values = {
+            row[0]: row
+            for row in Sympathizer.objects.filter(pk__in=chunk).values_list('id', *columns)
+        }
+        for member_id in chunk:
+            row = values.get(member_id)
+            if row is not None or keep_missing:
+                yield row
+
+
+def json_list(items):
+    """Yield the JSON text of a list, one item at a time."""
+    yield '['
+    first = True
+    for item in items:
+        yield dumps(item) if first else ',' + dumps(item)
+        first = False
+    yield ']'
+
+
+def json_object(fields, lists=(), raw=()):
+    """
+    Yield the JSON text of an object.
+
+    Args:
+        fields: dict of plain values, encoded up front
+        lists: (key, iterable) pairs streamed as lists after ``fields``
+        raw: (key, fragments) pairs whose value is already JSON text
+    """
+    yield '{'
+    separator = ''
+    for key, value in fields.items():
+        yield f"{separator}{dumps(key)}:{dumps(value)}"
+        separator = ','
+    for key, items in lists:
+        yield f"{separator}{dumps(key)}:"
+        yield from json_list(items)
+        separator = ','
+    for key, fragments in raw:
+        yield f"{separator}{dumps(key)}:"
+        yield from fragments
+        separator = ','
+    yield '}'
+
+
+def _buffered(parts, size=BUFFER_SIZE):
+    """Group small text fragments into encoded chunks of about ``size`` bytes."""
+    buffer = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def streaming_json_response(parts):
+    """Wrap a generator of JSON text fragments in a StreamingHttpResponse."""
+    return StreamingHttpResponse(_buffered(parts), content_type='application/json')
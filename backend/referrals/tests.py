@@ -2,12 +2,31 @@
 Tests for the referrals application.
 Run with: pytest referrals/tests.py -v
 """
+import asyncio
+import json
+import numpy as np
 import pytest
+from io import StringIO
 from django.test import TestCase
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Sympathizer, Department, Municipality
+from django.core.management import call_command
+from .models import Sympathizer, SympathizerClosure, Department, Municipality, NetworkChange, NetworkVersion
+from .queries import subtree_rows, is_descendant
+from .layout import tidy_tree, layout_rows, force_layout_rows, has_cached_force_layout
+from .graph import CompactGraph, MappedGraph, get_graph, network_rows, write_snapshot
+from .events import broker
+from .services.counts import CountService
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cached counts and layouts must not leak between tests."""
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
 
 
 @pytest.fixture
@@ -110,6 +129,278 @@ class TestSympathizerModel:
         assert sympathizer.get_direct_referrals_count() == 1
 
 
+class TestSympathizerTree:
+    def _create(self, cedula, referrer=None):
+        return Sympathizer.objects.create(
+            nombres="Nodo",
+            apellidos=cedula,
+            cedula=cedula,
+            phone="3000000000",
+            sexo="M",
+            referrer=referrer,
+        )
+
+    def test_path_set_on_create(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        grandchild = self._create("3000000002", referrer=child)
+        assert sympathizer.path == str(sympathizer.id)
+        grandchild.refresh_from_db()
+        assert grandchild.path == f"{sympathizer.id}.{child.id}.{grandchild.id}"
+
+    def test_subtree_manager(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        grandchild = self._create("3000000002", referrer=child)
+        self._create("3000000003")
+
+        ids = set(Sympathizer.objects.subtree(sympathizer.id).values_list('id', flat=True))
+        assert ids == {sympathizer.id, child.id, grandchild.id}
+        ids = set(Sympathizer.objects.subtree(sympathizer.id, max_depth=1).values_list('id', flat=True))
+        assert ids == {sympathizer.id, child.id}
+        assert sympathizer.get_total_network_size() == 2
+
+    def test_reparent_rewrites_subtree_paths(self, db, sympathizer):
+        other_root = self._create("3000000001")
+        child = self._create("3000000002", referrer=sympathizer)
+        grandchild = self._create("3000000003", referrer=child)
+
+        child.referrer = other_root
+        child.save()
+
+        grandchild.refresh_from_db()
+        assert grandchild.path == f"{other_root.id}.{child.id}.{grandchild.id}"
+        assert sympathizer.get_total_network_size() == 0
+        assert other_root.is_ancestor_of(grandchild)
+
+    def test_reparent_under_own_descendant_rejected(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        sympathizer.referrer = child
+        with pytest.raises(ValueError):
+            sympathizer.save()
+
+    def test_reparent_under_referrer_without_path(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        other = self._create("3000000002")
+        Sympathizer.objects.filter(pk=child.pk).update(path=None)
+
+        other.referrer = child
+        other.save()
+
+        child.refresh_from_db()
+        other.refresh_from_db()
+        assert child.path == f"{sympathizer.id}.{child.id}"
+        assert other.path == f"{sympathizer.id}.{child.id}.{other.id}"
+        assert sympathizer.get_total_network_size() == 2
+
+    def test_reparent_under_own_descendant_without_path_rejected(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        Sympathizer.objects.filter(pk=child.pk).update(path=None)
+        sympathizer.referrer = child
+        with pytest.raises(ValueError):
+            sympathizer.save()
+
+    def test_create_under_referrer_without_path(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        Sympathizer.objects.filter(pk=child.pk).update(path=None)
+
+        grandchild = self._create("3000000002", referrer=child)
+
+        grandchild.refresh_from_db()
+        assert grandchild.path == f"{sympathizer.id}.{child.id}.{grandchild.id}"
+        assert grandchild.root_id == sympathizer.id
+        assert grandchild.depth == 2
+        assert SympathizerClosure.depth_between(sympathizer.id, grandchild.id) == 2
+        assert sympathizer.get_total_network_size() == 2
+
+    def test_delete_turns_children_into_roots(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        grandchild = self._create("3000000002", referrer=child)
+
+        child.delete()
+
+        grandchild.refresh_from_db()
+        assert grandchild.referrer_id is None
+        assert grandchild.path == str(grandchild.id)
+
+    def test_closure_rows_on_create(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        grandchild = self._create("3000000002", referrer=child)
+
+        assert SympathizerClosure.depth_between(sympathizer.id, grandchild.id) == 2
+        assert SympathizerClosure.depth_between(grandchild.id, sympathizer.id) is None
+        assert list(Sympathizer.objects.at_depth(sympathizer.id, 2)) == [grandchild]
+
+    def test_closure_follows_reparent_and_delete(self, db, sympathizer):
+        other_root = self._create("3000000001")
+        child = self._create("3000000002", referrer=sympathizer)
+        grandchild = self._create("3000000003", referrer=child)
+
+        child.referrer = other_root
+        child.save()
+        assert SympathizerClosure.depth_between(sympathizer.id, grandchild.id) is None
+        assert SympathizerClosure.depth_between(other_root.id, grandchild.id) == 2
+
+        child.delete()
+        assert SympathizerClosure.depth_between(other_root.id, grandchild.id) is None
+        assert SympathizerClosure.objects.filter(descendant=grandchild).count() == 1
+
+    def test_rebuild_closure_command(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        self._create("3000000002", referrer=child)
+        expected = set(SympathizerClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+        SympathizerClosure.objects.all().delete()
+        call_command('rebuild_closure', stdout=StringIO())
+
+        assert set(SympathizerClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')) == expected
+
+    def test_root_and_depth_follow_tree(self, db, sympathizer):
+        sympathizer.network_name = "Red Principal"
+        sympathizer.save()
+        other_root = self._create("3000000001")
+        child = self._create("3000000002", referrer=sympathizer)
+        grandchild = self._create("3000000003", referrer=child)
+
+        grandchild.refresh_from_db()
+        assert (grandchild.root_id, grandchild.depth) == (sympathizer.id, 2)
+        assert grandchild.get_network_name() == "Red Principal"
+
+        child.referrer = other_root
+        child.save()
+        grandchild.refresh_from_db()
+        assert (grandchild.root_id, grandchild.depth) == (other_root.id, 2)
+
+        other_root.delete()
+        grandchild.refresh_from_db()
+        assert (grandchild.root_id, grandchild.depth) == (child.id, 1)
+
+    def test_counters_follow_tree_changes(self, db, sympathizer):
+        other_root = self._create("3000000001")
+        child = self._create("3000000002", referrer=sympathizer)
+        self._create("3000000003", referrer=child)
+        self._create("3000000004", referrer=child)
+
+        sympathizer.refresh_from_db()
+        assert (sympathizer.descendant_count, sympathizer.direct_referrals_count) == (3, 1)
+
+        child.referrer = other_root
+        child.save()
+        sympathizer.refresh_from_db()
+        other_root.refresh_from_db()
+        assert (sympathizer.descendant_count, sympathizer.direct_referrals_count) == (0, 0)
+        assert (other_root.descendant_count, other_root.direct_referrals_count) == (3, 1)
+
+        child.delete()
+        other_root.refresh_from_db()
+        assert (other_root.descendant_count, other_root.direct_referrals_count) == (0, 0)
+
+    def test_reconcile_tree_counters_command(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        self._create("3000000002", referrer=child)
+        Sympathizer.objects.filter(pk=sympathizer.pk).update(descendant_count=7)
+
+        out = StringIO()
+        call_command('reconcile_tree_counters', stdout=out)
+
+        assert 'Drifted rows: 1' in out.getvalue()
+        sympathizer.refresh_from_db()
+        assert sympathizer.descendant_count == 2
+
+    def test_subtree_rows_cte(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        grandchild = self._create("3000000002", referrer=child)
+
+        rows = subtree_rows(sympathizer.id, columns=('cedula', 'created_at'))
+        assert [row[:3] for row in rows] == [
+            (sympathizer.id, None, 0),
+            (child.id, sympathizer.id, 1),
+            (grandchild.id, child.id, 2),
+        ]
+        assert rows[2][3] == "3000000002"
+        assert rows[2][4] == Sympathizer.objects.get(pk=grandchild.id).created_at
+        assert len(subtree_rows(sympathizer.id, max_depth=1)) == 2
+        assert is_descendant(sympathizer.id, grandchild.id)
+        assert not is_descendant(grandchild.id, sympathizer.id)
+
+    def test_compact_graph(self, db):
+        graph = CompactGraph([1, 2, 3, 4, 7], [None, 1, 1, 3, None])
+        assert graph.children(1) == [2, 3]
+        assert graph.subtree(1) == [(1, None, 0), (2, 1, 1), (3, 1, 1), (4, 3, 2)]
+        assert graph.subtree(1, max_depth=1) == [(1, None, 0), (2, 1, 1), (3, 1, 1)]
+        assert graph.network_size(1) == 3
+        assert graph.depth_of(4) == 2
+        assert 7 in graph and 5 not in graph
+
+    def test_compact_graph_collapse(self, db):
+        # 1 -> (2, 3), 2 -> (4, 5, 6), 3 -> (7), 7 -> (8)
+        graph = CompactGraph([1, 2, 3, 4, 5, 6, 7, 8], [None, 1, 1, 2, 2, 2, 3, 7])
+        rows, clusters = graph.collapse(1, budget=3)
+        assert [row[0] for row in rows] == [1, 2, 3]
+        assert clusters == {2: (4, 1), 3: (3, 2)}
+
+        # The biggest subtree is expanded first
+        rows, clusters = graph.collapse(1, budget=6)
+        assert [row[0] for row in rows] == [1, 2, 3, 4, 5, 6]
+        assert clusters == {3: (3, 2)}
+
+        rows, clusters = graph.collapse(1, budget=100)
+        assert rows == graph.subtree(1) and clusters == {}
+
+    def test_graph_cache_rebuilds_on_version_change(self, db, sympathizer):
+        child = self._create("3000000001", referrer=sympathizer)
+        assert get_graph().network_size(sympathizer.id) == 1
+
+        grandchild = self._create("3000000002", referrer=child)
+        assert get_graph().network_size(sympathizer.id) == 2
+
+        rows = network_rows(sympathizer.id, columns=('cedula',))
+        assert rows[-1] == (grandchild.id, child.id, 2, "3000000002")
+
+    def test_tidy_tree_layout(self):
+        # 0 -> (1, 2), 1 -> (3, 4), 2 -> (5)
+        x = tidy_tree([-1, 0, 0, 1, 1, 2], [0, 1, 1, 2, 2, 2]).tolist()
+        assert x[3:] == [0.0, 1.0, 2.0]
+        assert x[1] == 0.5 and x[2] == 2.0
+        assert x[0] == (x[1] + x[2]) / 2
+
+        # A long referral chain must not hit the recursion limit
+        chain = tidy_tree([-1] + list(range(4999)), list(range(5000)))
+        assert chain.max() == 0
+
+        xs, ys = layout_rows([(10, None, -1), (11, 10, 0), (12, 11, 1), (13, 11, 1)])
+        assert ys.tolist() == [-100, 0, 100, 100]
+        assert xs.tolist() == [50.0, 50.0, 0.0, 100.0]
+
+    def test_force_layout_spreads_nodes(self):
+        rows = [(1, None, 0)] + [(index, 1, 1) for index in range(2, 40)] + [(index, 2, 2) for index in range(40, 60)]
+        xs, ys = force_layout_rows(rows)
+        assert not np.isnan(xs).any() and not np.isnan(ys).any()
+        points = np.stack([xs, ys], axis=1)
+        gaps = np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=2))
+        np.fill_diagonal(gaps, np.inf)
+        assert gaps.min() > 10
+
+    def test_graph_snapshot_round_trip(self, db, tmp_path):
+        graph = CompactGraph([1, 2, 3, 4, 7], [None, 1, 1, 3, None], version=(5, None))
+        path = str(tmp_path / 'graph.bin')
+        write_snapshot(graph, path)
+
+        mapped = MappedGraph.open(path)
+        assert mapped.version == (5, None)
+        assert mapped.subtree(1) == graph.subtree(1)
+        assert mapped.children(3) == [4]
+        assert mapped.network_size(1) == 3
+        assert mapped.depth_of(4) == 2
+        assert MappedGraph.open(str(tmp_path / 'missing.bin')) is None
+
+    def test_graph_cache_shares_snapshot_file(self, db, sympathizer, settings, tmp_path):
+        settings.REFERRAL_GRAPH_SNAPSHOT = str(tmp_path / 'graph.bin')
+        child = self._create("3000000001", referrer=sympathizer)
+
+        graph = get_graph()
+        assert isinstance(graph, MappedGraph)
+        assert graph.children(sympathizer.id) == [child.id]
+        assert MappedGraph.open(settings.REFERRAL_GRAPH_SNAPSHOT).version == graph.version
+
 # ============ API Tests ============
 
 class TestHealthCheck:
@@ -119,6 +410,39 @@ class TestHealthCheck:
         assert response.data['status'] == 'healthy'
         assert 'database' in response.data['checks']
 
+    def test_health_check_serves_cached_count(self, api_client, sympathizer):
+        response = api_client.get('/api/health/')
+        assert response.data['checks']['sympathizers_count'] == 1
+        assert response.data['checks']['sympathizers_count_exact'] is True
+
+        Sympathizer.objects.create(
+            nombres="Nuevo", apellidos="Miembro", cedula="5600000000", phone="3000000001", sexo="M",
+        )
+        # Within the TTL the cached count is served and flagged as such
+        response = api_client.get('/api/health/')
+        assert response.data['checks']['sympathizers_count'] == 1
+        assert response.data['checks']['sympathizers_count_exact'] is False
+
+
+class TestCountService:
+    def test_stale_count_refreshes_in_background(self, sympathizer, settings, monkeypatch):
+        settings.REFERRAL_COUNT_CACHE_TTL = 0
+        refreshed = []
+        monkeypatch.setattr(CountService, '_refresh_in_background', lambda key, queryset, ttl: refreshed.append(key))
+        queryset = Sympathizer.objects.filter(sexo="M")
+        assert CountService.count(queryset) == (1, True)
+
+        Sympathizer.objects.create(
+            nombres="Nuevo", apellidos="Miembro", cedula="5600000001", phone="3000000001", sexo="M",
+        )
+        # The stale entry is still served while the recount runs
+        assert CountService.count(queryset) == (1, False)
+        assert len(refreshed) == 1
+
+    def test_filters_are_counted_separately(self, sympathizer):
+        assert CountService.count(Sympathizer.objects.filter(sexo="M")).value == 1
+        assert CountService.count(Sympathizer.objects.filter(sexo="F")).value == 0
+
 
 class TestLocationAPI:
     def test_list_departments(self, api_client, department):
@@ -217,6 +541,335 @@ class TestAuthAPI:
         assert response.status_code == status.HTTP_200_OK
         assert response.data['nombres'] == user_with_password.nombres
 
+    def test_network_and_dashboard_trees(self, api_client, user_with_password):
+        child = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4000000001", phone="3000000001", sexo="M",
+            referrer=user_with_password,
+        )
+        Sympathizer.objects.create(
+            nombres="Nieto", apellidos="Uno", cedula="4000000002", phone="3000000002", sexo="F",
+            referrer=child,
+        )
+        api_client.force_authenticate(user=user_with_password.user)
+
+        response = api_client.get('/api/auth/network/')
+        assert response.status_code == status.HTTP_200_OK
+        levels = sorted(node['level'] for node in response.data['nodes'])
+        assert levels == [0, 1, 2]
+        assert len(response.data['links']) == 2
+
+        response = api_client.get('/api/auth/dashboard/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['referrals_count'] == 1
+        assert response.data['referrals'][0]['sub_referrals'][0]['cedula'] == "4000000002"
+        assert response.data['level_counts'] == {'1': 1, '2': 1}
+
+    def test_streaming_matches_buffered_responses(self, api_client, user_with_password):
+        child = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4400000001", phone="3000000001", sexo="M",
+            referrer=user_with_password,
+        )
+        for index in range(2):
+            Sympathizer.objects.create(
+                nombres="Nieto", apellidos=str(index), cedula=f"440000001{index}", phone="3000000002", sexo="F",
+                referrer=child,
+            )
+        Sympathizer.objects.create(
+            nombres="Hija", apellidos="Dos", cedula="4400000002", phone="3000000003", sexo="F",
+            referrer=user_with_password,
+        )
+        api_client.force_authenticate(user=user_with_password.user)
+
+        def by_id(items):
+            return sorted(items, key=lambda item: (str(item.get('id')), str(item.get('target'))))
+
+        for url in ('/api/auth/network/', '/api/auth/dashboard/'):
+            buffered = json.loads(api_client.get(url).content)
+            response = api_client.get(url, {'stream': '1'})
+            assert response.streaming
+            streamed = json.loads(b''.join(response.streaming_content))
+            if 'nodes' in buffered:
+                assert by_id(streamed['nodes']) == by_id(buffered['nodes'])
+                assert by_id(streamed['links']) == by_id(buffered['links'])
+            else:
+                assert streamed == buffered
+
+    def test_network_columnar_format(self, api_client, user_with_password):
+        child = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4500000001", phone="3000000001", sexo="M",
+            referrer=user_with_password,
+        )
+        api_client.force_authenticate(user=user_with_password.user)
+
+        response = api_client.get('/api/auth/network/', {'format': 'columnar'})
+        assert response.status_code == status.HTTP_200_OK
+        payload = json.loads(response.content)
+        assert payload['format'] == 'columnar'
+        assert payload['ids'] == [user_with_password.id, child.id]
+        assert payload['parent_index'] == [-1, 0]
+        assert payload['columns']['cedula'] == [user_with_password.cedula, "4500000001"]
+        assert 'nodes' not in payload and 'links' not in payload
+
+        response = api_client.get(
+            '/api/auth/network/', HTTP_ACCEPT='application/vnd.redsimpatizantes.columnar+json'
+        )
+        assert json.loads(response.content)['ids'] == payload['ids']
+
+        msgpack = pytest.importorskip('msgpack')
+        response = api_client.get('/api/auth/network/', HTTP_ACCEPT='application/x-msgpack')
+        assert response['Content-Type'] == 'application/x-msgpack'
+        assert msgpack.unpackb(response.content)['columns'] == payload['columns']
+
+    def test_dashboard_columnar_format(self, api_client, user_with_password):
+        child = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4500000001", phone="3000000001", sexo="M",
+            referrer=user_with_password,
+        )
+        grandchild = Sympathizer.objects.create(
+            nombres="Nieto", apellidos="Uno", cedula="4500000002", phone="3000000002", sexo="F",
+            referrer=child,
+        )
+        sibling = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Dos", cedula="4500000003", phone="3000000003", sexo="M",
+            referrer=user_with_password,
+        )
+        api_client.force_authenticate(user=user_with_password.user)
+
+        etag = api_client.get('/api/auth/dashboard/')['ETag']
+        response = api_client.get('/api/auth/dashboard/', {'format': 'columnar'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+        payload = json.loads(response.content)
+        assert payload['format'] == 'columnar'
+        assert payload['referrals_count'] == 2
+        assert payload['ids'] == [sibling.id, child.id, grandchild.id]
+        assert payload['parent_index'] == [-1, -1, 1]
+        assert payload['columns']['referrals_count'] == [0, 1, 0]
+        assert 'referrals' not in payload and 'sub_referrals' not in payload['columns']
+
+    def test_conditional_get_on_network_views(self, api_client, user_with_password):
+        child = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4600000001", phone="3000000001", sexo="M",
+            referrer=user_with_password,
+        )
+        api_client.force_authenticate(user=user_with_password.user)
+
+        for url in ('/api/auth/network/', '/api/auth/dashboard/', '/api/auth/level-labels/'):
+            response = api_client.get(url)
+            etag = response['ETag']
+            assert 'no-cache' in response['Cache-Control']
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        # A signup in another network keeps the tags
+        etags = {url: api_client.get(url)['ETag'] for url in ('/api/auth/network/', '/api/auth/dashboard/')}
+        Sympathizer.objects.create(
+            nombres="Otra", apellidos="Red", cedula="4600000099", phone="3000000099", sexo="F",
+        )
+        for url, etag in etags.items():
+            assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+        # Other formats have their own tag
+        etag = api_client.get('/api/auth/network/')['ETag']
+        assert api_client.get('/api/auth/network/', {'format': 'columnar'})['ETag'] != etag
+        child.nombres = "Renombrado"
+        child.save()
+        response = api_client.get('/api/auth/network/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+        etag = api_client.get('/api/auth/level-labels/')['ETag']
+        api_client.put('/api/auth/level-labels/', {'level_labels': {'1': 'Lideres'}}, format='json')
+        response = api_client.get('/api/auth/level-labels/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_network_changes_sync(self, api_client, user_with_password, settings):
+        settings.REFERRAL_SYNC_SETTLE_SECONDS = 0
+        child = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4700000001", phone="3000000001", sexo="M",
+            referrer=user_with_password,
+        )
+        outsider = Sympathizer.objects.create(
+            nombres="Otra", apellidos="Red", cedula="4700000002", phone="3000000002", sexo="F",
+        )
+        api_client.force_authenticate(user=user_with_password.user)
+        url = '/api/auth/network/changes/'
+
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['reset'] is True
+        cursor = response.data['cursor']
+
+        response = api_client.get(url, {'since': cursor})
+        assert response.data['reset'] is False
+        assert response.data['upserts'] == [] and response.data['removed'] == []
+
+        grandchild = Sympathizer.objects.create(
+            nombres="Nieto", apellidos="Uno", cedula="4700000003", phone="3000000003", sexo="F",
+            referrer=child,
+        )
+        outsider.nombres = "Ajena"
+        outsider.save()
+        response = api_client.get(url, {'since': cursor})
+        upserts = {node['id']: node for node in response.data['upserts']}
+        assert set(upserts) == {child.id, grandchild.id}
+        assert upserts[grandchild.id]['level'] == 2
+        assert upserts[child.id]['referrals_count'] == 1
+        cursor = response.data['cursor']
+
+        # Moving the child out of the network removes its whole subtree
+        child.referrer = outsider
+        child.save()
+        response = api_client.get(url, {'since': cursor})
+        assert response.data['removed'] == [child.id]
+        assert [node['id'] for node in response.data['upserts']] == [user_with_password.id]
+        cursor = response.data['cursor']
+
+        # Moving it back sends the subtree again
+        child.referrer = user_with_password
+        child.save()
+        response = api_client.get(url, {'since': cursor})
+        assert {node['id'] for node in response.data['upserts']} == {user_with_password.id, child.id, grandchild.id}
+        cursor = response.data['cursor']
+
+        grandchild_id = grandchild.id
+        grandchild.delete()
+        response = api_client.get(url, {'since': cursor})
+        assert response.data['removed'] == [grandchild_id]
+        assert [node['id'] for node in response.data['upserts']] == [child.id]
+
+        assert api_client.get(url, {'since': 'no-es-un-cursor'}).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_network_changes_commit_out_of_order(self, api_client, user_with_password, settings):
+        from datetime import timedelta
+        from django.utils import timezone
+        settings.REFERRAL_SYNC_SETTLE_SECONDS = 10
+        settled = timezone.now() - timedelta(minutes=1)
+        NetworkChange.objects.update(created_at=settled)
+        api_client.force_authenticate(user=user_with_password.user)
+        url = '/api/auth/network/changes/'
+        cursor = api_client.get(url).data['cursor']
+
+        first = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4700000011", phone="3000000011", sexo="M",
+            referrer=user_with_password,
+        )
+        second = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Dos", cedula="4700000012", phone="3000000012", sexo="M",
+            referrer=user_with_password,
+        )
+        # The first change took the lower id but has not committed yet
+        pending = NetworkChange.objects.get(member_id=first.id, kind=NetworkChange.ADDED)
+        pending.delete()
+
+        response = api_client.get(url, {'since': cursor})
+        assert response.data['upserts'] == []
+        assert response.data['cursor'] == cursor
+
+        # It commits after the higher id was read; both are delivered once settled
+        NetworkChange.objects.create(
+            id=pending.id, member_id=pending.member_id, kind=pending.kind, path=pending.path
+        )
+        NetworkChange.objects.update(created_at=settled)
+        response = api_client.get(url, {'since': cursor})
+        assert {node['id'] for node in response.data['upserts']} >= {first.id, second.id}
+
+    def test_member_joined_event(self, user_with_password, django_capture_on_commit_callbacks):
+        child = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4800000001", phone="3000000001", sexo="M",
+            referrer=user_with_password,
+        )
+
+        async def subscribe():
+            return broker.subscribe(user_with_password.id)
+
+        loop = asyncio.new_event_loop()
+        try:
+            queue = loop.run_until_complete(subscribe())
+            with django_capture_on_commit_callbacks(execute=True):
+                grandchild = Sympathizer.objects.create(
+                    nombres="Nieto", apellidos="Uno", cedula="4800000002", phone="3000000002", sexo="F",
+                    referrer=child,
+                )
+            event = loop.run_until_complete(asyncio.wait_for(queue.get(), timeout=1))
+        finally:
+            broker.unsubscribe(user_with_password.id, queue)
+            loop.close()
+
+        assert event['type'] == 'member_joined'
+        assert event['member']['id'] == grandchild.id
+        assert event['member']['parent_id'] == child.id
+        assert event['member']['level'] == 2
+        assert event['referrals_count'] == 1
+        assert event['network_size'] == 2
+        assert not broker.has_subscribers()
+
+    def test_network_events_requires_token(self, api_client, db):
+        response = api_client.get('/api/auth/network/events/')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        response = api_client.get('/api/auth/network/events/', {'token': 'no-existe'})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_network_children_pages_and_ownership(self, api_client, user_with_password):
+        children = [
+            Sympathizer.objects.create(
+                nombres="Hijo", apellidos=str(index), cedula=f"410000000{index}", phone="3000000001", sexo="M",
+                referrer=user_with_password,
+            )
+            for index in range(3)
+        ]
+        Sympathizer.objects.create(
+            nombres="Nieto", apellidos="Uno", cedula="4200000001", phone="3000000002", sexo="F",
+            referrer=children[0],
+        )
+        outsider = Sympathizer.objects.create(
+            nombres="Otra", apellidos="Red", cedula="4300000001", phone="3000000003", sexo="F",
+        )
+        api_client.force_authenticate(user=user_with_password.user)
+        url = f'/api/auth/network/{user_with_password.id}/children/'
+
+        response = api_client.get(url, {'limit': 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert [child['id'] for child in response.data['children']] == [children[0].id, children[1].id]
+        assert response.data['children'][0]['referrals_count'] == 1
+        assert response.data['children'][0]['network_size'] == 1
+
+        response = api_client.get(url, {'limit': 2, 'cursor': response.data['next_cursor']})
+        assert [child['id'] for child in response.data['children']] == [children[2].id]
+        assert response.data['next_cursor'] is None
+
+        response = api_client.get(url, {'depth': 2})
+        assert [child['level'] for child in response.data['children']] == [1, 1, 1, 2]
+
+        response = api_client.get(f'/api/auth/network/{outsider.id}/children/')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        response = api_client.get(url, {'cursor': 'no-valido'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_network_export_own_downline(self, api_client, user_with_password):
+        child = Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="4400000001", phone="3000000001", sexo="M",
+            referrer=user_with_password,
+        )
+        Sympathizer.objects.create(
+            nombres="Nieto", apellidos="Uno", cedula="4400000002", phone="3000000002", sexo="F", referrer=child,
+        )
+        outsider = Sympathizer.objects.create(
+            nombres="Otra", apellidos="Red", cedula="4400000003", phone="3000000003", sexo="F",
+        )
+        api_client.force_authenticate(user=user_with_password.user)
+
+        response = api_client.get('/api/auth/network/export/', {'format': 'csv'})
+        assert response.status_code == status.HTTP_200_OK
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        assert [line.split(',')[3] for line in lines[1:]] == [user_with_password.cedula, '4400000001', '4400000002']
+        assert lines[3].endswith(',2,4400000001,0')
+
+        response = api_client.get('/api/auth/network/export/', {'format': 'csv', 'member': child.id})
+        assert len(b''.join(response.streaming_content).splitlines()) == 3
+        response = api_client.get('/api/auth/network/export/', {'format': 'csv', 'member': outsider.id})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
 
 class TestAdminAPI:
     def test_admin_login_success(self, api_client, admin_user):
@@ -251,6 +904,295 @@ class TestAdminAPI:
         response = api_client.get('/api/admin/networks/')
         assert response.status_code == status.HTTP_200_OK
 
+    def test_admin_networks_sort_and_pages(self, api_client, admin_user, sympathizer, django_assert_max_num_queries):
+        roots = [sympathizer]
+        for index in range(3):
+            roots.append(Sympathizer.objects.create(
+                nombres=f"Fundador{index}", apellidos="Red", cedula=f"540000000{index}", phone="3000000001", sexo="M",
+            ))
+        for index in range(2):
+            Sympathizer.objects.create(
+                nombres="Hijo", apellidos=str(index), cedula=f"540000001{index}", phone="3000000001", sexo="M",
+                referrer=roots[2],
+            )
+        api_client.force_authenticate(user=admin_user)
+
+        with django_assert_max_num_queries(4):
+            response = api_client.get('/api/admin/networks/', {'sort': '-size', 'page_size': 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total'] == 4
+        assert response.data['pages'] == 2
+        assert response.data['results'][0]['id'] == roots[2].id
+        assert response.data['results'][0]['total_network_size'] == 2
+
+        response = api_client.get('/api/admin/networks/', {'sort': 'name', 'page': 2, 'page_size': 3})
+        assert [network['id'] for network in response.data['results']] == [sympathizer.id]
+
+        response = api_client.get('/api/admin/networks/', {'sort': 'cedula'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_admin_users_keyset_pages(self, api_client, admin_user, sympathizer):
+        created = [sympathizer]
+        for index in range(4):
+            created.append(Sympathizer.objects.create(
+                nombres="Miembro", apellidos=str(index), cedula=f"550000000{index}", phone="3000000001", sexo="M",
+                referrer=sympathizer,
+            ))
+        # Same timestamp for two members: the id breaks the tie
+        Sympathizer.objects.filter(pk=created[2].pk).update(created_at=created[1].created_at)
+        api_client.force_authenticate(user=admin_user)
+
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 2, **({'cursor': cursor} if cursor else {})}
+            response = api_client.get('/api/admin/users/', params)
+            assert response.status_code == status.HTTP_200_OK
+            assert response.data['total'] == 5
+            seen.extend(user['id'] for user in response.data['results'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+        expected = list(
+            Sympathizer.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        assert seen == expected
+
+        response = api_client.get('/api/admin/users/', {'count': '1', 'q': 'Miembro'})
+        assert response.data['total'] == 4
+        assert response.data['total_exact'] is True
+        response = api_client.get('/api/admin/users/', {'cursor': 'roto'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = api_client.get('/api/sympathizers/', {'page_size': 3})
+        assert len(response.data['results']) == 3
+        assert response.data['next_cursor'] is not None
+
+    def test_admin_users_search(self, api_client, admin_user, sympathizer):
+        Sympathizer.objects.create(
+            nombres="Maria Jose", apellidos="Gomez", cedula="5600000001", phone="3000000001", sexo="F",
+            email="majo@test.com", referrer=sympathizer,
+        )
+        Sympathizer.objects.create(
+            nombres="Mario", apellidos="Lopez", cedula="7560000002", phone="3000000002", sexo="M",
+            referrer=sympathizer,
+        )
+        api_client.force_authenticate(user=admin_user)
+
+        def found(query):
+            response = api_client.get('/api/admin/users/', {'q': query})
+            return sorted(user['cedula'] for user in response.data['results'])
+
+        # Every word has to match some field; digits are a cedula prefix
+        assert found('maria gomez') == ['5600000001']
+        assert found('mari') == ['5600000001', '7560000002']
+        assert found('majo@') == ['5600000001']
+        assert found('560') == ['5600000001']
+        assert found('  ') == sorted(Sympathizer.objects.values_list('cedula', flat=True))
+
+    def test_admin_export_csv_streams(self, api_client, admin_user, sympathizer):
+        Sympathizer.objects.create(
+            nombres="María José", apellidos="Gómez", cedula="5700000001", phone="3000000001", sexo="F",
+            referrer=sympathizer,
+        )
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.get('/api/admin/users/export/', {'format': 'csv', 'q': '5700'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Disposition'].endswith('.csv"')
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        assert lines[0].startswith('ID,Nombres,Apellidos')
+        assert len(lines) == 2
+        assert 'María José,Gómez,5700000001' in lines[1]
+        assert 'FEMENINO' in lines[1] and 'Juan Perez' in lines[1]
+
+        response = api_client.get('/api/admin/users/export/', {'format': 'pdf'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_admin_export_xlsx(self, api_client, admin_user, sympathizer):
+        from io import BytesIO
+        from openpyxl import load_workbook
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.get('/api/admin/users/export/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Disposition'].endswith('.xlsx"')
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.iter_rows(values_only=True))
+        assert rows[0][0] == 'ID' and rows[0][-1] == 'Fecha Activacion'
+        assert rows[1][:4] == (sympathizer.id, 'Juan', 'Perez', sympathizer.cedula)
+        assert rows[1][10] == 'Raiz'
+
+    def test_admin_export_job(self, api_client, admin_user, sympathizer, settings, tmp_path,
+                              django_capture_on_commit_callbacks):
+        from .services.export_jobs import ExportJobService
+        settings.REFERRAL_EXPORT_DIR = str(tmp_path)
+        api_client.force_authenticate(user=admin_user)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = api_client.post('/api/admin/users/export/', {'format': 'csv', 'q': ' Juan '}, format='json')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == 'pending'
+        assert len(callbacks) == 1
+        job_id = response.data['id']
+
+        # The same export requested again while queued shares the job
+        response = api_client.post('/api/admin/users/export/', {'format': 'csv', 'q': 'Juan'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['id'] == job_id
+        response = api_client.get(f'/api/admin/exports/{job_id}/download/')
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+        ExportJobService.run(job_id)
+        response = api_client.get(f'/api/admin/exports/{job_id}/')
+        assert response.data['status'] == 'done'
+        assert response.data['progress'] == 100
+        assert response.data['processed_rows'] == 1
+        assert response.data['download_url'].endswith(f'/api/admin/exports/{job_id}/download/')
+
+        response = api_client.get(f'/api/admin/exports/{job_id}/download/')
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        assert len(lines) == 2 and lines[1].startswith(f'{sympathizer.id},Juan,Perez')
+
+        # Once finished, a new request starts a new job
+        response = api_client.post('/api/admin/users/export/', {'format': 'csv', 'q': 'Juan'}, format='json')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['id'] != job_id
+
+        response = api_client.post('/api/admin/users/export/', {'format': 'pdf'}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def _network(self, sympathizer):
+        def create(cedula, referrer):
+            return Sympathizer.objects.create(
+                nombres="Nodo", apellidos=cedula, cedula=cedula, phone="3000000001", sexo="M", referrer=referrer,
+            )
+        child = create("5800000001", sympathizer)
+        grandchild = create("5800000002", child)
+        second_child = create("5800000003", sympathizer)
+        create("5800000004", grandchild)
+        return child, grandchild, second_child
+
+    @staticmethod
+    def _csv_rows(response):
+        import csv
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(text.splitlines()))
+
+    def test_admin_network_export(self, api_client, admin_user, sympathizer):
+        child, grandchild, second_child = self._network(sympathizer)
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.get(f'/api/admin/networks/{sympathizer.id}/export/', {'format': 'csv'})
+        assert response.status_code == status.HTTP_200_OK
+        header, *rows = self._csv_rows(response)
+        assert header[-3:] == ['Nivel', 'Cedula Referidor', 'Tamano Red']
+        by_cedula = {row[3]: row for row in rows}
+        assert len(rows) == 5
+        assert rows[0][3] == sympathizer.cedula
+        assert by_cedula[sympathizer.cedula][-3:] == ['0', '', '4']
+        assert by_cedula[grandchild.cedula][-3:] == ['2', child.cedula, '1']
+        assert by_cedula[second_child.cedula][-3:] == ['1', sympathizer.cedula, '0']
+
+        # A subtree: levels are relative to it and its own sponsor is kept
+        response = api_client.get(f'/api/admin/networks/{child.id}/export/', {'format': 'csv', 'max_depth': 1})
+        header, *rows = self._csv_rows(response)
+        assert [(row[3], row[-3], row[-2]) for row in rows] == [
+            (child.cedula, '0', sympathizer.cedula),
+            (grandchild.cedula, '1', child.cedula),
+        ]
+
+        response = api_client.get('/api/admin/networks/999999/export/', {'format': 'csv'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_admin_network_export_job(self, api_client, admin_user, sympathizer, settings, tmp_path):
+        from openpyxl import load_workbook
+        from .services.export_jobs import ExportJobService
+        settings.REFERRAL_EXPORT_DIR = str(tmp_path)
+        self._network(sympathizer)
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.post(f'/api/admin/networks/{sympathizer.id}/export/', {'format': 'xlsx'}, format='json')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['kind'] == 'network'
+        ExportJobService.run(response.data['id'])
+
+        job = api_client.get(f"/api/admin/exports/{response.data['id']}/").data
+        assert job['status'] == 'done' and job['total_rows'] == 5 and job['processed_rows'] == 5
+        assert job['file_name'].startswith(f'red_{sympathizer.id}_')
+        sheet = load_workbook(tmp_path / job['file_name']).active
+        assert sheet.max_row == 6
+
+    def test_admin_network_graph_export(self, api_client, admin_user, sympathizer, municipality):
+        import xml.etree.ElementTree as ET
+        from django.utils import timezone
+        child, grandchild, second_child = self._network(sympathizer)
+        Sympathizer.objects.filter(pk=child.pk).update(municipio=municipality, activated_at=timezone.now())
+        api_client.force_authenticate(user=admin_user)
+        url = f'/api/admin/networks/{sympathizer.id}/graph-export/'
+
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'].startswith('application/graphml+xml')
+        ns = {'g': 'http://graphml.graphdrawing.org/xmlns'}
+        graph = ET.fromstring(b''.join(response.streaming_content)).find('g:graph', ns)
+        nodes = {node.get('id'): {data.get('key'): data.text for data in node} for node in graph.findall('g:node', ns)}
+        edges = {(edge.get('source'), edge.get('target')) for edge in graph.findall('g:edge', ns)}
+        assert len(nodes) == 5 and len(edges) == 4
+        assert (str(child.id), str(grandchild.id)) in edges
+        assert nodes[str(child.id)] == {
+            'label': 'Nodo 5800000001', 'level': '1', 'municipality': 'Medellin', 'activated': 'true',
+        }
+
+        response = api_client.get(url, {'format': 'gexf', 'max_depth': 1})
+        ns = {'x': 'http://gexf.net/1.3'}
+        graph = ET.fromstring(b''.join(response.streaming_content)).find('x:graph', ns)
+        assert len(graph.findall('x:nodes/x:node', ns)) == 3
+        assert {edge.get('target') for edge in graph.findall('x:edges/x:edge', ns)} == {
+            str(child.id), str(second_child.id),
+        }
+
+        response = api_client.get(f'/api/admin/networks/{child.id}/graph-export/', {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        assert lines[0] == 'Source,Target,Label,Level,Municipality,Activated'
+        great_grandchild = Sympathizer.objects.get(cedula='5800000004')
+        assert lines[1:] == [
+            f'{child.id},{grandchild.id},Nodo 5800000002,1,,false',
+            f'{grandchild.id},{great_grandchild.id},Nodo 5800000004,2,,false',
+        ]
+
+        response = api_client.get(url, {'format': 'dot'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_export_network_graph_command(self, sympathizer, tmp_path):
+        self._network(sympathizer)
+        out = StringIO()
+        call_command('export_network_graph', sympathizer.id, '--format', 'csv', stdout=out)
+        assert len(out.getvalue().splitlines()) == 5
+
+        output = tmp_path / 'red.gexf'
+        call_command('export_network_graph', sympathizer.id, '--format', 'gexf', '--output', str(output), stdout=StringIO())
+        assert output.read_text(encoding='utf-8').count('<edge ') == 4
+
+    def test_prune_export_jobs_command(self, admin_user, settings, tmp_path):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ExportJob
+        settings.REFERRAL_EXPORT_DIR = str(tmp_path)
+        (tmp_path / 'old.csv').write_text('ID')
+        old = ExportJob.objects.create(format='csv', fingerprint='a', status=ExportJob.DONE, file_name='old.csv')
+        stuck = ExportJob.objects.create(format='csv', fingerprint='b', status=ExportJob.RUNNING)
+        ExportJob.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+        ExportJob.objects.filter(pk=stuck.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        out = StringIO()
+        call_command('prune_export_jobs', stdout=out)
+        assert 'Interrupted jobs: 1' in out.getvalue()
+        assert not ExportJob.objects.filter(pk=old.pk).exists()
+        assert not (tmp_path / 'old.csv').exists()
+        assert ExportJob.objects.get(pk=stuck.pk).status == ExportJob.FAILED
+
     def test_admin_toggle_suspension(self, api_client, admin_user, user_with_password):
         # Login as admin
         login_response = api_client.post('/api/admin/login/', {
@@ -269,6 +1211,171 @@ class TestAdminAPI:
         user_with_password.refresh_from_db()
         assert user_with_password.is_suspended is True
 
+    def test_admin_bulk_moderation_subtree(self, api_client, admin_user, user_with_password,
+                                           django_assert_max_num_queries):
+        branch = []
+        referrer = user_with_password
+        for index in range(6):
+            referrer = Sympathizer.objects.create(
+                nombres="Rama", apellidos=str(index), cedula=f"590000000{index}", phone="3000000001", sexo="M",
+                referrer=referrer if index % 2 else user_with_password,
+            )
+            branch.append(referrer)
+        outsider = Sympathizer.objects.create(
+            nombres="Otra", apellidos="Red", cedula="5900000099", phone="3000000001", sexo="M",
+        )
+        Sympathizer.objects.filter(pk=branch[0].pk).update(is_suspended=True)
+        history_before = Sympathizer.history.count()
+        last_change = NetworkChange.objects.order_by('-id').values_list('id', flat=True).first()
+        version = NetworkVersion.current()
+        api_client.force_authenticate(user=admin_user)
+
+        with django_assert_max_num_queries(13):
+            response = api_client.post('/api/admin/users/bulk-moderation/', {
+                'root_id': user_with_password.id, 'is_suspended': True, 'reason': 'Fraude',
+            }, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        # The member that was already suspended is matched but not updated
+        assert response.data == {'matched': 7, 'updated': 6, 'accounts_updated': 1}
+
+        assert Sympathizer.objects.subtree(user_with_password.id).filter(is_suspended=False).count() == 0
+        outsider.refresh_from_db()
+        assert outsider.is_suspended is False
+        user_with_password.user.refresh_from_db()
+        assert user_with_password.user.is_active is False
+
+        history = Sympathizer.history.filter(history_change_reason='Fraude')
+        assert Sympathizer.history.count() - history_before == 6 == history.count()
+        assert set(history.values_list('history_type', flat=True)) == {'~'}
+        assert set(history.values_list('history_user', flat=True)) == {admin_user.id}
+        assert history.filter(id=branch[1].id).get().is_suspended is True
+
+        # The sync log follows the bulk update; the tree structure did not change
+        logged = NetworkChange.objects.filter(id__gt=last_change)
+        assert set(logged.values_list('kind', flat=True)) == {NetworkChange.UPDATED}
+        assert set(logged.values_list('member_id', flat=True)) == {user_with_password.id, *[m.id for m in branch[1:]]}
+        assert logged.get(member_id=branch[1].id).path == Sympathizer.objects.get(pk=branch[1].id).path
+        assert NetworkVersion.current() == version
+
+        response = api_client.post('/api/admin/users/bulk-moderation/', {
+            'ids': [branch[1].id, branch[2].id], 'link_enabled': False,
+        }, format='json')
+        assert response.data['updated'] == 2 and response.data['accounts_updated'] == 0
+        assert Sympathizer.objects.filter(link_enabled=False).count() == 2
+
+    def test_admin_bulk_moderation_rejects_bad_input(self, api_client, admin_user, sympathizer):
+        api_client.force_authenticate(user=admin_user)
+        url = '/api/admin/users/bulk-moderation/'
+
+        for payload in (
+            {'root_id': sympathizer.id},
+            {'root_id': sympathizer.id, 'is_suspended': 'si'},
+            {'root_id': sympathizer.id, 'ids': [sympathizer.id], 'is_suspended': True},
+            {'ids': [], 'is_suspended': True},
+            {'ids': ['1'], 'is_suspended': True},
+        ):
+            response = api_client.post(url, payload, format='json')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, payload
+
+        response = api_client.post(url, {'root_id': 999999, 'is_suspended': True}, format='json')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_admin_visualization_force_layout(self, api_client, admin_user, sympathizer):
+        for index in range(3):
+            Sympathizer.objects.create(
+                nombres="Hijo", apellidos=str(index), cedula=f"510000000{index}", phone="3000000001", sexo="M",
+                referrer=sympathizer,
+            )
+        api_client.force_authenticate(user=admin_user)
+        url = f'/api/admin/networks/{sympathizer.id}/visualization/'
+
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['layout'] == 'force'
+        positions = {(node['x'], node['y']) for node in response.data['nodes']}
+        assert len(positions) == 4
+
+        # Same network version: positions come from the cache
+        assert api_client.get(url).data['nodes'] == response.data['nodes']
+        assert api_client.get(url, {'layout': 'tree'}).data['layout'] == 'tree'
+
+    def test_force_layout_cache_is_per_network(self, api_client, admin_user, sympathizer, settings):
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        api_client.force_authenticate(user=admin_user)
+        api_client.get(f'/api/admin/networks/{sympathizer.id}/visualization/')
+        assert has_cached_force_layout(sympathizer.id)
+
+        # A signup in another network keeps this layout
+        Sympathizer.objects.create(
+            nombres="Otra", apellidos="Red", cedula="5200000001", phone="3000000001", sexo="F",
+        )
+        assert has_cached_force_layout(sympathizer.id)
+
+        Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="5200000002", phone="3000000002", sexo="M",
+            referrer=sympathizer,
+        )
+        assert not has_cached_force_layout(sympathizer.id)
+
+    def test_admin_visualization_etag(self, api_client, admin_user, sympathizer, settings):
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        api_client.force_authenticate(user=admin_user)
+        url = f'/api/admin/networks/{sympathizer.id}/visualization/'
+
+        # The first response caches the force layout, which changes the tag once
+        first = api_client.get(url)['ETag']
+        etag = api_client.get(url, HTTP_IF_NONE_MATCH=first)['ETag']
+        assert etag != first
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        Sympathizer.objects.create(
+            nombres="Hijo", apellidos="Uno", cedula="5300000001", phone="3000000001", sexo="M",
+            referrer=sympathizer,
+        )
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_nodes'] == 2
+
+        response = api_client.get('/api/admin/networks/999999/visualization/')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert not response.has_header('ETag')
+
+    def test_admin_visualization_clusters(self, api_client, admin_user, sympathizer):
+        parent = sympathizer
+        for index in range(60):
+            # Two chains of 30 under the root
+            if index == 30:
+                parent = sympathizer
+            parent = Sympathizer.objects.create(
+                nombres="Miembro", apellidos=str(index), cedula=f"52000000{index:02d}", phone="3000000001",
+                sexo="M", referrer=parent,
+            )
+        api_client.force_authenticate(user=admin_user)
+        url = f'/api/admin/networks/{sympathizer.id}/visualization/'
+
+        response = api_client.get(url, {'budget': 50, 'layout': 'tree'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['clustered'] is True
+        assert response.data['total_nodes'] == 61
+        assert response.data['visible_nodes'] <= 50
+        cluster = next(node for node in response.data['nodes'] if node['type'] == 'cluster')
+        assert cluster['depth_range'][1] <= 30
+
+        drilled = api_client.get(url, {'budget': 50, 'cluster': cluster['id'], 'layout': 'tree'})
+        assert drilled.data['focus_id'] == cluster['id']
+        assert drilled.data['nodes'][0]['level'] == cluster['level']
+        assert drilled.data['visible_nodes'] == cluster['member_count']
+
+        response = api_client.get(url, {'cluster': 999999})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        streamed = api_client.get(url, {'budget': 50, 'layout': 'tree', 'stream': '1'})
+        payload = json.loads(b''.join(streamed.streaming_content))
+        buffered = api_client.get(url, {'budget': 50, 'layout': 'tree'})
+        assert payload['nodes'] == json.loads(buffered.content)['nodes']
+        assert payload['visible_nodes'] == buffered.data['visible_nodes']
+
 
 # ============ Pytest Configuration ============
 
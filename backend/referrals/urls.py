@@ -3,13 +3,15 @@ from rest_framework.routers import DefaultRouter
 from .views import SympathizerViewSet, LocationViewSet, HealthCheckView
 from .auth_views import (
     CheckUserView, RequestPasswordSetupView, SetPasswordView,
-    LoginView, DashboardView, NetworkView, ForgotPasswordView, LevelLabelView,
-    ImportTemplateView, ImportReferralsView
+    LoginView, DashboardView, NetworkView, NetworkChildrenView, NetworkChangesView, NetworkEventsView,
+    NetworkExportView,
+    ForgotPasswordView, LevelLabelView, ImportTemplateView, ImportReferralsView
 )
 from .admin_views import (
     AdminLoginView, AdminNetworkListView, AdminUserListView,
     AdminUserDetailView, AdminToggleLinkView, AdminToggleSuspensionView,
-    AdminExportUsersView, AdminNetworkVisualizationView
+    AdminExportUsersView, AdminExportJobView, AdminExportJobDownloadView, AdminNetworkVisualizationView,
+    AdminNetworkExportView, AdminNetworkGraphExportView, AdminBulkModerationView
 )
 
 router = DefaultRouter()
@@ -30,6 +32,10 @@ urlpatterns = [
     path('auth/login/', LoginView.as_view()),
     path('auth/dashboard/', DashboardView.as_view()),
     path('auth/network/', NetworkView.as_view()),
+    path('auth/network/changes/', NetworkChangesView.as_view()),
+    path('auth/network/events/', NetworkEventsView.as_view()),
+    path('auth/network/export/', NetworkExportView.as_view()),
+    path('auth/network/<int:pk>/children/', NetworkChildrenView.as_view()),
     path('auth/level-labels/', LevelLabelView.as_view()),
     path('auth/import/template/', ImportTemplateView.as_view()),
     path('auth/import/', ImportReferralsView.as_view()),
@@ -39,8 +45,13 @@ urlpatterns = [
     path('admin/networks/', AdminNetworkListView.as_view()),
     path('admin/users/', AdminUserListView.as_view()),
     path('admin/users/export/', AdminExportUsersView.as_view()),
+    path('admin/users/bulk-moderation/', AdminBulkModerationView.as_view()),
+    path('admin/exports/<int:pk>/', AdminExportJobView.as_view()),
+    path('admin/exports/<int:pk>/download/', AdminExportJobDownloadView.as_view(), name='admin-export-download'),
     path('admin/users/<int:pk>/', AdminUserDetailView.as_view()),
     path('admin/users/<int:pk>/toggle-link/', AdminToggleLinkView.as_view()),
     path('admin/users/<int:pk>/toggle-suspension/', AdminToggleSuspensionView.as_view()),
     path('admin/networks/<int:pk>/visualization/', AdminNetworkVisualizationView.as_view()),
+    path('admin/networks/<int:pk>/export/', AdminNetworkExportView.as_view()),
+    path('admin/networks/<int:pk>/graph-export/', AdminNetworkGraphExportView.as_view()),
 ]
@@ -11,6 +11,8 @@ from django.utils import timezone
 
 from .models import Sympathizer, Department, Municipality
 from .serializers import SympathizerSerializer, DepartmentSerializer, MunicipalitySerializer
+from .pagination import KeysetPagination
+from .services.counts import CountService
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +39,10 @@ class HealthCheckView(APIView):
 
         # Add basic stats
         try:
-            health_status['checks']['sympathizers_count'] = Sympathizer.objects.count()
+            # Planner estimate or cached count: probes must not scan the table
+            sympathizers = CountService.count(Sympathizer.objects.all())
+            health_status['checks']['sympathizers_count'] = sympathizers.value
+            health_status['checks']['sympathizers_count_exact'] = sympathizers.exact
         except Exception:
             health_status['checks']['sympathizers_count'] = 'error'
 
@@ -60,8 +65,9 @@ class LocationViewSet(viewsets.ReadOnlyModelViewSet):
 
 class SympathizerViewSet(viewsets.ModelViewSet):
     """ViewSet for sympathizers."""
-    queryset = Sympathizer.objects.select_related('department', 'municipio', 'referrer').all()
+    queryset = Sympathizer.objects.select_related('department', 'municipio', 'referrer', 'user', 'root').all()
     serializer_class = SympathizerSerializer
+    pagination_class = KeysetPagination
 
     @action(detail=False, methods=['post'])
     def check_cedula(self, request):
@@ -11,13 +11,8 @@ except Sympathizer.DoesNotExist:
     print('Root sympathizer not found for cedula', root_cedula)
     raise SystemExit(1)
 
-# BFS to collect all descendants
-to_visit = list(root.referrals.all())
-descendants = []
-while to_visit:
-    cur = to_visit.pop(0)
-    descendants.append(cur)
-    to_visit.extend(list(cur.referrals.all()))
+# Collect all descendants with a single path range scan
+descendants = list(Sympathizer.objects.subtree(root.id).exclude(pk=root.pk))
 
 # Filter matches
 matches = [s for s in descendants if s.nombres and s.apellidos and 'Nivel' in s.nombres and 'Usuario' in s.apellidos]
@@ -8,13 +8,8 @@ except Sympathizer.DoesNotExist:
     print('Root sympathizer not found for cedula', root_cedula)
     raise SystemExit(1)
 
-# BFS to collect all descendants
-to_visit = list(root.referrals.all())
-descendants = []
-while to_visit:
-    cur = to_visit.pop(0)
-    descendants.append(cur)
-    to_visit.extend(list(cur.referrals.all()))
+# Collect all descendants with a single path range scan
+descendants = list(Sympathizer.objects.subtree(root.id).exclude(pk=root.pk))
 
 # Filter those matching patterns
 cond1 = Q(nombres__regex=r'^\s*Nivel[0-9]+') & Q(apellidos__regex=r'^\s*Usuario[0-9]+')
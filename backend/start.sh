@@ -1,5 +1,13 @@
 #!/bin/sh
 
+# SERVER_ROLE=events runs the ASGI server for the network events stream (SSE)
+# only; route /api/auth/network/events/ to it. Events reach it from the API
+# process through PostgreSQL LISTEN/NOTIFY (referrals/events.py).
+if [ "$SERVER_ROLE" = "events" ]; then
+    echo "Starting events server..."
+    exec uvicorn core.asgi:application --host 0.0.0.0 --port ${PORT:-8001}
+fi
+
 echo "Running migrations..."
 python manage.py migrate --noinput
 
@@ -7,4 +15,5 @@ echo "Loading initial data..."
 python populate_locations.py || true
 
 echo "Starting server..."
-exec gunicorn --bind 0.0.0.0:${PORT:-8000} --workers 3 --timeout 120 core.wsgi:application
+# Sync WSGI workers keep streamed responses and exports in constant memory
+exec gunicorn --bind 0.0.0.0:${PORT:-8000} --workers 3 --worker-class gthread --threads 4 --timeout 120 core.wsgi:application
@@ -2,7 +2,8 @@ import { useEffect, useState, useMemo } from 'react';
 import axios from 'axios';
 import Y2KWindow from './Y2KWindow';
 import ReferralNetwork from './ReferralNetwork';
-import { API_URL } from '../config';
+import { API_URL, EVENTS_URL } from '../config';
+import { fromColumnar, fromColumnarReferrals } from '../services/api';
 
 interface DashboardProps {
   token: string;
@@ -197,14 +198,16 @@ const Dashboard = ({ token, onLogout }: DashboardProps) => {
     const fetchData = async () => {
       try {
         const response = await axios.get(`${API_URL}/auth/dashboard/`, {
-          headers: { Authorization: `Token ${token}` }
+          headers: { Authorization: `Token ${token}` },
+          params: { format: 'columnar' }
         });
-        setData(response.data);
+        setData(fromColumnarReferrals(response.data));
 
         const networkResponse = await axios.get(`${API_URL}/auth/network/`, {
-            headers: { Authorization: `Token ${token}` }
+            headers: { Authorization: `Token ${token}` },
+            params: { format: 'columnar' }
         });
-        setNetworkData(networkResponse.data);
+        setNetworkData(fromColumnar(networkResponse.data));
 
         try {
             const levelLabelResponse = await axios.get(`${API_URL}/auth/level-labels/`, {
@@ -225,6 +228,41 @@ const Dashboard = ({ token, onLogout }: DashboardProps) => {
     fetchData();
   }, [token, onLogout]);
 
+  // Avisos en vivo de nuevos referidos; la recarga responde 304 si nada cambió
+  useEffect(() => {
+    if (!token || typeof EventSource === 'undefined') return;
+
+    const refresh = async () => {
+      try {
+        const dashResponse = await axios.get(`${API_URL}/auth/dashboard/`, {
+          headers: { Authorization: `Token ${token}` },
+          params: { format: 'columnar' }
+        });
+        setData(fromColumnarReferrals(dashResponse.data));
+
+        const networkResponse = await axios.get(`${API_URL}/auth/network/`, {
+          headers: { Authorization: `Token ${token}` },
+          params: { format: 'columnar' }
+        });
+        setNetworkData(fromColumnar(networkResponse.data));
+      } catch (error) {
+        console.error('Error refreshing network', error);
+      }
+    };
+
+    const source = new EventSource(`${EVENTS_URL}/auth/network/events/?token=${encodeURIComponent(token)}`);
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    source.addEventListener('member_joined', () => {
+      // Agrupar ráfagas de registros en una sola recarga
+      clearTimeout(timer);
+      timer = setTimeout(refresh, 1000);
+    });
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
+  }, [token]);
+
   // Calcular estadísticas por nivel
   const levelStats = useMemo(() => {
     if (!networkData?.nodes) return { levels: {}, total: 0 };
@@ -355,14 +393,16 @@ const Dashboard = ({ token, onLogout }: DashboardProps) => {
       // Refresh dashboard data if import was successful
       if (response.data.imported > 0) {
         const dashResponse = await axios.get(`${API_URL}/auth/dashboard/`, {
-          headers: { Authorization: `Token ${token}` }
+          headers: { Authorization: `Token ${token}` },
+          params: { format: 'columnar' }
         });
-        setData(dashResponse.data);
+        setData(fromColumnarReferrals(dashResponse.data));
 
         const networkResponse = await axios.get(`${API_URL}/auth/network/`, {
-          headers: { Authorization: `Token ${token}` }
+          headers: { Authorization: `Token ${token}` },
+          params: { format: 'columnar' }
         });
-        setNetworkData(networkResponse.data);
+        setNetworkData(fromColumnar(networkResponse.data));
       }
     } catch (error: any) {
       console.error('Error importing', error);
@@ -11,8 +11,10 @@ interface Node {
   telefono: string;
   email: string;
   referrals_count: number;
-  type: 'me' | 'sponsor' | 'referral' | 'root';
+  type: 'me' | 'sponsor' | 'referral' | 'root' | 'cluster';
   level?: number;
+  member_count?: number;
+  depth_range?: [number, number];
   x?: number;
   y?: number;
 }
@@ -29,9 +31,13 @@ interface NetworkData {
 
 interface ReferralNetworkProps {
   data: NetworkData;
+  // Positions already converged on the server: pin them and skip the simulation
+  fixedLayout?: boolean;
+  // Called when a collapsed cluster node is clicked (level-of-detail views)
+  onClusterClick?: (nodeId: number) => void;
 }
 
-const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
+const ReferralNetwork = ({ data, fixedLayout = false, onClusterClick }: ReferralNetworkProps) => {
   const graphRef = useRef<any>(null);
   const containerRef = useRef<HTMLDivElement>(null);
   const [dimensions, setDimensions] = useState({ width: 800, height: 600 });
@@ -81,7 +87,7 @@ const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
     // Deep copy nodes to ensure react-force-graph detects changes
     const visibleNodes = data.nodes
       .filter(node => !hiddenNodes.has(node.id))
-      .map(node => ({ ...node }));
+      .map(node => (fixedLayout ? { ...node, fx: node.x, fy: node.y } : { ...node }));
 
     const visibleNodeIds = new Set(visibleNodes.map(n => n.id));
 
@@ -98,7 +104,7 @@ const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
       }));
 
     return { nodes: visibleNodes, links: visibleLinks };
-  }, [data, collapsedNodes, getDescendants]);
+  }, [data, collapsedNodes, getDescendants, fixedLayout]);
 
   // Initialize collapsed state - collapse level 1+ nodes with children by default
   useEffect(() => {
@@ -172,6 +178,7 @@ const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
     if (node.type === 'me') return '#FF1053';
     if (node.type === 'root') return '#FF1053';  // Same as 'me' for admin view
     if (node.type === 'sponsor') return '#119DA4';
+    if (node.type === 'cluster') return '#6B7280';
 
     if (node.level === 1) return '#FFD700';
     if (node.level === 2) return '#FFA500';
@@ -208,6 +215,11 @@ const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
   }, []);
 
   const handleNodeClick = useCallback((node: any) => {
+    if (node.type === 'cluster' && onClusterClick) {
+      onClusterClick(node.id);
+      return;
+    }
+
     const hasChildren = (childrenMap.get(node.id)?.length ?? 0) > 0;
     const canCollapse = (node.level ?? 0) >= 1 && hasChildren;
 
@@ -220,7 +232,7 @@ const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
         graphRef.current.zoom(3, 1500);
       }
     }
-  }, [childrenMap, toggleCollapse]);
+  }, [childrenMap, toggleCollapse, onClusterClick]);
 
   return (
     <div className={`relative h-full w-full overflow-hidden transition-colors duration-500 ${isFullscreen ? 'bg-black/60' : ''}`} ref={containerRef}>
@@ -239,12 +251,12 @@ const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
         width={dimensions.width}
         height={dimensions.height}
         graphData={filteredData}
-        dagMode="td"
+        dagMode={fixedLayout ? undefined : 'td'}
         dagLevelDistance={150}
         d3AlphaDecay={0.02}
         d3VelocityDecay={0.3}
-        cooldownTicks={250}
-        warmupTicks={150}
+        cooldownTicks={fixedLayout ? 0 : 250}
+        warmupTicks={fixedLayout ? 0 : 150}
         onEngineStop={() => {
           graphRef.current?.zoomToFit(400, 80);
           setIsLayoutReady(true);
@@ -316,8 +328,9 @@ const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
             ctx.lineWidth = 3 / globalScale;
             ctx.stroke();
 
-            // Draw referral count badge (top-right corner)
-            if (node.referrals_count > 0) {
+            // Draw referral count badge (top-right corner); clusters show their member count
+            const badgeCount = node.type === 'cluster' ? node.member_count : node.referrals_count;
+            if (badgeCount > 0) {
               const badgeRadius = r * 0.35;
               const badgeX = node.x + r * 0.7;
               const badgeY = node.y - r * 0.7;
@@ -334,7 +347,7 @@ const ReferralNetwork = ({ data }: ReferralNetworkProps) => {
               ctx.textAlign = 'center';
               ctx.textBaseline = 'middle';
               ctx.fillStyle = '#FFFFFF';
-              ctx.fillText(String(node.referrals_count), badgeX, badgeY);
+              ctx.fillText(String(badgeCount), badgeX, badgeY);
             }
 
             // Visibility check
@@ -3,6 +3,7 @@ import axios from 'axios';
 import Y2KWindow from '../Y2KWindow';
 import ReferralNetwork from '../ReferralNetwork';
 import { API_URL } from '../../config';
+import { fromColumnar } from '../../services/api';
 
 interface NetworkManagementProps {
   token: string;
@@ -12,6 +13,11 @@ interface NetworkVisualizationData {
   network_name: string;
   root_name: string;
   total_nodes: number;
+  visible_nodes: number;
+  clustered: boolean;
+  focus_id: number;
+  focus_parent_id: number | null;
+  layout: 'force' | 'tree';
   nodes: any[];
   links: any[];
 }
@@ -33,14 +39,21 @@ const NetworkManagement = ({ token }: NetworkManagementProps) => {
   const [success, setSuccess] = useState('');
   const [showVisualization, setShowVisualization] = useState(false);
   const [visualizationData, setVisualizationData] = useState<NetworkVisualizationData | null>(null);
+  const [visualizationNetworkId, setVisualizationNetworkId] = useState<number | null>(null);
   const [loadingVisualization, setLoadingVisualization] = useState(false);
 
+  const [sort, setSort] = useState('-created_at');
+  const [page, setPage] = useState(1);
+  const [totalPages, setTotalPages] = useState(1);
+
   const fetchNetworks = async () => {
     try {
       const response = await axios.get(`${API_URL}/admin/networks/`, {
-        headers: { Authorization: `Token ${token}` }
+        headers: { Authorization: `Token ${token}` },
+        params: { sort, page }
       });
-      setNetworks(response.data);
+      setNetworks(response.data.results);
+      setTotalPages(Math.max(response.data.pages, 1));
     } catch (err) {
       console.error(err);
     } finally {
@@ -50,7 +63,7 @@ const NetworkManagement = ({ token }: NetworkManagementProps) => {
 
   useEffect(() => {
     fetchNetworks();
-  }, [token]);
+  }, [token, sort, page]);
 
   const handleCreate = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -69,13 +82,15 @@ const NetworkManagement = ({ token }: NetworkManagementProps) => {
     }
   };
 
-  const handleViewNetwork = async (networkId: number) => {
+  const handleViewNetwork = async (networkId: number, clusterId?: number) => {
     setLoadingVisualization(true);
     try {
       const response = await axios.get(`${API_URL}/admin/networks/${networkId}/visualization/`, {
-        headers: { Authorization: `Token ${token}` }
+        headers: { Authorization: `Token ${token}` },
+        params: { format: 'columnar', ...(clusterId ? { cluster: clusterId } : {}) },
       });
-      setVisualizationData(response.data);
+      setVisualizationNetworkId(networkId);
+      setVisualizationData(fromColumnar<NetworkVisualizationData>(response.data));
       setShowVisualization(true);
     } catch (err) {
       console.error('Error loading network visualization:', err);
@@ -195,6 +210,22 @@ const NetworkManagement = ({ token }: NetworkManagementProps) => {
         </div>
       )}
 
+      <div className="flex justify-end items-center gap-2 mb-4">
+        <label className="text-xs font-bold text-black/60 uppercase">Ordenar por</label>
+        <select
+          value={sort}
+          onChange={e => { setSort(e.target.value); setPage(1); }}
+          className="bg-white border-2 border-black/20 p-2 text-xs sm:text-sm"
+        >
+          <option value="-created_at">Más recientes</option>
+          <option value="created_at">Más antiguas</option>
+          <option value="-size">Más grandes</option>
+          <option value="size">Más pequeñas</option>
+          <option value="name">Nombre (A-Z)</option>
+          <option value="-name">Nombre (Z-A)</option>
+        </select>
+      </div>
+
       {isLoading ? (
         <div className="text-center py-8">
           <p className="text-black/60 font-bold uppercase">Cargando redes...</p>
@@ -286,6 +317,27 @@ const NetworkManagement = ({ token }: NetworkManagementProps) => {
       </div>
       )}
 
+      {/* Pagination */}
+      {totalPages > 1 && (
+        <div className="flex justify-center items-center gap-1 sm:gap-2 flex-wrap mt-6">
+          <button
+            disabled={page === 1}
+            onClick={() => setPage(p => p - 1)}
+            className="px-3 sm:px-4 py-2 border-2 border-black/10 disabled:opacity-50 hover:bg-black/5 text-xs sm:text-sm"
+          >
+            Anterior
+          </button>
+          <span className="px-2 sm:px-4 py-2 font-bold text-xs sm:text-sm">Pág. {page}/{totalPages}</span>
+          <button
+            disabled={page === totalPages}
+            onClick={() => setPage(p => p + 1)}
+            className="px-3 sm:px-4 py-2 border-2 border-black/10 disabled:opacity-50 hover:bg-black/5 text-xs sm:text-sm"
+          >
+            Siguiente
+          </button>
+        </div>
+      )}
+
       {/* Network Visualization Modal */}
       {showVisualization && visualizationData && (
         <div className="fixed inset-0 bg-black/80 z-50 flex flex-col">
@@ -295,8 +347,18 @@ const NetworkManagement = ({ token }: NetworkManagementProps) => {
               <h2 className="text-xl font-bold uppercase">{visualizationData.network_name}</h2>
               <p className="text-sm opacity-80">
                 {visualizationData.total_nodes} miembros en la red
+                {visualizationData.clustered && ` · ${visualizationData.visible_nodes} visibles, grupos agrupados`}
               </p>
             </div>
+            {visualizationData.focus_parent_id && visualizationNetworkId && (
+              <button
+                onClick={() => handleViewNetwork(visualizationNetworkId, visualizationData.focus_parent_id!)}
+                disabled={loadingVisualization}
+                className="bg-white text-primary font-bold px-4 py-2 uppercase hover:bg-primary hover:text-white hover:border-white border-2 border-transparent transition-colors ml-auto mr-2"
+              >
+                Subir
+              </button>
+            )}
             <button
               onClick={() => {
                 setShowVisualization(false);
@@ -310,7 +372,11 @@ const NetworkManagement = ({ token }: NetworkManagementProps) => {
 
           {/* Graph Container */}
           <div className="flex-1 bg-white">
-            <ReferralNetwork data={{ nodes: visualizationData.nodes, links: visualizationData.links }} />
+            <ReferralNetwork
+              data={{ nodes: visualizationData.nodes, links: visualizationData.links }}
+              fixedLayout={visualizationData.layout === 'force'}
+              onClusterClick={(nodeId) => visualizationNetworkId && handleViewNetwork(visualizationNetworkId, nodeId)}
+            />
           </div>
         </div>
       )}
@@ -12,7 +12,9 @@ const UserManagement = ({ token }: UserManagementProps) => {
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
   const [page, setPage] = useState(1);
-  const [totalPages, setTotalPages] = useState(1);
+  // cursors[i] abre la página i + 1 (paginación por cursor)
+  const [cursors, setCursors] = useState<(string | null)[]>([null]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [selectedUser, setSelectedUser] = useState<any>(null);
 
   const fetchUsers = useCallback(async () => {
@@ -20,16 +22,16 @@ const UserManagement = ({ token }: UserManagementProps) => {
     try {
       const response = await axios.get(`${API_URL}/admin/users/`, {
         headers: { Authorization: `Token ${token}` },
-        params: { q: search, page }
+        params: { q: search, cursor: cursors[page - 1] || undefined }
       });
       setUsers(response.data.results);
-      setTotalPages(response.data.pages);
+      setNextCursor(response.data.next_cursor);
     } catch (err) {
       console.error(err);
     } finally {
       setLoading(false);
     }
-  }, [search, page, token]);
+  }, [search, page, cursors, token]);
 
   useEffect(() => {
     const delayDebounceFn = setTimeout(() => {
@@ -88,7 +90,11 @@ const UserManagement = ({ token }: UserManagementProps) => {
           type="text"
           placeholder="Buscar por nombre, apellido o cédula..."
           value={search}
-          onChange={(e) => setSearch(e.target.value)}
+          onChange={(e) => {
+            setSearch(e.target.value);
+            setPage(1);
+            setCursors([null]);
+          }}
           className="flex-1 p-2 sm:p-3 border-2 border-black/20 shadow-inner text-sm"
         />
       </div>
@@ -218,10 +224,13 @@ const UserManagement = ({ token }: UserManagementProps) => {
         >
           Anterior
         </button>
-        <span className="px-2 sm:px-4 py-2 font-bold text-xs sm:text-sm">Pág. {page}/{totalPages}</span>
+        <span className="px-2 sm:px-4 py-2 font-bold text-xs sm:text-sm">Pág. {page}</span>
         <button
-          disabled={page === totalPages}
-          onClick={() => setPage(p => p + 1)}
+          disabled={!nextCursor}
+          onClick={() => {
+            setCursors(c => [...c.slice(0, page), nextCursor]);
+            setPage(p => p + 1);
+          }}
           className="px-3 sm:px-4 py-2 border-2 border-black/10 disabled:opacity-50 hover:bg-black/5 text-xs sm:text-sm"
         >
           Siguiente
@@ -1,3 +1,7 @@
 // API Configuration
 // Uses environment variable VITE_API_URL or defaults to localhost:8000
 export const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api';
+
+// Network events stream (SSE), served by the ASGI process
+// Uses environment variable VITE_EVENTS_URL or defaults to API_URL
+export const EVENTS_URL = import.meta.env.VITE_EVENTS_URL || API_URL;
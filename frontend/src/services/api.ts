@@ -10,11 +10,15 @@ import type {
   CheckUserResponse,
   DashboardData,
   NetworkData,
+  NetworkChildrenPage,
+  NetworkChanges,
   NetworkRoot,
   Sympathizer,
   Department,
   Municipality,
   PaginatedResponse,
+  CursorPage,
+  ExportJob,
   ApiError,
 } from '../types/api';
 
@@ -42,6 +46,58 @@ const handleError = (error: unknown): never => {
   throw error;
 };
 
+// ============ Columnar graph format ============
+
+export interface ColumnarGraph {
+  format: 'columnar';
+  ids: number[];
+  parent_index: number[];
+  columns: Record<string, unknown[]>;
+  [key: string]: unknown;
+}
+
+/**
+ * Rebuild the nodes/links payload from a `?format=columnar` graph response.
+ * Other top-level fields (network_name, total_nodes...) are kept as they are.
+ */
+export const fromColumnar = <T = Record<string, unknown>>(data: ColumnarGraph) => {
+  const { ids, parent_index, columns, format: _format, ...rest } = data;
+  const keys = Object.keys(columns);
+  const nodes = ids.map((id, position) => {
+    const node: Record<string, unknown> = { id };
+    keys.forEach(key => { node[key] = columns[key][position]; });
+    return node;
+  });
+  const links = parent_index
+    .map((parent, position) => ({ parent, position }))
+    .filter(({ parent }) => parent >= 0)
+    .map(({ parent, position }) => ({ source: ids[parent], target: ids[position] }));
+  return { ...rest, nodes, links } as T;
+};
+
+/**
+ * Rebuild the nested `referrals` tree from a `?format=columnar` dashboard response.
+ * Nodes come in pre-order, so every parent is built before its children.
+ */
+export const fromColumnarReferrals = <T = Record<string, unknown>>(data: ColumnarGraph) => {
+  const { ids, parent_index, columns, format: _format, ...rest } = data;
+  const keys = Object.keys(columns);
+  const nodes: Record<string, unknown>[] = [];
+  const referrals: Record<string, unknown>[] = [];
+  ids.forEach((id, position) => {
+    const node: Record<string, unknown> = { id, sub_referrals: [] };
+    keys.forEach(key => { node[key] = columns[key][position]; });
+    nodes.push(node);
+    const parent = parent_index[position];
+    if (parent >= 0) {
+      (nodes[parent].sub_referrals as Record<string, unknown>[]).push(node);
+    } else {
+      referrals.push(node);
+    }
+  });
+  return { ...rest, referrals } as T;
+};
+
 // ============ Auth API ============
 
 export const authApi = {
@@ -95,8 +151,11 @@ export const authApi = {
 
   getDashboard: async (token: string): Promise<DashboardData> => {
     try {
-      const response = await api.get<DashboardData>('/auth/dashboard/', authHeader(token));
-      return response.data;
+      const response = await api.get<ColumnarGraph>('/auth/dashboard/', {
+        ...authHeader(token),
+        params: { format: 'columnar' },
+      });
+      return fromColumnarReferrals<DashboardData>(response.data);
     } catch (error) {
       throw handleError(error);
     }
@@ -104,7 +163,54 @@ export const authApi = {
 
   getNetwork: async (token: string): Promise<NetworkData> => {
     try {
-      const response = await api.get<NetworkData>('/auth/network/', authHeader(token));
+      const response = await api.get<ColumnarGraph>('/auth/network/', {
+        ...authHeader(token),
+        params: { format: 'columnar' },
+      });
+      return fromColumnar<NetworkData>(response.data);
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  getNetworkChildren: async (
+    token: string,
+    nodeId: number,
+    options: { depth?: number; cursor?: string | null } = {}
+  ): Promise<NetworkChildrenPage> => {
+    try {
+      const response = await api.get<NetworkChildrenPage>(`/auth/network/${nodeId}/children/`, {
+        ...authHeader(token),
+        params: { depth: options.depth ?? 1, cursor: options.cursor || undefined },
+      });
+      return response.data;
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  getNetworkChanges: async (token: string, since?: string | null): Promise<NetworkChanges> => {
+    try {
+      const response = await api.get<NetworkChanges>('/auth/network/changes/', {
+        ...authHeader(token),
+        params: { since: since || undefined },
+      });
+      return response.data;
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  exportNetwork: async (
+    token: string,
+    options: { member?: number; maxDepth?: number; format?: 'xlsx' | 'csv' } = {}
+  ): Promise<Blob> => {
+    try {
+      const response = await api.get('/auth/network/export/', {
+        ...authHeader(token),
+        params: { member: options.member, max_depth: options.maxDepth, format: options.format ?? 'xlsx' },
+        responseType: 'blob',
+      });
       return response.data;
     } catch (error) {
       throw handleError(error);
@@ -124,9 +230,15 @@ export const adminApi = {
     }
   },
 
-  getNetworks: async (token: string): Promise<NetworkRoot[]> => {
+  getNetworks: async (
+    token: string,
+    options: { sort?: string; page?: number; pageSize?: number } = {}
+  ): Promise<PaginatedResponse<NetworkRoot>> => {
     try {
-      const response = await api.get<NetworkRoot[]>('/admin/networks/', authHeader(token));
+      const response = await api.get<PaginatedResponse<NetworkRoot>>('/admin/networks/', {
+        ...authHeader(token),
+        params: { sort: options.sort, page: options.page, page_size: options.pageSize },
+      });
       return response.data;
     } catch (error) {
       throw handleError(error);
@@ -144,10 +256,10 @@ export const adminApi = {
 
   getUsers: async (
     token: string,
-    params?: { q?: string; page?: number; page_size?: number; status?: string }
-  ): Promise<PaginatedResponse<Sympathizer>> => {
+    params?: { q?: string; cursor?: string; page_size?: number; status?: string; count?: boolean }
+  ): Promise<CursorPage<Sympathizer>> => {
     try {
-      const response = await api.get<PaginatedResponse<Sympathizer>>('/admin/users/', {
+      const response = await api.get<CursorPage<Sympathizer>>('/admin/users/', {
         ...authHeader(token),
         params,
       });
@@ -201,11 +313,90 @@ export const adminApi = {
     }
   },
 
-  exportUsers: async (token: string, query?: string): Promise<Blob> => {
+  bulkModerate: async (
+    token: string,
+    target: { rootId: number } | { ids: number[] },
+    changes: { link_enabled?: boolean; is_suspended?: boolean },
+    reason?: string
+  ): Promise<{ matched: number; updated: number; accounts_updated: number }> => {
+    try {
+      const scope = 'rootId' in target ? { root_id: target.rootId } : { ids: target.ids };
+      const response = await api.post('/admin/users/bulk-moderation/', { ...scope, ...changes, reason }, authHeader(token));
+      return response.data;
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  exportUsers: async (token: string, query?: string, format: 'xlsx' | 'csv' = 'xlsx'): Promise<Blob> => {
     try {
       const response = await api.get('/admin/users/export/', {
         ...authHeader(token),
-        params: { q: query },
+        params: { q: query, format },
+        responseType: 'blob',
+      });
+      return response.data;
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  createExport: async (token: string, query?: string, format: 'xlsx' | 'csv' = 'xlsx'): Promise<ExportJob> => {
+    try {
+      const response = await api.post<ExportJob>('/admin/users/export/', { q: query, format }, authHeader(token));
+      return response.data;
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  createNetworkExport: async (
+    token: string,
+    memberId: number,
+    options: { maxDepth?: number; format?: 'xlsx' | 'csv' } = {}
+  ): Promise<ExportJob> => {
+    try {
+      const response = await api.post<ExportJob>(
+        `/admin/networks/${memberId}/export/`,
+        { max_depth: options.maxDepth, format: options.format ?? 'xlsx' },
+        authHeader(token)
+      );
+      return response.data;
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  exportNetworkGraph: async (
+    token: string,
+    memberId: number,
+    options: { maxDepth?: number; format?: 'graphml' | 'gexf' | 'csv' } = {}
+  ): Promise<Blob> => {
+    try {
+      const response = await api.get(`/admin/networks/${memberId}/graph-export/`, {
+        ...authHeader(token),
+        params: { max_depth: options.maxDepth, format: options.format ?? 'graphml' },
+        responseType: 'blob',
+      });
+      return response.data;
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  getExport: async (token: string, id: number): Promise<ExportJob> => {
+    try {
+      const response = await api.get<ExportJob>(`/admin/exports/${id}/`, authHeader(token));
+      return response.data;
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
+
+  downloadExport: async (token: string, id: number): Promise<Blob> => {
+    try {
+      const response = await api.get(`/admin/exports/${id}/download/`, {
+        ...authHeader(token),
         responseType: 'blob',
       });
       return response.data;
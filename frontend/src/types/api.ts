@@ -117,6 +117,46 @@ export interface NetworkData {
   links: NetworkLink[];
 }
 
+export interface NetworkChild {
+  id: number;
+  parent_id: number;
+  level: number;
+  nombres: string;
+  apellidos: string;
+  cedula: string;
+  telefono: string;
+  email: string | null;
+  referrals_count: number;
+  network_size: number;
+  has_children: boolean;
+}
+
+export interface NetworkChildrenPage {
+  id: number;
+  depth: number;
+  children: NetworkChild[];
+  next_cursor: string | null;
+}
+
+export interface NetworkUpsert {
+  id: number;
+  parent_id: number | null;
+  level: number;
+  nombres: string;
+  apellidos: string;
+  cedula: string;
+  telefono: string;
+  email: string | null;
+  referrals_count: number;
+}
+
+export interface NetworkChanges {
+  cursor: string;
+  reset: boolean;
+  upserts: NetworkUpsert[];
+  removed: number[];
+}
+
 // Admin types
 export interface NetworkRoot {
   id: number;
@@ -132,11 +172,40 @@ export interface NetworkRoot {
 export interface PaginatedResponse<T> {
   results: T[];
   total: number;
+  // False when the total is a planner estimate or a cached count
+  total_exact: boolean;
   page: number;
   page_size: number;
   pages: number;
 }
 
+export interface CursorPage<T> {
+  results: T[];
+  next_cursor: string | null;
+  page_size: number;
+  total: number;
+  total_exact: boolean;
+}
+
+// Background export job
+export interface ExportJob {
+  id: number;
+  kind: 'users' | 'network';
+  format: 'xlsx' | 'csv';
+  params: Record<string, unknown>;
+  status: 'pending' | 'running' | 'done' | 'failed';
+  progress: number | null;
+  processed_rows: number;
+  total_rows: number | null;
+  file_name: string;
+  file_size: number | null;
+  error: string;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+  download_url: string | null;
+}
+
 // Health check
 export interface HealthCheckResponse {
   status: 'healthy' | 'unhealthy';
@@ -144,6 +213,7 @@ export interface HealthCheckResponse {
   checks: {
     database: 'ok' | 'error';
     sympathizers_count: number | 'error';
+    sympathizers_count_exact?: boolean;
   };
 }
 